@@ -4,10 +4,32 @@ Este script cria tabelas temporárias que mapeiam as hash_keys para os IDs.
 """
 
 import os
+import argparse
 import psycopg2
-import pandas as pd
+from io import StringIO
 from pathlib import Path
 from dotenv import load_dotenv
+import pandas as pd
+
+from storage import FORMATOS, table_file, read_table
+
+
+def copy_mapping(cur, mapping_table: str, id_column: str, hash_keys, ids):
+    """
+    Grava os pares (hash_key, id) em mapping_table com um único COPY.
+    
+    Um INSERT por par custa uma ida e volta ao banco por registro (centenas
+    de milhares em dim_tumor/dim_tratamento); o COPY envia tudo de uma vez.
+    """
+    buffer = StringIO()
+    pd.DataFrame({'hash_key': hash_keys, id_column: ids}).to_csv(
+        buffer, index=False, header=False
+    )
+    buffer.seek(0)
+    cur.copy_expert(
+        sql=f"COPY {mapping_table}(hash_key, {id_column}) FROM STDIN WITH (FORMAT CSV);",
+        file=buffer
+    )
 
 
 def create_mapping_for_dimension(conn, dim_name: str, csv_file: Path):
@@ -16,8 +38,8 @@ def create_mapping_for_dimension(conn, dim_name: str, csv_file: Path):
     """
     print(f"\n   Criando mapeamento para {dim_name}...")
     
-    # Carregar CSV com hash_keys
-    df_csv = pd.read_csv(csv_file)
+    # Carregar hash_keys da dimensão (só a coluna necessária, como texto)
+    df_csv = read_table(csv_file, ['hash_key'], {'hash_key': "str"})
     
     if 'hash_key' not in df_csv.columns:
         print(f"      ERRO: hash_key nao encontrada no CSV")
@@ -41,30 +63,39 @@ def create_mapping_for_dimension(conn, dim_name: str, csv_file: Path):
         # Dropar se existir
         cur.execute(f"DROP TABLE IF EXISTS {mapping_table};")
         
-        # Criar nova tabela
+        # Criar nova tabela (sem a chave primária: o índice é criado uma
+        # vez só, depois da carga, e não atualizado a cada linha)
         cur.execute(f"""
             CREATE TABLE {mapping_table} (
-                hash_key VARCHAR(32) PRIMARY KEY,
+                hash_key VARCHAR(32),
                 original_id INTEGER
             );
         """)
         
-        # Inserir mapeamentos
-        for hash_key, supabase_id in zip(df_csv['hash_key'], ids_supabase):
-            cur.execute(f"""
-                INSERT INTO {mapping_table} (hash_key, original_id)
-                VALUES (%s, %s);
-            """, (hash_key, supabase_id))
+        # Inserir mapeamentos (COPY único)
+        copy_mapping(cur, mapping_table, "original_id", df_csv['hash_key'].to_numpy(), ids_supabase)
         
-        # Criar índice
-        cur.execute(f"CREATE INDEX idx_{mapping_table}_hash ON {mapping_table}(hash_key);")
+        # Chave primária (e o índice em hash_key) depois da carga
+        cur.execute(f"ALTER TABLE {mapping_table} ADD PRIMARY KEY (hash_key);")
     
+    # Um único commit: DROP, CREATE, COPY e índice
     conn.commit()
     print(f"      [OK] {len(ids_supabase):,} mapeamentos criados")
 
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Cria as tabelas de mapeamento hash_key -> id.")
+    parser.add_argument(
+        "--formato", choices=FORMATOS, default="csv",
+        help="Formato dos arquivos de dimensions/ (padrao: csv)"
+    )
+    return parser.parse_args()
+
+
 def main():
     """Cria todas as tabelas de mapeamento."""
+    args = parse_args()
+    
     print("="*60)
     print("CRIACAO DE TABELAS DE MAPEAMENTO")
     print("="*60)
@@ -88,14 +119,11 @@ def main():
     print("\n2. Criando mapeamentos...")
     
     dimensions = [
-        ("dim_paciente", dimensions_dir / "dim_paciente.csv"),
-        ("dim_localizacao", dimensions_dir / "dim_localizacao.csv"),
-        ("dim_instituicao", dimensions_dir / "dim_instituicao.csv"),
-        ("dim_tumor", dimensions_dir / "dim_tumor.csv"),
-        ("dim_fatores_risco", dimensions_dir / "dim_fatores_risco.csv"),
-        ("dim_ocupacao", dimensions_dir / "dim_ocupacao.csv"),
-        ("dim_tempo", dimensions_dir / "dim_tempo.csv"),
-        ("dim_tratamento", dimensions_dir / "dim_tratamento.csv")
+        (dim_name, table_file(dimensions_dir, dim_name, args.formato))
+        for dim_name in [
+            "dim_paciente", "dim_localizacao", "dim_instituicao", "dim_tumor",
+            "dim_fatores_risco", "dim_ocupacao", "dim_tempo", "dim_tratamento"
+        ]
     ]
     
     try:
@@ -0,0 +1,89 @@
+"""
+ETL - NORMALIZAÇÃO DE DATAS COM CACHE
+=====================================
+As colunas de data do RHC têm poucos milhares de valores distintos em
+milhões de linhas. Aqui cada texto de data distinto é interpretado UMA
+única vez por processo: o resultado (data ISO, ano e mês) fica em cache
+por formato, e as linhas recebem o resultado pelo código fatorado (take).
+
+O custo cresce com o número de datas distintas, não com o de linhas, e o
+cache é reaproveitado entre colunas e arquivos do mesmo processo.
+
+Usado por:
+- etl_cleaning.padronizar_datas (DD/MM/YYYY → YYYY-MM-DD)
+- hash_keys.tempo_columns       (data_diagnostico → data, ano e mês)
+- storage (escrita de colunas "date" em Parquet)
+
+Autor: Sistema ETL RHC
+Data: Outubro 2025
+"""
+
+import numpy as np
+import pandas as pd
+
+
+FORMATO_BRUTO = "%d/%m/%Y"
+FORMATO_ISO = "%Y-%m-%d"
+
+# formato -> {valor original: (data ISO ou None, ano, mês, datetime64)}
+_CACHE = {}
+
+_INVALIDA = (None, np.nan, np.nan, np.datetime64('NaT', 'ns'))
+
+
+def _components_of(serie: pd.Series, formato: str) -> tuple:
+    """
+    Fatora a coluna e devolve (codigos, componentes), onde componentes[i]
+    é a tupla do cache do valor distinto i; o código -1 (nulo) aponta para
+    a última posição (data inválida). Só os valores ainda fora do cache
+    passam pelo to_datetime.
+    """
+    codigos, unicos = pd.factorize(serie)
+    cache = _CACHE.setdefault(formato, {})
+
+    novos = [u for u in unicos if u not in cache]
+    if novos:
+        datas = pd.to_datetime(pd.Series(novos, dtype=object), format=formato, errors='coerce')
+        isos = datas.dt.strftime(FORMATO_ISO)
+        for valor, data, iso in zip(novos, datas, isos):
+            cache[valor] = (_INVALIDA if pd.isna(data)
+                            else (iso, data.year, data.month, data.to_datetime64()))
+
+    return codigos, [cache[u] for u in unicos] + [_INVALIDA]
+
+
+def date_components(serie: pd.Series, formato: str = FORMATO_ISO) -> pd.DataFrame:
+    """
+    Interpreta uma coluna de datas (texto no `formato`, ou datetime.date).
+
+    Returns:
+        DataFrame com o mesmo índice e as colunas:
+            iso:   texto "YYYY-MM-DD" (None se inválida/nula)
+            year:  ano (Int16, <NA> se inválida/nula)
+            month: mês (Int8, <NA> se inválida/nula)
+    """
+    codigos, componentes = _components_of(serie, formato)
+
+    isos = np.array([c[0] for c in componentes], dtype=object)
+    anos = np.array([c[1] for c in componentes], dtype='float64')
+    meses = np.array([c[2] for c in componentes], dtype='float64')
+
+    return pd.DataFrame({
+        'iso': isos[codigos],
+        'year': pd.array(anos[codigos], dtype='Int16'),
+        'month': pd.array(meses[codigos], dtype='Int8'),
+    }, index=serie.index)
+
+
+def normalize_dates(serie: pd.Series, formato: str = FORMATO_BRUTO) -> pd.Series:
+    """Datas no `formato` → texto "YYYY-MM-DD" (None se inválida/nula)."""
+    codigos, componentes = _components_of(serie, formato)
+    isos = np.array([c[0] for c in componentes], dtype=object)
+    return pd.Series(isos[codigos], index=serie.index, name=serie.name, dtype=object)
+
+
+def parse_dates(serie: pd.Series, formato: str = FORMATO_ISO) -> pd.Series:
+    """Datas no `formato` → datetime64 (NaT se inválida/nula)."""
+    codigos, componentes = _components_of(serie, formato)
+    datas = np.array([c[3] for c in componentes], dtype='datetime64[ns]')
+    return pd.Series(datas[codigos], index=serie.index, name=serie.name)
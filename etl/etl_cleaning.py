@@ -10,10 +10,18 @@ Autor: Sistema ETL RHC
 Data: Outubro 2025
 """
 
+import numpy as np
 import pandas as pd
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import os
 import sys
 
+from dates import FORMATO_BRUTO, normalize_dates
+from paralelo import add_workers_argument, resolve_workers, executar_com_log
+from storage import FORMATOS, table_file, write_table
+
 # ==============================================================================
 # MAPEAMENTO DE COLUNAS (CSV RAW → NOMES PADRONIZADOS)
 # ==============================================================================
@@ -87,36 +95,77 @@ COLUMN_MAP = {
 }
 
 
+# Colunas de data (DD/MM/YYYY no bruto → YYYY-MM-DD no arquivo limpo)
+DATE_COLUMNS = [
+    "data_diagnostico",
+    "data_obito",
+    "data_primeiro_contato",
+    "data_inicio_tratamento",
+    "data_primeiro_contato_alt",
+    "data_inicio_tratamento_alt",
+    "data_triagem"
+]
+
+
+# Schema do data_processed para as etapas seguintes (dimensões, fato,
+# passada única): nenhuma coluna tem o tipo inferido. Códigos e datas viram
+# categóricas de texto (poucos milhares de valores distintos em milhões de
+# linhas: um código inteiro por linha, e não uma string Python); só
+# valor_total fica como texto (é convertido em número na fato).
+# Ver storage.read_table: o texto dos códigos é canonizado ("45.0" → "45"),
+# então o mesmo valor gera o mesmo hash em todos os anos; valor_total é
+# texto livre e fica como está ("150.00").
+TEXT_COLUMNS = ["valor_total"]
+
+CLEANED_SCHEMA = {
+    col: ("str" if col in TEXT_COLUMNS else "category")
+    for col in COLUMN_MAP.values()
+}
+
+
 # ==============================================================================
 # FUNÇÕES DE LIMPEZA
 # ==============================================================================
 
-def substituir_valores_invalidos(df: pd.DataFrame) -> pd.DataFrame:
+# Valores tratados como nulo (comparados já sem os espaços das pontas)
+VALORES_INVALIDOS = [
+    " / / ",
+    "  /  /",
+    ".",
+    "Sem informacao",
+    "Sem Informacao",
+    "SEM INFORMACAO",
+    ""
+]
+
+
+_INVALIDOS_SEM_ESPACOS = frozenset(v.strip() for v in VALORES_INVALIDOS)
+
+
+def _limpar_texto(valor):
+    """Texto sem espaços nas pontas, ou None se for inválido/vazio."""
+    texto = str(valor).strip()
+    return None if texto in _INVALIDOS_SEM_ESPACOS else texto
+
+
+def limpar_valores(df: pd.DataFrame) -> pd.DataFrame:
     """
-    Substitui valores inválidos por None.
-    
-    Valores considerados inválidos:
-    - " / / "
-    - "  /  /"
-    - "."
-    - "Sem informacao"
-    - "Sem Informacao"
-    - "SEM INFORMACAO"
-    - Strings vazias
+    Limpa as colunas de texto em uma única passada por coluna:
+    - Remove espaços extras (mantém a capitalização original)
+    - Substitui valores inválidos (VALORES_INVALIDOS) por None
+    - Substitui strings vazias por None
+    
+    Cada valor distinto é limpo uma única vez (factorize) e o resultado
+    volta para as linhas pelo código, sem uma cópia do DataFrame por valor
+    inválido nem um apply linha a linha.
     """
-    valores_invalidos = [
-        " / / ",
-        "  /  /",
-        ".",
-        "Sem informacao",
-        "Sem Informacao",
-        "SEM INFORMACAO",
-        ""
-    ]
-    
-    # Substituir em todo o DataFrame
-    for valor in valores_invalidos:
-        df = df.replace(valor, None)
+    for col in df.select_dtypes(include=['object']).columns:
+        codigos, unicos = pd.factorize(df[col])
+        limpos = [_limpar_texto(u) for u in unicos]
+        df[col] = pd.Series(
+            np.array(limpos + [None], dtype=object)[codigos],
+            index=df.index, dtype=object
+        )
     
     return df
 
@@ -124,46 +173,21 @@ def substituir_valores_invalidos(df: pd.DataFrame) -> pd.DataFrame:
 def padronizar_datas(df: pd.DataFrame) -> pd.DataFrame:
     """
     Padroniza colunas de data de DD/MM/YYYY para YYYY-MM-DD.
+    
+    Datas inválidas viram None. Cada data distinta é convertida uma única
+    vez e fica em cache para as outras colunas e arquivos do processo
+    (ver dates.normalize_dates).
     """
-    colunas_data = [
-        "data_diagnostico",
-        "data_obito",
-        "data_primeiro_contato",
-        "data_inicio_tratamento",
-        "data_primeiro_contato_alt",
-        "data_inicio_tratamento_alt",
-        "data_triagem"
-    ]
-    
-    for col in colunas_data:
+    for col in DATE_COLUMNS:
         if col in df.columns:
             try:
-                # Converter para datetime
-                df[col] = pd.to_datetime(df[col], format="%d/%m/%Y", errors="coerce")
-                # Converter para string no formato YYYY-MM-DD
-                df[col] = df[col].dt.strftime("%Y-%m-%d")
-                # Substituir NaT por None
-                df[col] = df[col].replace("NaT", None)
+                df[col] = normalize_dates(df[col], FORMATO_BRUTO)
             except Exception as e:
                 print(f"      AVISO: Erro ao processar coluna {col}: {e}")
     
     return df
 
 
-def padronizar_categoricas(df: pd.DataFrame) -> pd.DataFrame:
-    """
-    Padroniza valores de colunas categóricas.
-    - Remove espaços extras
-    - Mantém capitalização original (não converte tudo para maiúscula)
-    """
-    colunas_string = df.select_dtypes(include=['object']).columns
-    
-    for col in colunas_string:
-        df[col] = df[col].apply(lambda x: str(x).strip() if pd.notna(x) else None)
-    
-    return df
-
-
 def remover_linhas_vazias(df: pd.DataFrame) -> pd.DataFrame:
     """Remove linhas completamente vazias."""
     antes = len(df)
@@ -192,13 +216,20 @@ def remover_duplicatas(df: pd.DataFrame) -> pd.DataFrame:
 # FUNÇÃO PRINCIPAL DE LIMPEZA
 # ==============================================================================
 
-def limpar_arquivo(arquivo_path: Path, output_dir: Path) -> bool:
+def limpar_arquivo(arquivo_path: Path, output_dir: Path, formato: str = "csv",
+                   invalidos_na_leitura: bool = False) -> bool:
     """
     Limpa e padroniza um único arquivo CSV.
     
     Args:
         arquivo_path: Caminho do arquivo bruto
         output_dir: Diretório de saída
+        formato: Formato do arquivo limpo ("csv" ou "parquet")
+        invalidos_na_leitura: Converte VALORES_INVALIDOS em nulo já no
+            read_csv (na_values). Colunas numéricas que só tinham texto por
+            causa de um valor inválido passam a ser lidas como número, o que
+            muda o tipo gravado (e as hash_keys): use em todas as cargas ou
+            em nenhuma.
         
     Returns:
         True se processado com sucesso, False caso contrário
@@ -211,7 +242,8 @@ def limpar_arquivo(arquivo_path: Path, output_dir: Path) -> bool:
         df = pd.read_csv(
             arquivo_path,
             encoding='latin1',
-            low_memory=False
+            low_memory=False,
+            na_values=VALORES_INVALIDOS if invalidos_na_leitura else None
         )
         print(f"      Registros originais: {len(df):,}")
         
@@ -219,30 +251,26 @@ def limpar_arquivo(arquivo_path: Path, output_dir: Path) -> bool:
         print("      Renomeando colunas...")
         df = df.rename(columns=COLUMN_MAP)
         
-        # 3. Substituir valores inválidos
-        print("      Substituindo valores invalidos por None...")
-        df = substituir_valores_invalidos(df)
+        # 3. Remover espaços e substituir valores inválidos/vazios por None
+        print("      Limpando valores (espacos, invalidos e vazios)...")
+        df = limpar_valores(df)
         
         # 4. Padronizar datas
         print("      Padronizando datas...")
         df = padronizar_datas(df)
         
-        # 5. Padronizar categóricas
-        print("      Padronizando categoricas...")
-        df = padronizar_categoricas(df)
-        
-        # 6. Remover linhas vazias
+        # 5. Remover linhas vazias
         print("      Removendo linhas vazias...")
         df = remover_linhas_vazias(df)
         
-        # 7. Remover duplicatas
+        # 6. Remover duplicatas
         print("      Removendo duplicatas...")
         df = remover_duplicatas(df)
         
-        # 8. Salvar arquivo limpo
-        output_file = output_dir / arquivo_path.name
+        # 7. Salvar arquivo limpo
+        output_file = table_file(output_dir, arquivo_path.stem, formato)
         print(f"      Salvando em: {output_file}")
-        df.to_csv(output_file, index=False, encoding='utf-8')
+        write_table(df, output_file, {col: "date" for col in DATE_COLUMNS})
         
         print(f"      CONCLUIDO: {len(df):,} registros salvos")
         return True
@@ -252,12 +280,89 @@ def limpar_arquivo(arquivo_path: Path, output_dir: Path) -> bool:
         return False
 
 
+def _limpar_arquivo_com_log(arquivo_path: Path, output_dir: Path, formato: str,
+                            invalidos_na_leitura: bool) -> tuple:
+    """
+    Executa limpar_arquivo em um processo do pool, guardando o log.
+    
+    O log de cada arquivo é capturado e impresso de uma vez pelo processo
+    principal, para não misturar as mensagens de arquivos diferentes.
+    
+    Returns:
+        tuple: (sucesso: bool, log: str) - ver paralelo.executar_com_log
+    """
+    return executar_com_log(limpar_arquivo, arquivo_path, output_dir, formato,
+                            invalidos_na_leitura)
+
+
+def limpar_arquivos_paralelo(csv_files: list, output_dir: Path, formato: str, workers: int,
+                             invalidos_na_leitura: bool = False) -> tuple:
+    """
+    Limpa os arquivos em paralelo, um arquivo por processo.
+    
+    Cada ano é independente, então os arquivos são distribuídos entre
+    `workers` processos. Os logs são impressos na ordem dos arquivos.
+    
+    Returns:
+        tuple: (sucessos, erros)
+    """
+    sucessos = 0
+    erros = 0
+    
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            (csv_file, executor.submit(_limpar_arquivo_com_log, csv_file, output_dir,
+                                       formato, invalidos_na_leitura))
+            for csv_file in csv_files
+        ]
+        
+        for csv_file, future in futures:
+            try:
+                sucesso, log = future.result()
+                print(log, end="")
+            except Exception as e:
+                # Falha do próprio processo (ex.: memória), não da limpeza
+                sucesso = False
+                print(f"\n   Processando: {csv_file.name}")
+                print(f"      ERRO ao processar {csv_file.name}: {e}")
+            
+            if sucesso:
+                sucessos += 1
+            else:
+                erros += 1
+    
+    return sucessos, erros
+
+
 # ==============================================================================
 # MAIN
 # ==============================================================================
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Limpa e padroniza os CSVs brutos do RHC.")
+    parser.add_argument(
+        "--formato", choices=FORMATOS, default="csv",
+        help="Formato dos arquivos em data_processed/ (padrao: csv). "
+             "Use o mesmo formato em todas as etapas."
+    )
+    add_workers_argument(parser, "Processos para limpar arquivos em paralelo")
+    parser.add_argument(
+        "--invalidos-na-leitura", action="store_true",
+        help="Converte os valores invalidos em nulo ja na leitura do CSV "
+             "(colunas numericas com valores invalidos passam a ser numericas)"
+    )
+    parser.add_argument(
+        "--apenas-novos", action="store_true",
+        help="Limpa so os arquivos brutos que ainda nao tem arquivo limpo em "
+             "data_processed/ (ex.: um ano novo, antes do etl_star.py --incremental)"
+    )
+    return parser.parse_args()
+
+
 def main():
     """Processa todos os arquivos CSV brutos."""
+    args = parse_args()
+    
     print("=" * 70)
     print("ETL - LIMPEZA E PADRONIZACAO DOS DADOS")
     print("=" * 70)
@@ -283,15 +388,35 @@ def main():
     
     print(f"\nArquivos encontrados: {len(csv_files)}")
     
+    if args.apenas_novos:
+        csv_files = [
+            f for f in csv_files
+            if not table_file(data_processed_dir, f.stem, args.formato).exists()
+        ]
+        print(f"Arquivos ainda sem versao limpa: {len(csv_files)}")
+        if not csv_files:
+            print("\nNenhum arquivo novo para limpar.")
+            sys.exit(0)
+    
     # Processar cada arquivo
-    sucessos = 0
-    erros = 0
+    workers = resolve_workers(args.workers, len(csv_files))
     
-    for csv_file in csv_files:
-        if limpar_arquivo(csv_file, data_processed_dir):
-            sucessos += 1
-        else:
-            erros += 1
+    if workers > 1:
+        print(f"Processando em paralelo: {workers} processos")
+        sucessos, erros = limpar_arquivos_paralelo(
+            csv_files, data_processed_dir, args.formato, workers,
+            args.invalidos_na_leitura
+        )
+    else:
+        sucessos = 0
+        erros = 0
+        
+        for csv_file in csv_files:
+            if limpar_arquivo(csv_file, data_processed_dir, args.formato,
+                              args.invalidos_na_leitura):
+                sucessos += 1
+            else:
+                erros += 1
     
     # Resumo
     print("\n" + "=" * 70)
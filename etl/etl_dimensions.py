@@ -3,8 +3,8 @@ ETL - CRIAÇÃO DAS TABELAS DE DIMENSÃO
 ======================================
 Este script cria as 8 tabelas de dimensão do modelo estrela.
 
-ATENÇÃO CRÍTICA: As funções de hash aqui definidas DEVEM ser copiadas
-EXATAMENTE para o etl_fact.py. NÃO altere a lógica de hash sem reprocessar tudo!
+ATENÇÃO CRÍTICA: As funções de hash ficam em hash_keys.py e são as MESMAS
+usadas pelo etl_fact.py. NÃO altere a lógica de hash sem reprocessar tudo!
 
 Schema Supabase:
 - dim_paciente (sexo, idade, raca_cor, nivel_instrucao, estado_civil)
@@ -20,408 +20,569 @@ Autor: Sistema ETL RHC
 Data: Outubro 2025
 """
 
+import numpy as np
 import pandas as pd
-import hashlib
 from pathlib import Path
+import argparse
+import json
+import os
 import sys
 
+from etl_cleaning import CLEANED_SCHEMA
+from hash_keys import DIMENSION_KEYS, hash_categorical, hash_tuples, key_frame
+from storage import (
+    FORMATOS, TableAppender, table_file, list_table_files, table_columns, read_table,
+    iter_table_chunks, write_table, concat_tables, map_distinct
+)
+
 
 # ==============================================================================
-# FUNÇÕES DE HASH - ATENÇÃO: COPIAR EXATAMENTE PARA etl_fact.py
+# COLUNAS DAS DIMENSÕES NO BANCO
 # ==============================================================================
-# 
-# REGRAS CRÍTICAS:
-# 1. NUNCA altere a ordem dos parâmetros
-# 2. NUNCA altere como None/NULL é tratado
-# 3. NUNCA altere o separador "|"
-# 4. Se mudar algo aqui, DEVE mudar em etl_fact.py também
-# 5. Sempre use valores BRUTOS (antes de qualquer transformação)
+#
+# Nomes das colunas no schema do banco, na MESMA ordem das colunas de origem
+# em hash_keys.DIMENSION_KEYS.
 #
 # ==============================================================================
 
-def _normalize_for_hash(value):
-    """
-    Normaliza um valor para geração de hash.
-    
-    REGRA: 
-    - None, NaN, "", "nan", "NaN", "NaT" → "NULL"
-    - Qualquer outro valor → string sem espaços extras
-    """
-    if pd.isna(value) or value is None or str(value).strip() in ["", "nan", "NaN", "NaT", "None"]:
-        return "NULL"
-    return str(value).strip()
+DIMENSION_COLUMNS = {
+    "dim_paciente": ["sexo", "idade", "raca_cor", "nivel_instrucao", "estado_civil"],
+    "dim_localizacao": ["cidade_nascimento", "estado_residencia", "procedencia"],
+    "dim_instituicao": ["codigo_atendimento", "codigo_tratamento", "cnes", "uf", "municipio"],
+    "dim_tumor": ["local_detalhado", "local_primario", "local_propagacao",
+                  "tipo_histologico", "lateralidade", "tnm", "ptnm", "estadiamento"],
+    "dim_fatores_risco": ["historico_familiar", "alcoolismo", "tabagismo"],
+    "dim_ocupacao": ["ocupacao"],
+    "dim_tempo": ["data_completa", "ano_primeiro_diagnostico", "mes"],
+    "dim_tratamento": ["data_primeiro_contato", "data_inicio_tratamento",
+                       "tipo_tratamento", "estado_final_tratamento",
+                       "razao_termino", "antecedente_tratamento"],
+}
+
+
+# Colunas do data_processed lidas por este script (as de dim_tempo são
+# derivadas de data_diagnostico)
+SOURCE_COLUMNS = ['data_diagnostico'] + [
+    col
+    for dim_name, (_, cols) in DIMENSION_KEYS.items() if dim_name != "dim_tempo"
+    for col in cols
+]
+
 
+# ==============================================================================
+# TUPLAS DISTINTAS + HASH
+# ==============================================================================
 
-def hash_paciente(sexo, idade, raca_cor, nivel_instrucao, estado_civil):
+def extract_dimension(df: pd.DataFrame, dim_name: str) -> tuple:
     """
-    HASH PARA dim_paciente
-    
-    IMPORTANTE: Esta função usa os valores BRUTOS do CSV.
-    Não faça transformações antes de chamar esta função!
+    Seleciona as combinações distintas de uma dimensão e gera a hash_key de cada uma.
+
+    As combinações são encontradas ANTES do hash (com a mesma equivalência de
+    NULL de _normalize_for_hash), então o MD5 roda uma vez por combinação e
+    não uma vez por linha. Mantém a primeira ocorrência de cada combinação,
+    igual ao antigo drop_duplicates(subset=['hash_key'], keep='first').
+
+    Args:
+        df: DataFrame do data_processed (valores BRUTOS)
+        dim_name: Nome da dimensão (chave de DIMENSION_KEYS)
+
+    Returns:
+        tuple: (dim, codigos, hashes)
+            dim:     combinações distintas, com nomes do banco + hash_key,
+                     ainda SEM as transformações de finalize_dimension
+            codigos: índice da combinação de cada linha de df
+            hashes:  hash_key de cada combinação (hashes[codigos] = FK da fato)
     """
-    # Normalizar cada campo
-    sexo = _normalize_for_hash(sexo)
-    idade = _normalize_for_hash(idade)
-    raca_cor = _normalize_for_hash(raca_cor)
-    nivel_instrucao = _normalize_for_hash(nivel_instrucao)
-    estado_civil = _normalize_for_hash(estado_civil)
-    
-    # Criar string combinada
-    combined = f"{sexo}|{idade}|{raca_cor}|{nivel_instrucao}|{estado_civil}"
-    
-    # Gerar MD5
-    return hashlib.md5(combined.encode('utf-8')).hexdigest()
+    _, cols = DIMENSION_KEYS[dim_name]
+    origem = key_frame(df, dim_name)
+    codigos, primeiras, hashes = hash_tuples(origem, cols)
 
+    # As colunas categóricas seguem categóricas (finalize_dimension e o
+    # concat_tables entre lotes trabalham sobre as categorias)
+    dim = origem[cols].iloc[primeiras].reset_index(drop=True)
+    dim.columns = DIMENSION_COLUMNS[dim_name]
+    dim['hash_key'] = hashes
+    return dim, codigos, hashes
 
-def hash_localizacao(cidade_nascimento, estado_residencia, procedencia):
-    """HASH PARA dim_localizacao"""
-    cidade_nascimento = _normalize_for_hash(cidade_nascimento)
-    estado_residencia = _normalize_for_hash(estado_residencia)
-    procedencia = _normalize_for_hash(procedencia)
-    
-    combined = f"{cidade_nascimento}|{estado_residencia}|{procedencia}"
-    return hashlib.md5(combined.encode('utf-8')).hexdigest()
 
+# ==============================================================================
+# TRANSFORMAÇÕES PARA O BANCO (SEMPRE APÓS GERAR O HASH!)
+# ==============================================================================
 
-def hash_instituicao(codigo_atendimento, codigo_tratamento, cnes, uf, municipio):
-    """HASH PARA dim_instituicao"""
-    codigo_atendimento = _normalize_for_hash(codigo_atendimento)
-    codigo_tratamento = _normalize_for_hash(codigo_tratamento)
-    cnes = _normalize_for_hash(cnes)
-    uf = _normalize_for_hash(uf)
-    municipio = _normalize_for_hash(municipio)
+def _finalize_paciente(dim: pd.DataFrame) -> pd.DataFrame:
+    # Converter sexo para CHAR(1): M/F
+    dim['sexo'] = map_distinct(
+        dim['sexo'],
+        lambda x: 'M' if pd.notna(x) and 'MASC' in str(x).upper()
+                  else ('F' if pd.notna(x) and 'FEM' in str(x).upper() else None)
+    )
     
-    combined = f"{codigo_atendimento}|{codigo_tratamento}|{cnes}|{uf}|{municipio}"
-    return hashlib.md5(combined.encode('utf-8')).hexdigest()
+    # Converter idade para SMALLINT
+    dim['idade'] = pd.to_numeric(dim['idade'].astype(object), errors='coerce')
+    return dim
 
 
-def hash_tumor(local_detalhado, local_primario, local_propagacao, tipo_histologico, 
-               lateralidade, tnm, ptnm, estadiamento):
-    """HASH PARA dim_tumor"""
-    local_detalhado = _normalize_for_hash(local_detalhado)
-    local_primario = _normalize_for_hash(local_primario)
-    local_propagacao = _normalize_for_hash(local_propagacao)
-    tipo_histologico = _normalize_for_hash(tipo_histologico)
-    lateralidade = _normalize_for_hash(lateralidade)
-    tnm = _normalize_for_hash(tnm)
-    ptnm = _normalize_for_hash(ptnm)
-    estadiamento = _normalize_for_hash(estadiamento)
+def _finalize_fatores_risco(dim: pd.DataFrame) -> pd.DataFrame:
+    # Converter para BOOLEAN
+    def to_boolean(val):
+        if pd.isna(val):
+            return None
+        val_str = str(val).upper()
+        if "SIM" in val_str or val_str == "1":
+            return True
+        elif "NAO" in val_str or "NÃO" in val_str or val_str == "2":
+            return False
+        return None
     
-    combined = f"{local_detalhado}|{local_primario}|{local_propagacao}|{tipo_histologico}|{lateralidade}|{tnm}|{ptnm}|{estadiamento}"
-    return hashlib.md5(combined.encode('utf-8')).hexdigest()
+    dim['historico_familiar'] = map_distinct(dim['historico_familiar'], to_boolean)
+    dim['alcoolismo'] = map_distinct(dim['alcoolismo'], to_boolean)
+    dim['tabagismo'] = map_distinct(dim['tabagismo'], to_boolean)
+    return dim
 
 
-def hash_fatores_risco(historico_familiar, alcoolismo, tabagismo):
-    """HASH PARA dim_fatores_risco"""
-    historico_familiar = _normalize_for_hash(historico_familiar)
-    alcoolismo = _normalize_for_hash(alcoolismo)
-    tabagismo = _normalize_for_hash(tabagismo)
+_FINALIZERS = {
+    "dim_paciente": _finalize_paciente,
+    "dim_fatores_risco": _finalize_fatores_risco,
+}
+
+# Ordem final das colunas no CSV (hash_key primeiro)
+_OUTPUT_ORDER = {
+    "dim_tempo": ['hash_key', 'ano_primeiro_diagnostico', 'mes', 'data_completa'],
+}
+
+
+def finalize_dimension(dim: pd.DataFrame, dim_name: str) -> pd.DataFrame:
+    """Aplica as transformações para o banco e reordena (hash_key primeiro)."""
+    finalizer = _FINALIZERS.get(dim_name)
+    if finalizer is not None:
+        dim = finalizer(dim)
     
-    combined = f"{historico_familiar}|{alcoolismo}|{tabagismo}"
-    return hashlib.md5(combined.encode('utf-8')).hexdigest()
+    ordem = _OUTPUT_ORDER.get(dim_name, ['hash_key'] + DIMENSION_COLUMNS[dim_name])
+    if 'id' in dim.columns:
+        ordem = ['id'] + ordem
+    return dim[ordem]
 
 
-def hash_ocupacao(ocupacao):
-    """HASH PARA dim_ocupacao"""
-    ocupacao = _normalize_for_hash(ocupacao)
-    combined = f"{ocupacao}"
-    return hashlib.md5(combined.encode('utf-8')).hexdigest()
+# ==============================================================================
+# IDS INTEIROS (REGISTRO DE CHAVES)
+# ==============================================================================
+#
+# Com --ids-inteiros cada dimensão ganha a coluna id (inteiro denso) ao lado
+# da hash_key, e a fato recebe as FKs já como int32: sem as strings MD5 de
+# 32 caracteres na fato e sem o mapeamento hash -> id no banco.
+#
+# O registro hash_key -> id fica em dimensions/.registro_ids/, separado das
+# dimensões, e só cresce: uma execução que não vê uma combinação não apaga
+# o id dela, e quando a combinação volta ela recebe o mesmo id. As novas
+# recebem o próximo id depois do maior já atribuído (proximos.json), na
+# ordem da primeira ocorrência; ids nunca são reaproveitados.
+#
+# ==============================================================================
 
+ID_DTYPE = "int32"
+REGISTRY_DIR = ".registro_ids"
+REGISTRY_NEXT = "proximos.json"
 
-def hash_tempo(data_completa, ano, mes):
-    """HASH PARA dim_tempo"""
-    data_completa = _normalize_for_hash(data_completa)
-    ano = _normalize_for_hash(ano)
-    mes = _normalize_for_hash(mes)
-    
-    combined = f"{data_completa}|{ano}|{mes}"
-    return hashlib.md5(combined.encode('utf-8')).hexdigest()
+
+def _registry_file(dimensions_dir: Path, dim_name: str) -> Path:
+    # Sempre CSV: o registro vale para os dois formatos das dimensões
+    return table_file(Path(dimensions_dir) / REGISTRY_DIR, dim_name, "csv")
 
 
-def hash_tratamento(data_primeiro_contato, data_inicio_tratamento, tipo_tratamento,
-                   estado_final_tratamento, razao_termino, antecedente_tratamento):
-    """HASH PARA dim_tratamento"""
-    data_primeiro_contato = _normalize_for_hash(data_primeiro_contato)
-    data_inicio_tratamento = _normalize_for_hash(data_inicio_tratamento)
-    tipo_tratamento = _normalize_for_hash(tipo_tratamento)
-    estado_final_tratamento = _normalize_for_hash(estado_final_tratamento)
-    razao_termino = _normalize_for_hash(razao_termino)
-    antecedente_tratamento = _normalize_for_hash(antecedente_tratamento)
+def load_id_registry(dimensions_dir: Path, formato: str = "csv") -> dict:
+    """
+    Lê o registro de ids (dimensions/.registro_ids/).
     
-    combined = f"{data_primeiro_contato}|{data_inicio_tratamento}|{tipo_tratamento}|{estado_final_tratamento}|{razao_termino}|{antecedente_tratamento}"
-    return hashlib.md5(combined.encode('utf-8')).hexdigest()
+    Sem registro para uma dimensão (dimensões gravadas com --ids-inteiros
+    antes do registro existir), os ids da dimensão gravada entram no
+    registro e são salvos na próxima save_id_registry.
+    
+    Returns:
+        dict: dim_name -> {"ids": {hash_key: id}, "proximo": próximo id livre,
+              "novos": hash_keys registradas nesta execução}
+    """
+    registro_dir = Path(dimensions_dir) / REGISTRY_DIR
+    proximos = {}
+    if (registro_dir / REGISTRY_NEXT).exists():
+        with open(registro_dir / REGISTRY_NEXT, 'r') as f:
+            proximos = json.load(f)
+    
+    registro = {}
+    for dim_name in DIMENSION_KEYS:
+        arquivo = _registry_file(dimensions_dir, dim_name)
+        novos = []
+        if not arquivo.exists():
+            # Migração: ids já gravados na dimensão
+            arquivo = table_file(dimensions_dir, dim_name, formato)
+        ids = {}
+        if arquivo.exists() and 'id' in table_columns(arquivo):
+            tabela = read_table(arquivo, ['id', 'hash_key'], {'hash_key': "str"})
+            ids = dict(zip(tabela['hash_key'], pd.to_numeric(tabela['id']).astype('int64')))
+            if arquivo != _registry_file(dimensions_dir, dim_name):
+                novos = list(ids)
+        proximo = max(max(ids.values(), default=0) + 1, proximos.get(dim_name, 1))
+        registro[dim_name] = {"ids": ids, "proximo": proximo, "novos": novos}
+    return registro
+
+
+def save_id_registry(dimensions_dir: Path, registro: dict):
+    """
+    Acrescenta ao registro as hash_keys novas de cada dimensão e grava os
+    próximos ids livres. Cada arquivo é trocado de forma atômica
+    (temporário + os.replace); as linhas já registradas são copiadas como
+    estão (ver TableAppender).
+    
+    Chame ANTES de gravar as dimensões: assim nenhum id gravado fica fora
+    do registro.
+    """
+    registro_dir = Path(dimensions_dir) / REGISTRY_DIR
+    registro_dir.mkdir(parents=True, exist_ok=True)
+    
+    for dim_name, registro_dim in registro.items():
+        if not registro_dim["novos"]:
+            continue
+        arquivo = _registry_file(dimensions_dir, dim_name)
+        ids = registro_dim["ids"]
+        novos = pd.DataFrame({
+            'hash_key': registro_dim["novos"],
+            'id': np.array([ids[h] for h in registro_dim["novos"]], dtype=ID_DTYPE),
+        })
+        temp_file = arquivo.with_name(arquivo.name + ".tmp")
+        with TableAppender(temp_file, base=arquivo if arquivo.exists() else None) as saida:
+            saida.append(novos)
+        os.replace(temp_file, arquivo)
+        registro_dim["novos"] = []
+    
+    temp_file = registro_dir / (REGISTRY_NEXT + ".tmp")
+    with open(temp_file, 'w') as f:
+        json.dump({dim_name: r["proximo"] for dim_name, r in registro.items()}, f, indent=2)
+    os.replace(temp_file, registro_dir / REGISTRY_NEXT)
+
+
+def load_dimension_ids(dimensions_dir: Path, formato: str = "csv") -> dict:
+    """
+    ids das dimensões gravadas em dimensions_dir (as que a fato referencia),
+    no mesmo formato de load_id_registry (para lookup_ids).
+    """
+    registro = {}
+    for dim_name in DIMENSION_KEYS:
+        dim_file = table_file(dimensions_dir, dim_name, formato)
+        ids = {}
+        if dim_file.exists() and 'id' in table_columns(dim_file):
+            dim = read_table(dim_file, ['id', 'hash_key'], {'hash_key': "str"})
+            ids = dict(zip(dim['hash_key'], pd.to_numeric(dim['id']).astype('int64')))
+        registro[dim_name] = {"ids": ids, "proximo": max(ids.values(), default=0) + 1,
+                              "novos": []}
+    return registro
+
+
+def registry_has_ids(dimensions_dir: Path, formato: str = "csv") -> bool:
+    """True se as dimensões existentes foram gravadas com a coluna id."""
+    dim_file = table_file(dimensions_dir, next(iter(DIMENSION_KEYS)), formato)
+    return dim_file.exists() and 'id' in table_columns(dim_file)
+
+
+def assign_ids(registro_dim: dict, hashes) -> np.ndarray:
+    """
+    id de cada hash_key (valores distintos): as já registradas mantêm o id,
+    as novas recebem o próximo e entram no registro (salvo por
+    save_id_registry).
+    """
+    ids = registro_dim["ids"]
+    resultado = np.empty(len(hashes), dtype=ID_DTYPE)
+    for i, hash_key in enumerate(hashes):
+        id_ = ids.get(hash_key)
+        if id_ is None:
+            id_ = ids[hash_key] = registro_dim["proximo"]
+            registro_dim["proximo"] += 1
+            registro_dim["novos"].append(hash_key)
+        resultado[i] = id_
+    return resultado
+
+
+def lookup_ids(registro_dim: dict, hashes, dim_name: str) -> np.ndarray:
+    """id de cada hash_key (valores distintos); erro se alguma não estiver registrada."""
+    ids = registro_dim["ids"]
+    faltando = [h for h in hashes if h not in ids]
+    if faltando:
+        raise ValueError(
+            f"{len(faltando):,} hash_keys sem id em {dim_name} (ex.: {faltando[0]}). "
+            f"Execute novamente: python scripts/etl_dimensions.py --ids-inteiros"
+        )
+    return np.array([ids[h] for h in hashes], dtype=ID_DTYPE)
+
+
+def add_ids(dimensoes: dict, registro: dict) -> dict:
+    """Acrescenta a coluna id (primeira) a cada dimensão final."""
+    for dim_name, dim in dimensoes.items():
+        dim.insert(0, 'id', assign_ids(registro[dim_name], dim['hash_key']))
+    return dimensoes
 
 
 # ==============================================================================
 # FUNÇÕES DE CRIAÇÃO DE DIMENSÕES
 # ==============================================================================
 
-def create_dim_paciente(df: pd.DataFrame) -> pd.DataFrame:
-    """Cria dim_paciente"""
-    print("   [1/8] Criando dim_paciente...")
-    
-    # Selecionar colunas necessárias
-    cols = ["sexo", "idade", "raca_cor", "instrucao", "estado_conjugal"]
-    dim = df[cols].copy()
-    
-    # Renomear para schema do banco
-    dim.columns = ["sexo", "idade", "raca_cor", "nivel_instrucao", "estado_civil"]
-    
-    # GERAR HASH_KEY usando valores BRUTOS
+def create_dimension(df: pd.DataFrame, dim_name: str) -> pd.DataFrame:
+    """Cria uma dimensão a partir do data_processed."""
     print("      Gerando hash_keys...")
-    dim['hash_key'] = [
-        hash_paciente(row['sexo'], row['idade'], row['raca_cor'], 
-                     row['nivel_instrucao'], row['estado_civil'])
-        for _, row in dim.iterrows()
-    ]
-    
-    # Remover duplicatas baseado no hash
-    antes = len(dim)
-    dim = dim.drop_duplicates(subset=['hash_key'], keep='first').reset_index(drop=True)
-    print(f"      Duplicatas removidas: {antes - len(dim):,}")
-    
-    # AGORA aplicar transformações para o banco (após gerar hash!)
-    # Converter sexo para CHAR(1): M/F
-    dim['sexo'] = dim['sexo'].map(
-        lambda x: 'M' if pd.notna(x) and 'MASC' in str(x).upper() 
-                  else ('F' if pd.notna(x) and 'FEM' in str(x).upper() else None)
-    )
+    dim, _, _ = extract_dimension(df, dim_name)
+    print(f"      Duplicatas removidas: {len(df) - len(dim):,}")
     
-    # Converter idade para SMALLINT
-    dim['idade'] = pd.to_numeric(dim['idade'], errors='coerce')
-    
-    # Reordenar: hash_key primeiro
-    dim = dim[['hash_key', 'sexo', 'idade', 'raca_cor', 'nivel_instrucao', 'estado_civil']]
+    dim = finalize_dimension(dim, dim_name)
     
     print(f"      [OK] {len(dim):,} registros unicos")
     return dim
 
 
+def create_dim_paciente(df: pd.DataFrame) -> pd.DataFrame:
+    """Cria dim_paciente"""
+    print("   [1/8] Criando dim_paciente...")
+    return create_dimension(df, "dim_paciente")
+
+
 def create_dim_localizacao(df: pd.DataFrame) -> pd.DataFrame:
     """Cria dim_localizacao"""
     print("   [2/8] Criando dim_localizacao...")
-    
-    cols = ["local_nascimento", "estado_residencia", "procedencia"]
-    dim = df[cols].copy()
-    dim.columns = ["cidade_nascimento", "estado_residencia", "procedencia"]
-    
-    # Gerar hash
-    print("      Gerando hash_keys...")
-    dim['hash_key'] = [
-        hash_localizacao(row['cidade_nascimento'], row['estado_residencia'], row['procedencia'])
-        for _, row in dim.iterrows()
-    ]
-    
-    # Remover duplicatas
-    antes = len(dim)
-    dim = dim.drop_duplicates(subset=['hash_key'], keep='first').reset_index(drop=True)
-    print(f"      Duplicatas removidas: {antes - len(dim):,}")
-    
-    # Reordenar
-    dim = dim[['hash_key', 'cidade_nascimento', 'estado_residencia', 'procedencia']]
-    
-    print(f"      [OK] {len(dim):,} registros unicos")
-    return dim
+    return create_dimension(df, "dim_localizacao")
 
 
 def create_dim_instituicao(df: pd.DataFrame) -> pd.DataFrame:
     """Cria dim_instituicao"""
     print("   [3/8] Criando dim_instituicao...")
-    
-    cols = ["clinica_atendimento", "clinica_tratamento", "cnes", 
-            "uf_unidade_hospitalar", "municipio_unidade_hospitalar"]
-    dim = df[cols].copy()
-    dim.columns = ["codigo_atendimento", "codigo_tratamento", "cnes", "uf", "municipio"]
-    
-    # Gerar hash
-    print("      Gerando hash_keys...")
-    dim['hash_key'] = [
-        hash_instituicao(row['codigo_atendimento'], row['codigo_tratamento'], 
-                        row['cnes'], row['uf'], row['municipio'])
-        for _, row in dim.iterrows()
-    ]
-    
-    # Remover duplicatas
-    antes = len(dim)
-    dim = dim.drop_duplicates(subset=['hash_key'], keep='first').reset_index(drop=True)
-    print(f"      Duplicatas removidas: {antes - len(dim):,}")
-    
-    # Reordenar
-    dim = dim[['hash_key', 'codigo_atendimento', 'codigo_tratamento', 'cnes', 'uf', 'municipio']]
-    
-    print(f"      [OK] {len(dim):,} registros unicos")
-    return dim
+    return create_dimension(df, "dim_instituicao")
 
 
 def create_dim_tumor(df: pd.DataFrame) -> pd.DataFrame:
     """Cria dim_tumor"""
     print("   [4/8] Criando dim_tumor...")
-    
-    cols = ["localizacao_tumor_detalhada", "localizacao_tumor_primaria", 
-            "localizacao_tumor_procedimento", "tipo_histologico", 
-            "lateralidade", "tnm", "ptnm", "estadiamento"]
-    dim = df[cols].copy()
-    dim.columns = ["local_detalhado", "local_primario", "local_propagacao",
-                   "tipo_histologico", "lateralidade", "tnm", "ptnm", "estadiamento"]
-    
-    # Gerar hash
-    print("      Gerando hash_keys...")
-    dim['hash_key'] = [
-        hash_tumor(row['local_detalhado'], row['local_primario'], row['local_propagacao'],
-                  row['tipo_histologico'], row['lateralidade'], row['tnm'], 
-                  row['ptnm'], row['estadiamento'])
-        for _, row in dim.iterrows()
-    ]
-    
-    # Remover duplicatas
-    antes = len(dim)
-    dim = dim.drop_duplicates(subset=['hash_key'], keep='first').reset_index(drop=True)
-    print(f"      Duplicatas removidas: {antes - len(dim):,}")
-    
-    # Reordenar
-    dim = dim[['hash_key', 'local_detalhado', 'local_primario', 'local_propagacao',
-               'tipo_histologico', 'lateralidade', 'tnm', 'ptnm', 'estadiamento']]
-    
-    print(f"      [OK] {len(dim):,} registros unicos")
-    return dim
+    return create_dimension(df, "dim_tumor")
 
 
 def create_dim_fatores_risco(df: pd.DataFrame) -> pd.DataFrame:
     """Cria dim_fatores_risco"""
     print("   [5/8] Criando dim_fatores_risco...")
-    
-    cols = ["historico_familiar", "alcoolismo", "tabagismo"]
-    dim = df[cols].copy()
-    
-    # Gerar hash ANTES de converter para boolean
-    print("      Gerando hash_keys...")
-    dim['hash_key'] = [
-        hash_fatores_risco(row['historico_familiar'], row['alcoolismo'], row['tabagismo'])
-        for _, row in dim.iterrows()
-    ]
-    
-    # Remover duplicatas
-    antes = len(dim)
-    dim = dim.drop_duplicates(subset=['hash_key'], keep='first').reset_index(drop=True)
-    print(f"      Duplicatas removidas: {antes - len(dim):,}")
-    
-    # AGORA converter para BOOLEAN (após gerar hash!)
-    def to_boolean(val):
-        if pd.isna(val):
-            return None
-        val_str = str(val).upper()
-        if "SIM" in val_str or val_str == "1":
-            return True
-        elif "NAO" in val_str or "NÃO" in val_str or val_str == "2":
-            return False
-        return None
-    
-    dim['historico_familiar'] = dim['historico_familiar'].apply(to_boolean)
-    dim['alcoolismo'] = dim['alcoolismo'].apply(to_boolean)
-    dim['tabagismo'] = dim['tabagismo'].apply(to_boolean)
-    
-    # Reordenar
-    dim = dim[['hash_key', 'historico_familiar', 'alcoolismo', 'tabagismo']]
-    
-    print(f"      [OK] {len(dim):,} registros unicos")
-    return dim
+    return create_dimension(df, "dim_fatores_risco")
 
 
 def create_dim_ocupacao(df: pd.DataFrame) -> pd.DataFrame:
     """Cria dim_ocupacao"""
     print("   [6/8] Criando dim_ocupacao...")
-    
-    dim = df[['ocupacao']].copy()
-    
-    # Gerar hash
-    print("      Gerando hash_keys...")
-    dim['hash_key'] = [hash_ocupacao(row['ocupacao']) for _, row in dim.iterrows()]
-    
-    # Remover duplicatas
-    antes = len(dim)
-    dim = dim.drop_duplicates(subset=['hash_key'], keep='first').reset_index(drop=True)
-    print(f"      Duplicatas removidas: {antes - len(dim):,}")
-    
-    # Reordenar
-    dim = dim[['hash_key', 'ocupacao']]
-    
-    print(f"      [OK] {len(dim):,} registros unicos")
-    return dim
+    return create_dimension(df, "dim_ocupacao")
 
 
 def create_dim_tempo(df: pd.DataFrame) -> pd.DataFrame:
     """Cria dim_tempo"""
     print("   [7/8] Criando dim_tempo...")
-    
-    # Extrair datas válidas
-    dates = pd.to_datetime(df['data_diagnostico'], errors='coerce')
-    
-    dim = pd.DataFrame({
-        'data_completa': dates.dt.strftime('%Y-%m-%d'),
-        'ano_primeiro_diagnostico': dates.dt.year,
-        'mes': dates.dt.month
-    })
-    
-    # Gerar hash
-    print("      Gerando hash_keys...")
-    dim['hash_key'] = [
-        hash_tempo(row['data_completa'], row['ano_primeiro_diagnostico'], row['mes'])
-        for _, row in dim.iterrows()
-    ]
-    
-    # Remover duplicatas
-    antes = len(dim)
-    dim = dim.drop_duplicates(subset=['hash_key'], keep='first').reset_index(drop=True)
-    print(f"      Duplicatas removidas: {antes - len(dim):,}")
-    
-    # Reordenar
-    dim = dim[['hash_key', 'ano_primeiro_diagnostico', 'mes', 'data_completa']]
-    
-    print(f"      [OK] {len(dim):,} registros unicos")
-    return dim
+    return create_dimension(df, "dim_tempo")
 
 
 def create_dim_tratamento(df: pd.DataFrame) -> pd.DataFrame:
     """Cria dim_tratamento"""
     print("   [8/8] Criando dim_tratamento...")
+    return create_dimension(df, "dim_tratamento")
+
+
+# ==============================================================================
+# ACUMULADOR INCREMENTAL DE DIMENSÕES
+# ==============================================================================
+#
+# Permite montar as dimensões lote a lote (arquivo a arquivo) sem manter
+# todo o histórico em memória: guarda apenas as hash_keys já vistas e as
+# combinações distintas de cada dimensão, na ordem da primeira ocorrência.
+#
+# ==============================================================================
+
+def new_dimension_store(registro: dict = None) -> dict:
+    """
+    Cria um acumulador vazio para as 8 dimensões.
     
-    cols = ["data_primeiro_contato_alt", "data_inicio_tratamento_alt",
-            "primeiro_tratamento_hospital", "estado_final_tratamento",
-            "razao_nao_tratamento", "diagnostico_anterior"]
-    dim = df[cols].copy()
-    dim.columns = ["data_primeiro_contato", "data_inicio_tratamento",
-                   "tipo_tratamento", "estado_final_tratamento",
-                   "razao_termino", "antecedente_tratamento"]
+    Com `registro` (ver load_id_registry), cada combinação nova recebe um id
+    inteiro já ao ser vista, e update_dimension_store devolve as FKs como ids.
+    """
+    return {
+        dim_name: {
+            "hashes": set(),
+            "partes": [],
+            "registro": registro[dim_name] if registro is not None else None,
+        }
+        for dim_name in DIMENSION_KEYS
+    }
+
+
+def update_dimension_store(store: dict, df: pd.DataFrame) -> dict:
+    """
+    Adiciona ao acumulador as combinações de df ainda não vistas.
     
-    # Gerar hash
-    print("      Gerando hash_keys...")
-    dim['hash_key'] = [
-        hash_tratamento(row['data_primeiro_contato'], row['data_inicio_tratamento'],
-                       row['tipo_tratamento'], row['estado_final_tratamento'],
-                       row['razao_termino'], row['antecedente_tratamento'])
-        for _, row in dim.iterrows()
-    ]
-    
-    # Remover duplicatas
-    antes = len(dim)
-    dim = dim.drop_duplicates(subset=['hash_key'], keep='first').reset_index(drop=True)
-    print(f"      Duplicatas removidas: {antes - len(dim):,}")
-    
-    # Reordenar
-    dim = dim[['hash_key', 'data_primeiro_contato', 'data_inicio_tratamento',
-               'tipo_tratamento', 'estado_final_tratamento', 'razao_termino', 
-               'antecedente_tratamento']]
+    Returns:
+        dict: coluna FK da fato (ex.: 'paciente_id') -> hash_key de cada linha
+              de df (ou o id int32, se o acumulador tiver registro de ids)
+    """
+    chaves = {}
+    
+    for dim_name, (fact_col, _) in DIMENSION_KEYS.items():
+        dim, codigos, hashes = extract_dimension(df, dim_name)
+        estado = store[dim_name]
+        
+        if estado["registro"] is not None:
+            ids = assign_ids(estado["registro"], hashes)
+            dim['id'] = ids
+            chaves[fact_col] = pd.Series(ids[codigos], index=df.index)
+        else:
+            chaves[fact_col] = hash_categorical(codigos, hashes, df.index)
+        
+        vistos = estado["hashes"]
+        novas = [h not in vistos for h in dim['hash_key']]
+        
+        if any(novas):
+            dim = dim[novas]
+            vistos.update(dim['hash_key'])
+            estado["partes"].append(dim)
+    
+    return chaves
+
+
+def finalize_dimension_store(store: dict) -> dict:
+    """Consolida o acumulador em dimensões finais (dim_name -> DataFrame)."""
+    dimensoes = {}
+    
+    for dim_name in DIMENSION_KEYS:
+        partes = store[dim_name]["partes"]
+        if partes:
+            dim = concat_tables(partes)
+        else:
+            colunas = DIMENSION_COLUMNS[dim_name] + ['hash_key']
+            if store[dim_name]["registro"] is not None:
+                colunas.append('id')
+            dim = pd.DataFrame(columns=colunas)
+        dimensoes[dim_name] = finalize_dimension(dim, dim_name)
+    
+    return dimensoes
+
+
+def seed_dimension_store(store: dict, dimensions_dir: Path, formato: str = "csv") -> dict:
+    """
+    Marca como já vistas as hash_keys das dimensões existentes em
+    dimensions_dir (modo incremental): update_dimension_store passa a
+    acumular só as combinações que ainda não estão nos arquivos.
     
-    print(f"      [OK] {len(dim):,} registros unicos")
-    return dim
+    Returns:
+        dict: dim_name -> registros já existentes
+    """
+    existentes = {}
+    for dim_name in DIMENSION_KEYS:
+        dim_file = table_file(dimensions_dir, dim_name, formato)
+        hashes = read_table(dim_file, ['hash_key'], {'hash_key': "str"})['hash_key']
+        store[dim_name]["hashes"].update(hashes.dropna())
+        existentes[dim_name] = len(hashes)
+    return existentes
+
+
+# ==============================================================================
+# GRAVAÇÃO
+# ==============================================================================
+
+def save_dimensions(dimensoes: dict, dimensions_dir: Path, formato: str = "csv",
+                    pendentes: list = None):
+    """
+    Salva cada dimensão em dimensions_dir/<dim_name>.<formato>.
+    
+    Com `pendentes` (lista), cada dimensão é gravada em um temporário e o
+    par (temporario, arquivo) é acrescentado à lista: quem chamou faz as
+    trocas depois de gravar todas as tabelas (ver etl_star.py).
+    """
+    for dim_name, dim_df in dimensoes.items():
+        output_file = table_file(dimensions_dir, dim_name, formato)
+        print(f"   Salvando {output_file.name}... ({len(dim_df):,} registros)")
+        if pendentes is None:
+            write_table(dim_df, output_file)
+        else:
+            temp_file = output_file.with_name(output_file.name + ".tmp")
+            write_table(dim_df, temp_file)
+            pendentes.append((temp_file, output_file))
+
+
+def append_dimensions(dimensoes: dict, dimensions_dir: Path, formato: str = "csv",
+                      pendentes: list = None):
+    """
+    Acrescenta as linhas novas de cada dimensão ao fim do arquivo existente.
+    
+    As linhas já gravadas são copiadas sem reprocessamento (ver
+    TableAppender) para um temporário, que substitui o arquivo no final
+    (ou entra em `pendentes`, como em save_dimensions).
+    """
+    for dim_name, dim_df in dimensoes.items():
+        output_file = table_file(dimensions_dir, dim_name, formato)
+        if dim_df.empty:
+            print(f"   {output_file.name}: nenhum registro novo")
+            continue
+        
+        print(f"   Acrescentando a {output_file.name}... ({len(dim_df):,} registros novos)")
+        temp_file = output_file.with_name(output_file.name + ".tmp")
+        with TableAppender(temp_file, base=output_file) as saida:
+            saida.append(dim_df)
+        if pendentes is None:
+            temp_file.replace(output_file)
+        else:
+            pendentes.append((temp_file, output_file))
 
 
 # ==============================================================================
 # MAIN
 # ==============================================================================
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Cria as tabelas de dimensao do modelo estrela.")
+    parser.add_argument(
+        "--streaming", action="store_true",
+        help="Le os CSVs em chunks e acumula so as combinacoes distintas "
+             "(memoria limitada pela cardinalidade das dimensoes + 1 chunk)"
+    )
+    parser.add_argument(
+        "--chunksize", type=int, default=200_000,
+        help="Registros por chunk no modo --streaming (padrao: 200000)"
+    )
+    parser.add_argument(
+        "--formato", choices=FORMATOS, default="csv",
+        help="Formato de data_processed/ e das dimensoes geradas (padrao: csv)"
+    )
+    parser.add_argument(
+        "--ids-inteiros", action="store_true",
+        help="Grava em cada dimensao a coluna id (inteiro, estavel entre "
+             "execucoes) para a fato usar FKs inteiras (etl_fact.py --ids-inteiros)"
+    )
+    return parser.parse_args()
+
+
+def build_dimensions_streaming(csv_files: list, chunksize: int, registro: dict = None) -> tuple:
+    """
+    Cria as dimensões lendo os CSVs em chunks, sem concatenar o histórico.
+    
+    Returns:
+        tuple: (dimensoes: dict dim_name -> DataFrame, total de registros lidos)
+    """
+    store = new_dimension_store(registro)
+    total = 0
+    
+    for csv_file in csv_files:
+        print(f"   Processando {csv_file.name}...")
+        for chunk in iter_table_chunks(csv_file, chunksize, SOURCE_COLUMNS, CLEANED_SCHEMA):
+            update_dimension_store(store, chunk)
+            total += len(chunk)
+        print(f"      Registros acumulados: {total:,}")
+    
+    print("\n   Consolidando dimensoes...")
+    dimensoes = finalize_dimension_store(store)
+    for dim_name, dim_df in dimensoes.items():
+        print(f"      {dim_name}: {len(dim_df):,} registros unicos")
+    
+    return dimensoes, total
+
+
 def main():
     """Processa os dados limpos e cria todas as dimensões."""
+    args = parse_args()
+    
     print("=" * 70)
     print("ETL - CRIACAO DAS DIMENSOES")
     print("=" * 70)
@@ -441,7 +602,7 @@ def main():
     
     # Carregar todos os arquivos processados
     print("\nCarregando arquivos processados...")
-    csv_files = sorted(data_processed_dir.glob("rhc*.csv"))
+    csv_files = list_table_files(data_processed_dir, "rhc", args.formato)
     
     if not csv_files:
         print("ERRO: Nenhum arquivo encontrado em data_processed/")
@@ -449,60 +610,67 @@ def main():
     
     print(f"Arquivos encontrados: {len(csv_files)}")
     
-    # Consolidar todos em um único DataFrame
-    dfs = []
-    for csv_file in csv_files:
-        print(f"   Carregando {csv_file.name}...")
-        df = pd.read_csv(csv_file)
-        dfs.append(df)
-    
-    df_all = pd.concat(dfs, ignore_index=True)
-    print(f"\nTotal de registros: {len(df_all):,}")
-    
-    # Criar dimensões
-    print("\n" + "-" * 70)
-    print("CRIANDO DIMENSOES")
-    print("-" * 70)
-    
-    dim_paciente = create_dim_paciente(df_all)
-    dim_localizacao = create_dim_localizacao(df_all)
-    dim_instituicao = create_dim_instituicao(df_all)
-    dim_tumor = create_dim_tumor(df_all)
-    dim_fatores_risco = create_dim_fatores_risco(df_all)
-    dim_ocupacao = create_dim_ocupacao(df_all)
-    dim_tempo = create_dim_tempo(df_all)
-    dim_tratamento = create_dim_tratamento(df_all)
+    # Ids já atribuídos (mantidos entre execuções)
+    registro = load_id_registry(dimensions_dir, args.formato) if args.ids_inteiros else None
+    
+    if args.streaming:
+        # Modo streaming: chunks + combinações distintas, sem df_all
+        print("\n" + "-" * 70)
+        print(f"CRIANDO DIMENSOES (STREAMING, chunks de {args.chunksize:,})")
+        print("-" * 70)
+        
+        dimensoes, total_registros = build_dimensions_streaming(csv_files, args.chunksize, registro)
+    else:
+        # Consolidar todos em um único DataFrame
+        dfs = []
+        for csv_file in csv_files:
+            print(f"   Carregando {csv_file.name}...")
+            df = read_table(csv_file, SOURCE_COLUMNS, CLEANED_SCHEMA)
+            dfs.append(df)
+        
+        # As colunas de texto seguem categóricas (CLEANED_SCHEMA): df_all
+        # guarda um código inteiro por linha e as categorias uma vez só
+        df_all = concat_tables(dfs)
+        total_registros = len(df_all)
+        print(f"\nTotal de registros: {total_registros:,}")
+        
+        # Criar dimensões
+        print("\n" + "-" * 70)
+        print("CRIANDO DIMENSOES")
+        print("-" * 70)
+        
+        dimensoes = {
+            'dim_paciente': create_dim_paciente(df_all),
+            'dim_localizacao': create_dim_localizacao(df_all),
+            'dim_instituicao': create_dim_instituicao(df_all),
+            'dim_tumor': create_dim_tumor(df_all),
+            'dim_fatores_risco': create_dim_fatores_risco(df_all),
+            'dim_ocupacao': create_dim_ocupacao(df_all),
+            'dim_tempo': create_dim_tempo(df_all),
+            'dim_tratamento': create_dim_tratamento(df_all)
+        }
+        
+        if registro is not None:
+            dimensoes = add_ids(dimensoes, registro)
     
     # Salvar dimensões
     print("\n" + "-" * 70)
     print("SALVANDO DIMENSOES")
     print("-" * 70)
     
-    dimensoes = {
-        'dim_paciente.csv': dim_paciente,
-        'dim_localizacao.csv': dim_localizacao,
-        'dim_instituicao.csv': dim_instituicao,
-        'dim_tumor.csv': dim_tumor,
-        'dim_fatores_risco.csv': dim_fatores_risco,
-        'dim_ocupacao.csv': dim_ocupacao,
-        'dim_tempo.csv': dim_tempo,
-        'dim_tratamento.csv': dim_tratamento
-    }
-    
-    for filename, dim_df in dimensoes.items():
-        output_path = dimensions_dir / filename
-        print(f"   Salvando {filename}... ({len(dim_df):,} registros)")
-        dim_df.to_csv(output_path, index=False, encoding='utf-8')
+    if registro is not None:
+        save_id_registry(dimensions_dir, registro)
+    save_dimensions(dimensoes, dimensions_dir, args.formato)
     
     # Resumo
     print("\n" + "=" * 70)
     print("RESUMO")
     print("=" * 70)
-    print(f"Registros no data_processed: {len(df_all):,}")
+    print(f"Registros no data_processed: {total_registros:,}")
     print(f"Dimensoes criadas: {len(dimensoes)}")
     print("\nTamanho das dimensoes:")
-    for filename, dim_df in dimensoes.items():
-        print(f"   {filename:30s} {len(dim_df):>10,} registros")
+    for dim_name, dim_df in dimensoes.items():
+        print(f"   {table_file(dimensions_dir, dim_name, args.formato).name:30s} {len(dim_df):>10,} registros")
     print("=" * 70)
     print("\nSUCESSO: Todas as dimensoes foram criadas!")
     sys.exit(0)
@@ -5,8 +5,8 @@ Este script cria a tabela fato fato_casos_oncologicos.
 
 ⚠️⚠️⚠️ ATENÇÃO CRÍTICA SOBRE HASHES ⚠️⚠️⚠️
 
-As funções de hash abaixo foram COPIADAS EXATAMENTE de etl_dimensions.py.
-NÃO MODIFIQUE NADA AQUI SEM MODIFICAR LÁ TAMBÉM!
+As funções de hash vêm de hash_keys.py, o MESMO módulo usado por
+etl_dimensions.py. NÃO altere a lógica de hash sem reprocessar tudo!
 
 Se os hashes não baterem, os JOINs retornarão 0 registros!
 
@@ -15,264 +15,209 @@ Data: Outubro 2025
 """
 
 import pandas as pd
-import hashlib
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+import argparse
 import json
+import os
 from datetime import datetime
 import sys
 
+from hash_keys import DIMENSION_KEYS, hash_columns, hash_tuples, key_frame
+from etl_cleaning import CLEANED_SCHEMA
+from etl_dimensions import (
+    SOURCE_COLUMNS as DIMENSION_SOURCE_COLUMNS,
+    load_dimension_ids, registry_has_ids, lookup_ids
+)
+from paralelo import add_workers_argument, resolve_workers, executar_com_log
+from storage import (
+    FORMATOS, table_file, file_checksum, list_table_files, read_table, write_table,
+    concat_tables, map_distinct
+)
+
 
 # ==============================================================================
-# FUNÇÕES DE HASH - COPIADAS DE etl_dimensions.py - NÃO MODIFICAR!
-# ==============================================================================
-# 
-# ⚠️⚠️⚠️ AVISO CRÍTICO ⚠️⚠️⚠️
-# 
-# Estas funções foram copiadas EXATAMENTE de etl_dimensions.py
-# 
-# SE VOCÊ MODIFICAR ALGO AQUI:
-# 1. Os hashes serão diferentes
-# 2. Os JOINs não funcionarão
-# 3. O dashboard ficará vazio
-# 4. Será necessário reprocessar TUDO
-# 
-# SE PRECISAR MUDAR:
-# 1. Modifique em etl_dimensions.py
-# 2. Copie e cole aqui
-# 3. Reprocesse dimensões E fato
-# 4. Recarregue no Supabase
-# 
+# COLUNAS DA FATO
 # ==============================================================================
 
-def _normalize_for_hash(value):
-    """
-    Normaliza um valor para geração de hash.
-    
-    REGRA: 
-    - None, NaN, "", "nan", "NaN", "NaT" → "NULL"
-    - Qualquer outro valor → string sem espaços extras
-    
-    ⚠️ NÃO MODIFICAR - COPIADO DE etl_dimensions.py
-    """
-    if pd.isna(value) or value is None or str(value).strip() in ["", "nan", "NaN", "NaT", "None"]:
-        return "NULL"
-    return str(value).strip()
-
-
-def hash_paciente(sexo, idade, raca_cor, nivel_instrucao, estado_civil):
-    """
-    HASH PARA dim_paciente
-    ⚠️ NÃO MODIFICAR - COPIADO DE etl_dimensions.py
-    """
-    sexo = _normalize_for_hash(sexo)
-    idade = _normalize_for_hash(idade)
-    raca_cor = _normalize_for_hash(raca_cor)
-    nivel_instrucao = _normalize_for_hash(nivel_instrucao)
-    estado_civil = _normalize_for_hash(estado_civil)
-    
-    combined = f"{sexo}|{idade}|{raca_cor}|{nivel_instrucao}|{estado_civil}"
-    return hashlib.md5(combined.encode('utf-8')).hexdigest()
-
+# Colunas do data_processed lidas por este script: as que alimentam os
+# hashes + as usadas nos atributos da fato
+SOURCE_COLUMNS = DIMENSION_SOURCE_COLUMNS + [
+    'tipo_caso', 'data_obito', 'valor_total', 'mais_um_tumor',
+    'origem_encaminhamento', 'exame_diagnostico', 'base_mais_importante',
+    'base_diagnostico_sp', 'outro_estadiamento'
+]
+
+# Tipos fixos da fato no Parquet (o tipo inferido pode mudar de um arquivo
+# para outro, e todas as partes da fato precisam do mesmo schema)
+FACT_COLUMN_TYPES = {
+    'case_code': "text",
+    'data_diagnostico': "date",
+    'data_obito': "date",
+    'valor_total': "float",
+    'multiplos_tumores': "text",
+    'orientacao': "text",
+    'exame_diagnostico': "text",
+    'diagnostico_anterior': "text",
+    'base_diagnostico': "text",
+    'base_diagnostico_suplementar': "text",
+    'outro_estadio': "text",
+}
+
+FK_COLUMNS = [fact_col for fact_col, _ in DIMENSION_KEYS.values()]
+
+# Releitura dos batches na consolidação: FKs e colunas de texto voltam como
+# categóricas de texto (sem isso o CSV infere "3" como 3.0 e a fato
+# consolidada sairia diferente da gerada pelo etl_star)
+FACT_BATCH_SCHEMA = {
+    col: "category"
+    for col in FK_COLUMNS + [col for col, tipo in FACT_COLUMN_TYPES.items() if tipo == "text"]
+}
+
+# Com --ids-inteiros as FKs são os ids int32 das dimensões: na releitura
+# voltam como Int32 (o CSV, sem schema, as leria como texto)
+FACT_BATCH_SCHEMA_IDS = {
+    **{col: tipo for col, tipo in FACT_BATCH_SCHEMA.items() if col not in FK_COLUMNS},
+    **{col: "Int32" for col in FK_COLUMNS},
+}
 
-def hash_localizacao(cidade_nascimento, estado_residencia, procedencia):
-    """HASH PARA dim_localizacao - ⚠️ NÃO MODIFICAR"""
-    cidade_nascimento = _normalize_for_hash(cidade_nascimento)
-    estado_residencia = _normalize_for_hash(estado_residencia)
-    procedencia = _normalize_for_hash(procedencia)
-    
-    combined = f"{cidade_nascimento}|{estado_residencia}|{procedencia}"
-    return hashlib.md5(combined.encode('utf-8')).hexdigest()
 
+# ==============================================================================
+# FUNÇÕES DE CHECKPOINT
+# ==============================================================================
 
-def hash_instituicao(codigo_atendimento, codigo_tratamento, cnes, uf, municipio):
-    """HASH PARA dim_instituicao - ⚠️ NÃO MODIFICAR"""
-    codigo_atendimento = _normalize_for_hash(codigo_atendimento)
-    codigo_tratamento = _normalize_for_hash(codigo_tratamento)
-    cnes = _normalize_for_hash(cnes)
-    uf = _normalize_for_hash(uf)
-    municipio = _normalize_for_hash(municipio)
-    
-    combined = f"{codigo_atendimento}|{codigo_tratamento}|{cnes}|{uf}|{municipio}"
-    return hashlib.md5(combined.encode('utf-8')).hexdigest()
+def load_checkpoint(checkpoint_file: Path) -> dict:
+    """Carrega checkpoint do processamento."""
+    if checkpoint_file.exists():
+        with open(checkpoint_file, 'r') as f:
+            return json.load(f)
+    return {"processed_files": [], "last_update": None}
 
 
-def hash_tumor(local_detalhado, local_primario, local_propagacao, tipo_histologico, 
-               lateralidade, tnm, ptnm, estadiamento):
-    """HASH PARA dim_tumor - ⚠️ NÃO MODIFICAR"""
-    local_detalhado = _normalize_for_hash(local_detalhado)
-    local_primario = _normalize_for_hash(local_primario)
-    local_propagacao = _normalize_for_hash(local_propagacao)
-    tipo_histologico = _normalize_for_hash(tipo_histologico)
-    lateralidade = _normalize_for_hash(lateralidade)
-    tnm = _normalize_for_hash(tnm)
-    ptnm = _normalize_for_hash(ptnm)
-    estadiamento = _normalize_for_hash(estadiamento)
+def save_checkpoint(checkpoint_file: Path, checkpoint_data: dict):
+    """
+    Salva checkpoint do processamento.
     
-    combined = f"{local_detalhado}|{local_primario}|{local_propagacao}|{tipo_histologico}|{lateralidade}|{tnm}|{ptnm}|{estadiamento}"
-    return hashlib.md5(combined.encode('utf-8')).hexdigest()
+    A gravação é atômica: o JSON vai para um arquivo temporário que só então
+    substitui o checkpoint (os.replace). Uma interrupção no meio da escrita
+    deixa o checkpoint anterior intacto, nunca um JSON truncado.
+    """
+    checkpoint_data["last_update"] = datetime.now().isoformat()
+    temp_file = checkpoint_file.with_name(checkpoint_file.name + ".tmp")
+    with open(temp_file, 'w') as f:
+        json.dump(checkpoint_data, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_file, checkpoint_file)
 
 
-def hash_fatores_risco(historico_familiar, alcoolismo, tabagismo):
-    """HASH PARA dim_fatores_risco - ⚠️ NÃO MODIFICAR"""
-    historico_familiar = _normalize_for_hash(historico_familiar)
-    alcoolismo = _normalize_for_hash(alcoolismo)
-    tabagismo = _normalize_for_hash(tabagismo)
-    
-    combined = f"{historico_familiar}|{alcoolismo}|{tabagismo}"
-    return hashlib.md5(combined.encode('utf-8')).hexdigest()
+# ==============================================================================
+# ARQUIVOS INCLUÍDOS NA FATO (MODO INCREMENTAL)
+# ==============================================================================
+#
+# Ao final de cada execução completa, dimensions/.arquivos_fato.json guarda
+# os arquivos do data_processed que já estão na fato e nas dimensões. O
+# etl_star.py --incremental processa só os arquivos fora dessa lista.
+#
+# O manifesto é gravado por último, depois de todos os arquivos, e guarda
+# também o checksum (tamanho + sha256) da fato e de cada dimensão. Se a
+# execução parar no meio das trocas de arquivos, o checksum não bate e o
+# --incremental se recusa a continuar, em vez de acrescentar as mesmas
+# linhas de novo.
+#
+# ==============================================================================
 
+MANIFEST_NAME = ".arquivos_fato.json"
+MANIFEST_TABLES = ["fato_casos_oncologicos"] + list(DIMENSION_KEYS)
 
-def hash_ocupacao(ocupacao):
-    """HASH PARA dim_ocupacao - ⚠️ NÃO MODIFICAR"""
-    ocupacao = _normalize_for_hash(ocupacao)
-    combined = f"{ocupacao}"
-    return hashlib.md5(combined.encode('utf-8')).hexdigest()
 
+def load_manifest(dimensions_dir: Path):
+    """Arquivos já incluídos na fato (set de nomes), ou None se não houver registro."""
+    manifest_file = Path(dimensions_dir) / MANIFEST_NAME
+    if not manifest_file.exists():
+        return None
+    return set(load_checkpoint(manifest_file)["processed_files"])
 
-def hash_tempo(data_completa, ano, mes):
-    """HASH PARA dim_tempo - ⚠️ NÃO MODIFICAR"""
-    data_completa = _normalize_for_hash(data_completa)
-    ano = _normalize_for_hash(ano)
-    mes = _normalize_for_hash(mes)
-    
-    combined = f"{data_completa}|{ano}|{mes}"
-    return hashlib.md5(combined.encode('utf-8')).hexdigest()
 
+def save_manifest(dimensions_dir: Path, arquivos, formato: str = "csv"):
+    """
+    Registra os arquivos incluídos na fato e o checksum de cada tabela de
+    dimensions_dir (gravação atômica). Chame só depois de gravar todas as
+    tabelas.
+    """
+    checksums = {
+        nome: file_checksum(table_file(dimensions_dir, nome, formato))
+        for nome in MANIFEST_TABLES
+    }
+    save_checkpoint(Path(dimensions_dir) / MANIFEST_NAME,
+                    {"processed_files": sorted(arquivos), "checksums": checksums})
 
-def hash_tratamento(data_primeiro_contato, data_inicio_tratamento, tipo_tratamento,
-                   estado_final_tratamento, razao_termino, antecedente_tratamento):
-    """HASH PARA dim_tratamento - ⚠️ NÃO MODIFICAR"""
-    data_primeiro_contato = _normalize_for_hash(data_primeiro_contato)
-    data_inicio_tratamento = _normalize_for_hash(data_inicio_tratamento)
-    tipo_tratamento = _normalize_for_hash(tipo_tratamento)
-    estado_final_tratamento = _normalize_for_hash(estado_final_tratamento)
-    razao_termino = _normalize_for_hash(razao_termino)
-    antecedente_tratamento = _normalize_for_hash(antecedente_tratamento)
-    
-    combined = f"{data_primeiro_contato}|{data_inicio_tratamento}|{tipo_tratamento}|{estado_final_tratamento}|{razao_termino}|{antecedente_tratamento}"
-    return hashlib.md5(combined.encode('utf-8')).hexdigest()
 
+def remove_manifest(dimensions_dir: Path):
+    """Apaga o manifesto (antes de substituir as tabelas numa execução completa)."""
+    (Path(dimensions_dir) / MANIFEST_NAME).unlink(missing_ok=True)
 
-# ==============================================================================
-# FUNÇÕES DE CHECKPOINT
-# ==============================================================================
 
-def load_checkpoint(checkpoint_file: Path) -> dict:
-    """Carrega checkpoint do processamento."""
-    if checkpoint_file.exists():
-        with open(checkpoint_file, 'r') as f:
-            return json.load(f)
-    return {"processed_files": [], "last_update": None}
+def manifest_mismatches(dimensions_dir: Path, formato: str = "csv") -> list:
+    """
+    Tabelas de dimensions_dir cujo checksum não bate com o manifesto
+    (execução interrompida no meio das trocas de arquivos, ou tabelas
+    regravadas por etl_dimensions.py / etl_fact.py). Vazia se tudo bate.
+    """
+    esperado = load_checkpoint(Path(dimensions_dir) / MANIFEST_NAME).get("checksums")
+    if esperado is None:
+        # Manifesto sem checksums: não dá para conferir
+        return list(MANIFEST_TABLES)
+    
+    divergentes = []
+    for nome in MANIFEST_TABLES:
+        arquivo = table_file(dimensions_dir, nome, formato)
+        if not arquivo.exists() or file_checksum(arquivo) != esperado.get(nome):
+            divergentes.append(nome)
+    return divergentes
 
 
-def save_checkpoint(checkpoint_file: Path, checkpoint_data: dict):
-    """Salva checkpoint do processamento."""
-    checkpoint_data["last_update"] = datetime.now().isoformat()
-    with open(checkpoint_file, 'w') as f:
-        json.dump(checkpoint_data, f, indent=2)
+def save_fact(df_final: pd.DataFrame, output_file: Path, dimensions_dir: Path):
+    """
+    Grava a fato final (temporário + os.replace). O manifesto anterior é
+    apagado antes: ele não descreve a fato nova (save_manifest depois).
+    """
+    remove_manifest(dimensions_dir)
+    temp_file = output_file.with_name(output_file.name + ".tmp")
+    write_table(df_final, temp_file, FACT_COLUMN_TYPES)
+    os.replace(temp_file, output_file)
 
 
 # ==============================================================================
 # PROCESSAMENTO DE BATCH
 # ==============================================================================
 
-def process_batch(df_batch: pd.DataFrame, batch_name: str) -> pd.DataFrame:
+def build_fact(df_batch: pd.DataFrame, chaves: dict) -> pd.DataFrame:
     """
-    Processa um batch de dados e gera a tabela fato.
+    Monta a tabela fato de um batch a partir das hash_keys já calculadas.
     
-    IMPORTANTE: Usa as MESMAS funções de hash de etl_dimensions.py!
+    Args:
+        df_batch: DataFrame do data_processed
+        chaves: coluna FK da fato (ex.: 'paciente_id') -> hash_key de cada linha
     """
-    print(f"\n   Processando: {batch_name} ({len(df_batch):,} registros)")
-    
-    # ========================================================================
-    # GERAR HASH KEYS PARA FOREIGN KEYS
-    # ========================================================================
-    # ATENÇÃO: Usando EXATAMENTE as mesmas funções de etl_dimensions.py!
-    # ========================================================================
-    
-    print("      Gerando hash_paciente...")
-    df_batch['paciente_id'] = [
-        hash_paciente(row['sexo'], row['idade'], row['raca_cor'], 
-                     row['instrucao'], row['estado_conjugal'])
-        for _, row in df_batch.iterrows()
-    ]
-    
-    print("      Gerando hash_localizacao...")
-    df_batch['localizacao_id'] = [
-        hash_localizacao(row['local_nascimento'], row['estado_residencia'], row['procedencia'])
-        for _, row in df_batch.iterrows()
-    ]
-    
-    print("      Gerando hash_instituicao...")
-    df_batch['instituicao_id'] = [
-        hash_instituicao(row['clinica_atendimento'], row['clinica_tratamento'],
-                        row['cnes'], row['uf_unidade_hospitalar'], row['municipio_unidade_hospitalar'])
-        for _, row in df_batch.iterrows()
-    ]
-    
-    print("      Gerando hash_tumor...")
-    df_batch['tumor_id'] = [
-        hash_tumor(row['localizacao_tumor_detalhada'], row['localizacao_tumor_primaria'],
-                  row['localizacao_tumor_procedimento'], row['tipo_histologico'],
-                  row['lateralidade'], row['tnm'], row['ptnm'], row['estadiamento'])
-        for _, row in df_batch.iterrows()
-    ]
-    
-    print("      Gerando hash_fatores_risco...")
-    df_batch['fatores_id'] = [
-        hash_fatores_risco(row['historico_familiar'], row['alcoolismo'], row['tabagismo'])
-        for _, row in df_batch.iterrows()
-    ]
-    
-    print("      Gerando hash_ocupacao...")
-    df_batch['ocupacao_id'] = [
-        hash_ocupacao(row['ocupacao'])
-        for _, row in df_batch.iterrows()
-    ]
-    
-    print("      Gerando hash_tempo...")
-    # Para tempo, extrair ano e mês da data_diagnostico
-    # IMPORTANTE: Usar EXATAMENTE a mesma lógica de etl_dimensions.py!
-    df_batch['data_diag_dt'] = pd.to_datetime(df_batch['data_diagnostico'], errors='coerce')
-    df_batch['data_completa_str'] = df_batch['data_diag_dt'].dt.strftime('%Y-%m-%d')
-    df_batch['ano_val'] = df_batch['data_diag_dt'].dt.year
-    df_batch['mes_val'] = df_batch['data_diag_dt'].dt.month
-    
-    df_batch['tempo_id'] = [
-        hash_tempo(row['data_completa_str'], row['ano_val'], row['mes_val'])
-        for _, row in df_batch.iterrows()
-    ]
-    
-    print("      Gerando hash_tratamento...")
-    df_batch['tratamento_id'] = [
-        hash_tratamento(row['data_primeiro_contato_alt'], row['data_inicio_tratamento_alt'],
-                       row['primeiro_tratamento_hospital'], row['estado_final_tratamento'],
-                       row['razao_nao_tratamento'], row['diagnostico_anterior'])
-        for _, row in df_batch.iterrows()
-    ]
-    
-    # ========================================================================
-    # MONTAR TABELA FATO
-    # ========================================================================
-    
-    print("      Montando tabela fato...")
     fact_batch = pd.DataFrame({
         # Foreign keys (hashes)
-        'paciente_id': df_batch['paciente_id'],
-        'localizacao_id': df_batch['localizacao_id'],
-        'instituicao_id': df_batch['instituicao_id'],
-        'tumor_id': df_batch['tumor_id'],
-        'fatores_id': df_batch['fatores_id'],
-        'tempo_id': df_batch['tempo_id'],
-        'tratamento_id': df_batch['tratamento_id'],
-        'ocupacao_id': df_batch['ocupacao_id'],
+        'paciente_id': chaves['paciente_id'],
+        'localizacao_id': chaves['localizacao_id'],
+        'instituicao_id': chaves['instituicao_id'],
+        'tumor_id': chaves['tumor_id'],
+        'fatores_id': chaves['fatores_id'],
+        'tempo_id': chaves['tempo_id'],
+        'tratamento_id': chaves['tratamento_id'],
+        'ocupacao_id': chaves['ocupacao_id'],
         
         # Métricas e atributos da fato
         'case_code': df_batch['tipo_caso'],
         'data_diagnostico': df_batch['data_diagnostico'],
         'data_obito': df_batch['data_obito'],
         'valor_total': pd.to_numeric(df_batch['valor_total'], errors='coerce'),
-        'multiplos_tumores': df_batch['mais_um_tumor'].map(
+        'multiplos_tumores': map_distinct(
+            df_batch['mais_um_tumor'],
             lambda x: True if str(x) == '1' else (False if str(x) == '0' else None)
         ),
         'orientacao': df_batch['origem_encaminhamento'],
@@ -282,18 +227,111 @@ def process_batch(df_batch: pd.DataFrame, batch_name: str) -> pd.DataFrame:
         'base_diagnostico_suplementar': df_batch['base_diagnostico_sp'],
         'outro_estadio': df_batch['outro_estadiamento'],
         'sobreviveu': df_batch['data_obito'].isna()
-    })
+    }, index=df_batch.index)
+    
+    return fact_batch
+
+
+def process_batch(df_batch: pd.DataFrame, batch_name: str, registro: dict = None) -> pd.DataFrame:
+    """
+    Processa um batch de dados e gera a tabela fato.
+    
+    IMPORTANTE: Usa as MESMAS funções de hash de etl_dimensions.py (hash_keys.py)!
+    
+    Com `registro` (etl_dimensions.load_dimension_ids), as FKs saem como o id
+    int32 de cada dimensão em vez da hash_key.
+    """
+    print(f"\n   Processando: {batch_name} ({len(df_batch):,} registros)")
+    
+    # ========================================================================
+    # GERAR HASH KEYS PARA FOREIGN KEYS
+    # ========================================================================
+    # ATENÇÃO: Usando EXATAMENTE as mesmas colunas e funções de
+    # etl_dimensions.py (hash_keys.DIMENSION_KEYS). hash_columns calcula um
+    # MD5 por combinação distinta e devolve a hash_key de cada linha pelo
+    # índice fatorado.
+    # ========================================================================
+    
+    chaves = {}
+    for dim_name, (fact_col, cols) in DIMENSION_KEYS.items():
+        print(f"      Gerando hash_{dim_name[4:]}...")
+        if registro is None:
+            chaves[fact_col] = hash_columns(key_frame(df_batch, dim_name), cols)
+        else:
+            codigos, _, hashes = hash_tuples(key_frame(df_batch, dim_name), cols)
+            ids = lookup_ids(registro[dim_name], hashes, dim_name)
+            chaves[fact_col] = pd.Series(ids[codigos], index=df_batch.index)
+    
+    # ========================================================================
+    # MONTAR TABELA FATO
+    # ========================================================================
+    
+    print("      Montando tabela fato...")
+    fact_batch = build_fact(df_batch, chaves)
     
     print(f"      [OK] Batch processado: {len(fact_batch):,} registros")
     return fact_batch
 
 
+def save_batch(fact_batch: pd.DataFrame, batch_output: Path):
+    """
+    Salva o batch de forma atômica (temporário + os.replace).
+    
+    Um fato_batch_* só existe completo: se o processo morrer no meio da
+    escrita, sobra apenas o .tmp, que não entra na consolidação.
+    """
+    temp_file = batch_output.with_name(batch_output.name + ".tmp")
+    write_table(fact_batch, temp_file, FACT_COLUMN_TYPES)
+    os.replace(temp_file, batch_output)
+
+
+def process_file(csv_file: Path, batch_output: Path, registro: dict = None) -> int:
+    """Lê um arquivo do data_processed, gera a fato e salva o batch."""
+    # Carregar arquivo
+    df_batch = read_table(csv_file, SOURCE_COLUMNS, CLEANED_SCHEMA)
+    
+    # Processar batch
+    fact_batch = process_batch(df_batch, csv_file.name, registro)
+    
+    # Salvar batch
+    print(f"      Salvando batch: {batch_output.name}")
+    save_batch(fact_batch, batch_output)
+    return len(fact_batch)
+
+
+def _process_file_com_log(csv_file: Path, batch_output: Path, registro: dict = None) -> tuple:
+    """
+    Executa process_file em um processo do pool, guardando o log.
+    
+    Returns:
+        tuple: (sucesso: bool, log: str) - ver paralelo.executar_com_log
+    """
+    return executar_com_log(process_file, csv_file, batch_output, registro)
+
+
 # ==============================================================================
 # MAIN
 # ==============================================================================
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Cria a tabela fato do modelo estrela.")
+    parser.add_argument(
+        "--formato", choices=FORMATOS, default="csv",
+        help="Formato de data_processed/ e da tabela fato gerada (padrao: csv)"
+    )
+    add_workers_argument(parser, "Processos para gerar os batches em paralelo")
+    parser.add_argument(
+        "--ids-inteiros", action="store_true",
+        help="Grava as FKs como o id inteiro de cada dimensao (requer "
+             "etl_dimensions.py --ids-inteiros) em vez da hash_key"
+    )
+    return parser.parse_args()
+
+
 def main():
     """Processa os dados limpos e cria a tabela fato."""
+    args = parse_args()
+    
     print("=" * 70)
     print("ETL - CRIACAO DA TABELA FATO")
     print("=" * 70)
@@ -316,7 +354,7 @@ def main():
         sys.exit(1)
     
     # Listar arquivos processados
-    csv_files = sorted(data_processed_dir.glob("rhc*.csv"))
+    csv_files = list_table_files(data_processed_dir, "rhc", args.formato)
     
     if not csv_files:
         print("ERRO: Nenhum arquivo encontrado em data_processed/")
@@ -324,10 +362,30 @@ def main():
     
     print(f"\nArquivos encontrados: {len(csv_files)}")
     
+    # Ids das dimensões (modo --ids-inteiros)
+    registro = None
+    batch_schema = FACT_BATCH_SCHEMA
+    if args.ids_inteiros:
+        if not registry_has_ids(dimensions_dir, args.formato):
+            print("\nERRO: As dimensoes foram gravadas sem a coluna id!")
+            print("Execute primeiro: python scripts/etl_dimensions.py --ids-inteiros")
+            sys.exit(1)
+        registro = load_dimension_ids(dimensions_dir, args.formato)
+        batch_schema = FACT_BATCH_SCHEMA_IDS
+        print("FKs: ids inteiros das dimensoes")
+    
     # Carregar checkpoint
     checkpoint = load_checkpoint(checkpoint_file)
     processed_files = set(checkpoint.get("processed_files", []))
     
+    # Batches de um modo (hash/id) não podem ser misturados com os do outro
+    if processed_files and checkpoint.get("ids_inteiros", False) != args.ids_inteiros:
+        print("\nERRO: O checkpoint tem batches gerados com outro tipo de FK "
+              "(--ids-inteiros)!")
+        print("Delete dimensions/.checkpoint_fact.json e os fato_batch_* para reprocessar.")
+        sys.exit(1)
+    checkpoint["ids_inteiros"] = args.ids_inteiros
+    
     # Arquivos pendentes
     pending_files = [f for f in csv_files if f.name not in processed_files]
     
@@ -336,20 +394,22 @@ def main():
         print("Para reprocessar, delete o arquivo: dimensions/.checkpoint_fact.json")
         
         # Consolidar batches se existirem
-        batch_files = sorted(dimensions_dir.glob("fato_batch_*.csv"))
+        batch_files = list_table_files(dimensions_dir, "fato_batch_", args.formato)
         if batch_files:
             print(f"\nConsolidando {len(batch_files)} batches...")
-            dfs = [pd.read_csv(f) for f in batch_files]
-            df_final = pd.concat(dfs, ignore_index=True)
+            dfs = [read_table(f, schema=batch_schema) for f in batch_files]
+            df_final = concat_tables(dfs)
             
-            output_file = dimensions_dir / "fato_casos_oncologicos.csv"
+            output_file = table_file(dimensions_dir, "fato_casos_oncologicos", args.formato)
             print(f"Salvando tabela fato final: {output_file}")
-            df_final.to_csv(output_file, index=False, encoding='utf-8')
+            save_fact(df_final, output_file, dimensions_dir)
             
             # Remover batches
             for batch_file in batch_files:
                 batch_file.unlink()
             
+            save_manifest(dimensions_dir, processed_files, args.formato)
+            
             print(f"\n[OK] Tabela fato final: {len(df_final):,} registros")
         
         sys.exit(0)
@@ -362,54 +422,90 @@ def main():
     print("PROCESSANDO BATCHES")
     print("-" * 70)
     
-    for i, csv_file in enumerate(pending_files, 1):
-        print(f"\n[{i}/{len(pending_files)}] {csv_file.name}")
-        
-        # Carregar arquivo
-        df_batch = pd.read_csv(csv_file)
-        
-        # Processar batch
-        fact_batch = process_batch(df_batch, csv_file.name)
-        
-        # Salvar batch
-        batch_output = dimensions_dir / f"fato_batch_{csv_file.stem}.csv"
-        print(f"      Salvando batch: {batch_output.name}")
-        fact_batch.to_csv(batch_output, index=False, encoding='utf-8')
-        
-        # Atualizar checkpoint
+    def batch_output_for(csv_file: Path) -> Path:
+        return table_file(dimensions_dir, f"fato_batch_{csv_file.stem}", args.formato)
+    
+    def mark_processed(csv_file: Path):
+        # Só o processo principal grava o checkpoint, e só depois que o
+        # batch do arquivo já foi salvo por completo
         processed_files.add(csv_file.name)
-        checkpoint["processed_files"] = list(processed_files)
+        checkpoint["processed_files"] = sorted(processed_files)
         save_checkpoint(checkpoint_file, checkpoint)
+    
+    workers = resolve_workers(args.workers, len(pending_files))
+    
+    if workers > 1:
+        print(f"Processando em paralelo: {workers} processos")
+        falhas = []
+        
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                (csv_file, executor.submit(_process_file_com_log, csv_file,
+                                           batch_output_for(csv_file), registro))
+                for csv_file in pending_files
+            ]
+            
+            # Na ordem dos arquivos, como no etl_cleaning: o log sai na
+            # mesma ordem da execução serial
+            for i, (csv_file, future) in enumerate(futures, 1):
+                print(f"\n[{i}/{len(pending_files)}] {csv_file.name}")
+                
+                try:
+                    sucesso, log = future.result()
+                except Exception as e:
+                    # Falha do próprio processo (ex.: memória), não do batch
+                    sucesso, log = False, f"      ERRO ao processar {csv_file.name}: {e}\n"
+                
+                print(log, end="")
+                if not sucesso:
+                    falhas.append(csv_file.name)
+                    continue
+                mark_processed(csv_file)
+                print(f"      [OK] Checkpoint atualizado")
         
-        print(f"      [OK] Checkpoint atualizado")
+        if falhas:
+            print(f"\nERRO: {len(falhas)} arquivo(s) falharam: {', '.join(falhas)}")
+            print("Os demais estao no checkpoint. Execute novamente para reprocessar so os que falharam.")
+            sys.exit(1)
+    else:
+        for i, csv_file in enumerate(pending_files, 1):
+            print(f"\n[{i}/{len(pending_files)}] {csv_file.name}")
+            
+            process_file(csv_file, batch_output_for(csv_file), registro)
+            
+            # Atualizar checkpoint
+            mark_processed(csv_file)
+            
+            print(f"      [OK] Checkpoint atualizado")
     
     # Consolidar todos os batches
     print("\n" + "-" * 70)
     print("CONSOLIDANDO BATCHES")
     print("-" * 70)
     
-    batch_files = sorted(dimensions_dir.glob("fato_batch_*.csv"))
+    batch_files = list_table_files(dimensions_dir, "fato_batch_", args.formato)
     print(f"Batches encontrados: {len(batch_files)}")
     
     dfs = []
     for batch_file in batch_files:
         print(f"   Carregando {batch_file.name}...")
-        df = pd.read_csv(batch_file)
+        df = read_table(batch_file, schema=batch_schema)
         dfs.append(df)
     
-    df_final = pd.concat(dfs, ignore_index=True)
+    df_final = concat_tables(dfs)
     
     # Salvar tabela fato final
-    output_file = dimensions_dir / "fato_casos_oncologicos.csv"
+    output_file = table_file(dimensions_dir, "fato_casos_oncologicos", args.formato)
     print(f"\nSalvando tabela fato final: {output_file}")
-    df_final.to_csv(output_file, index=False, encoding='utf-8')
+    save_fact(df_final, output_file, dimensions_dir)
     
     # Remover batches temporários
     print("\nRemovendo batches temporarios...")
     for batch_file in batch_files:
         batch_file.unlink()
     
-    # Remover checkpoint
+    # Registrar os arquivos da fato e remover o checkpoint
+    save_manifest(dimensions_dir, processed_files, args.formato)
     if checkpoint_file.exists():
         checkpoint_file.unlink()
     
@@ -418,7 +514,7 @@ def main():
     print("RESUMO")
     print("=" * 70)
     print(f"Total de registros na fato: {len(df_final):,}")
-    print(f"Arquivo gerado: dimensions/fato_casos_oncologicos.csv")
+    print(f"Arquivo gerado: {output_file}")
     print("=" * 70)
     print("\nSUCESSO: Tabela fato criada!")
     print("\nProximo passo: python scripts/validate_integrity.py")
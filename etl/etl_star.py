@@ -0,0 +1,214 @@
+"""
+ETL - DIMENSÕES + TABELA FATO EM UMA ÚNICA PASSADA
+===================================================
+Este script substitui a execução de etl_dimensions.py seguida de etl_fact.py.
+
+Cada arquivo de data_processed é lido UMA única vez. Para cada arquivo:
+1. As hash_keys das 8 dimensões são calculadas (uma vez por combinação distinta)
+2. As linhas da fato são geradas e gravadas direto no arquivo final
+3. As combinações ainda não vistas são adicionadas às dimensões
+
+As dimensões são gravadas no final. Não existe mais o df_all com todo o
+histórico em memória, e cada hash é calculado uma única vez para dimensão e
+fato. Os arquivos gerados são os mesmos de etl_dimensions.py + etl_fact.py.
+
+Modo --incremental (novo ano publicado pelo INCA): só os arquivos de
+data_processed ainda fora da fato (ver etl_fact.MANIFEST_NAME) são lidos.
+As hash_keys das dimensões existentes entram como já vistas (anti-join),
+as combinações novas são acrescentadas ao fim de cada dimensão e as linhas
+novas ao fim da fato. O custo é o dos arquivos novos, não o do histórico.
+O resultado é o mesmo de uma execução completa com os arquivos novos por
+último.
+
+Autor: Sistema ETL RHC
+Data: Outubro 2025
+"""
+
+from pathlib import Path
+import argparse
+import sys
+
+from etl_dimensions import (
+    new_dimension_store, seed_dimension_store, update_dimension_store,
+    finalize_dimension_store, save_dimensions, append_dimensions,
+    load_id_registry, save_id_registry, registry_has_ids
+)
+from etl_cleaning import CLEANED_SCHEMA
+from etl_fact import (
+    SOURCE_COLUMNS, FACT_COLUMN_TYPES, build_fact, load_manifest, save_manifest,
+    remove_manifest, manifest_mismatches
+)
+from storage import FORMATOS, TableAppender, table_file, list_table_files, read_table
+
+
+# ==============================================================================
+# MAIN
+# ==============================================================================
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Cria as dimensoes e a tabela fato em uma unica passada."
+    )
+    parser.add_argument(
+        "--formato", choices=FORMATOS, default="csv",
+        help="Formato de data_processed/ e dos arquivos gerados (padrao: csv)"
+    )
+    parser.add_argument(
+        "--incremental", action="store_true",
+        help="Processa so os arquivos de data_processed/ ainda fora da fato e "
+             "acrescenta as linhas novas as dimensoes e a fato existentes"
+    )
+    parser.add_argument(
+        "--ids-inteiros", action="store_true",
+        help="Grava a coluna id (inteiro, estavel entre execucoes) em cada "
+             "dimensao e as FKs da fato como esses ids, em vez da hash_key"
+    )
+    return parser.parse_args()
+
+
+def main():
+    """Processa os dados limpos e cria dimensões e tabela fato."""
+    args = parse_args()
+    
+    print("=" * 70)
+    print("ETL - CRIACAO DAS DIMENSOES E DA TABELA FATO (PASSADA UNICA)")
+    print("=" * 70)
+
+    # Diretórios
+    data_processed_dir = Path("data_processed")
+    dimensions_dir = Path("dimensions")
+
+    # Verificar se diretório processed existe
+    if not data_processed_dir.exists():
+        print("\nERRO: Diretorio data_processed nao encontrado!")
+        print("Execute primeiro: python scripts/etl_cleaning.py")
+        sys.exit(1)
+
+    # Criar diretório dimensions
+    dimensions_dir.mkdir(exist_ok=True)
+
+    csv_files = list_table_files(data_processed_dir, "rhc", args.formato)
+
+    if not csv_files:
+        print("ERRO: Nenhum arquivo encontrado em data_processed/")
+        sys.exit(1)
+
+    print(f"\nArquivos encontrados: {len(csv_files)}")
+
+    # A fato é gravada em um arquivo temporário e só é renomeada no final,
+    # para nunca deixar uma fato_casos_oncologicos incompleta
+    output_file = table_file(dimensions_dir, "fato_casos_oncologicos", args.formato)
+    temp_file = output_file.with_name(output_file.name + ".tmp")
+
+    # Ids já atribuídos (mantidos entre execuções e no modo incremental)
+    registro = load_id_registry(dimensions_dir, args.formato) if args.ids_inteiros else None
+    store = new_dimension_store(registro)
+    total_registros = 0
+
+    # Modo incremental: só os arquivos novos, a partir da fato e das
+    # dimensões existentes
+    processados = set()
+    existentes = {}
+    base = None
+    if args.incremental:
+        processados = load_manifest(dimensions_dir)
+        if processados is None or not output_file.exists():
+            print("\nERRO: Nenhuma execucao completa registrada em dimensions/")
+            print("Execute primeiro sem --incremental: python scripts/etl_star.py")
+            sys.exit(1)
+
+        divergentes = manifest_mismatches(dimensions_dir, args.formato)
+        if divergentes:
+            print("\nERRO: As tabelas de dimensions/ nao batem com o manifesto da ultima execucao:")
+            print(f"   {', '.join(divergentes)}")
+            print("Uma execucao anterior foi interrompida, ou as tabelas foram regravadas")
+            print("por etl_dimensions.py / etl_fact.py. Reprocesse tudo sem --incremental.")
+            sys.exit(1)
+
+        if registry_has_ids(dimensions_dir, args.formato) != args.ids_inteiros:
+            print("\nERRO: A fato existente foi gerada com outro tipo de FK (--ids-inteiros)!")
+            print("Use a mesma opcao da execucao completa, ou reprocesse tudo sem --incremental.")
+            sys.exit(1)
+
+        csv_files = [f for f in csv_files if f.name not in processados]
+        if not csv_files:
+            print("\nNenhum arquivo novo: a fato ja inclui todos os arquivos de data_processed/")
+            sys.exit(0)
+
+        print(f"Arquivos novos (incremental): {', '.join(f.name for f in csv_files)}")
+        existentes = seed_dimension_store(store, dimensions_dir, args.formato)
+        base = output_file
+
+    # Processar arquivos
+    print("\n" + "-" * 70)
+    print("PROCESSANDO ARQUIVOS")
+    print("-" * 70)
+
+    with TableAppender(temp_file, FACT_COLUMN_TYPES, base=base) as saida:
+        for i, csv_file in enumerate(csv_files, 1):
+            print(f"\n[{i}/{len(csv_files)}] {csv_file.name}")
+
+            df_batch = read_table(csv_file, SOURCE_COLUMNS, CLEANED_SCHEMA)
+            print(f"      Registros: {len(df_batch):,}")
+
+            # Hash keys + combinações novas das dimensões
+            print("      Gerando hash_keys e atualizando dimensoes...")
+            chaves = update_dimension_store(store, df_batch)
+
+            # Linhas da fato
+            print("      Montando tabela fato...")
+            fact_batch = build_fact(df_batch, chaves)
+            saida.append(fact_batch)
+            total_registros += len(fact_batch)
+
+            print(f"      [OK] {len(fact_batch):,} registros na fato (total: {total_registros:,})")
+
+    # Consolidar e salvar dimensões (também em temporários)
+    print("\n" + "-" * 70)
+    print("SALVANDO DIMENSOES")
+    print("-" * 70)
+
+    pendentes = []
+    dimensoes = finalize_dimension_store(store)
+    if args.incremental:
+        append_dimensions(dimensoes, dimensions_dir, args.formato, pendentes)
+    else:
+        save_dimensions(dimensoes, dimensions_dir, args.formato, pendentes)
+    pendentes.append((temp_file, output_file))
+
+    # Só agora, com todas as tabelas gravadas, os temporários substituem os
+    # arquivos, e o manifesto vai por último. Numa execução completa o
+    # manifesto antigo é apagado antes: ele não descreve as tabelas novas
+    if not args.incremental:
+        remove_manifest(dimensions_dir)
+    if registro is not None:
+        save_id_registry(dimensions_dir, registro)
+    for temp, final in pendentes:
+        temp.replace(final)
+    save_manifest(dimensions_dir, processados | {f.name for f in csv_files}, args.formato)
+
+    # Resumo
+    print("\n" + "=" * 70)
+    print("RESUMO")
+    print("=" * 70)
+    if args.incremental:
+        print(f"Registros novos na fato: {total_registros:,}")
+    else:
+        print(f"Total de registros na fato: {total_registros:,}")
+    print(f"Arquivo gerado: {output_file}")
+    print("\nTamanho das dimensoes:")
+    for dim_name, dim_df in dimensoes.items():
+        nome = table_file(dimensions_dir, dim_name, args.formato).name
+        if args.incremental:
+            total = existentes[dim_name] + len(dim_df)
+            print(f"   {nome:30s} {total:>10,} registros ({len(dim_df):,} novos)")
+        else:
+            print(f"   {nome:30s} {len(dim_df):>10,} registros")
+    print("=" * 70)
+    print("\nSUCESSO: Dimensoes e tabela fato criadas!")
+    print("\nProximo passo: python scripts/validate_integrity.py")
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+"""
+ETL - FUNÇÕES DE HASH COMPARTILHADAS
+====================================
+Módulo único com a geração das hash_keys usadas como chave entre as
+dimensões (etl_dimensions.py) e a tabela fato (etl_fact.py).
+
+As funções escalares hash_paciente ... hash_tratamento são a REFERÊNCIA da
+regra de hash. A função hash_columns aplica exatamente a mesma regra sobre
+colunas inteiras de um DataFrame (operações vetorizadas, um MD5 por
+combinação distinta), gerando hashes byte a byte idênticos aos das funções
+escalares.
+
+ATENÇÃO CRÍTICA: NÃO altere a lógica de hash sem reprocessar tudo!
+
+Autor: Sistema ETL RHC
+Data: Outubro 2025
+"""
+
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+from dates import FORMATO_ISO, date_components
+
+
+# ==============================================================================
+# REGRAS CRÍTICAS
+# ==============================================================================
+#
+# 1. NUNCA altere a ordem dos parâmetros / colunas
+# 2. NUNCA altere como None/NULL é tratado
+# 3. NUNCA altere o separador "|"
+# 4. Sempre use valores BRUTOS (antes de qualquer transformação)
+#
+# ==============================================================================
+
+SEPARADOR = "|"
+VALOR_NULO = "NULL"
+TOKENS_NULOS = ["", "nan", "NaN", "NaT", "None"]
+
+
+def _normalize_for_hash(value):
+    """
+    Normaliza um valor para geração de hash.
+
+    REGRA:
+    - None, NaN, "", "nan", "NaN", "NaT" → "NULL"
+    - Qualquer outro valor → string sem espaços extras
+    """
+    if pd.isna(value) or value is None or str(value).strip() in TOKENS_NULOS:
+        return VALOR_NULO
+    return str(value).strip()
+
+
+def _md5(combined: str) -> str:
+    return hashlib.md5(combined.encode('utf-8')).hexdigest()
+
+
+def _hash_valores(*valores) -> str:
+    """Normaliza cada valor, junta com "|" e gera o MD5."""
+    return _md5(SEPARADOR.join(_normalize_for_hash(v) for v in valores))
+
+
+# ==============================================================================
+# COLUNAS QUE ALIMENTAM CADA HASH
+# ==============================================================================
+#
+# Colunas do data_processed usadas em cada dimensão, NA ORDEM dos parâmetros
+# da função de hash correspondente, e a coluna de FK na tabela fato.
+# etl_dimensions.py e etl_fact.py usam SEMPRE esta tabela.
+#
+# ==============================================================================
+
+DIMENSION_KEYS = {
+    "dim_paciente": ("paciente_id", [
+        "sexo", "idade", "raca_cor", "instrucao", "estado_conjugal"
+    ]),
+    "dim_localizacao": ("localizacao_id", [
+        "local_nascimento", "estado_residencia", "procedencia"
+    ]),
+    "dim_instituicao": ("instituicao_id", [
+        "clinica_atendimento", "clinica_tratamento",
+        "cnes", "uf_unidade_hospitalar", "municipio_unidade_hospitalar"
+    ]),
+    "dim_tumor": ("tumor_id", [
+        "localizacao_tumor_detalhada", "localizacao_tumor_primaria",
+        "localizacao_tumor_procedimento", "tipo_histologico",
+        "lateralidade", "tnm", "ptnm", "estadiamento"
+    ]),
+    "dim_fatores_risco": ("fatores_id", [
+        "historico_familiar", "alcoolismo", "tabagismo"
+    ]),
+    "dim_ocupacao": ("ocupacao_id", [
+        "ocupacao"
+    ]),
+    # Colunas derivadas de data_diagnostico (ver tempo_columns)
+    "dim_tempo": ("tempo_id", [
+        "data_completa", "ano_primeiro_diagnostico", "mes"
+    ]),
+    "dim_tratamento": ("tratamento_id", [
+        "data_primeiro_contato_alt", "data_inicio_tratamento_alt",
+        "primeiro_tratamento_hospital", "estado_final_tratamento",
+        "razao_nao_tratamento", "diagnostico_anterior"
+    ]),
+}
+
+
+def tempo_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Deriva data_completa, ano e mês de data_diagnostico para o hash de dim_tempo.
+
+    Ano e mês são SEMPRE float (ex.: "2020.0|1.0" no hash). Antes o tipo
+    dependia de haver alguma data inválida (NaT) no lote: com NaT o pandas
+    devolve float, sem NaT devolve int, e a mesma data gerava hashes
+    diferentes entre arquivos.
+
+    data_diagnostico chega do data_processed já como YYYY-MM-DD (texto ou
+    datetime.date); cada data distinta é interpretada uma única vez
+    (ver dates.date_components).
+    """
+    datas = date_components(df['data_diagnostico'], FORMATO_ISO)
+
+    return pd.DataFrame({
+        'data_completa': datas['iso'],
+        'ano_primeiro_diagnostico': datas['year'].astype('float64'),
+        'mes': datas['month'].astype('float64')
+    }, index=df.index)
+
+
+def key_frame(df: pd.DataFrame, dim_name: str) -> pd.DataFrame:
+    """Colunas de df que alimentam o hash de dim_name (derivando as de tempo)."""
+    _, cols = DIMENSION_KEYS[dim_name]
+    if dim_name == "dim_tempo":
+        return tempo_columns(df)
+    return df[cols]
+
+
+# ==============================================================================
+# FUNÇÕES DE HASH ESCALARES (REFERÊNCIA)
+# ==============================================================================
+
+def hash_paciente(sexo, idade, raca_cor, nivel_instrucao, estado_civil):
+    """
+    HASH PARA dim_paciente
+
+    IMPORTANTE: Esta função usa os valores BRUTOS do CSV.
+    Não faça transformações antes de chamar esta função!
+    """
+    return _hash_valores(sexo, idade, raca_cor, nivel_instrucao, estado_civil)
+
+
+def hash_localizacao(cidade_nascimento, estado_residencia, procedencia):
+    """HASH PARA dim_localizacao"""
+    return _hash_valores(cidade_nascimento, estado_residencia, procedencia)
+
+
+def hash_instituicao(codigo_atendimento, codigo_tratamento, cnes, uf, municipio):
+    """HASH PARA dim_instituicao"""
+    return _hash_valores(codigo_atendimento, codigo_tratamento, cnes, uf, municipio)
+
+
+def hash_tumor(local_detalhado, local_primario, local_propagacao, tipo_histologico,
+               lateralidade, tnm, ptnm, estadiamento):
+    """HASH PARA dim_tumor"""
+    return _hash_valores(local_detalhado, local_primario, local_propagacao,
+                         tipo_histologico, lateralidade, tnm, ptnm, estadiamento)
+
+
+def hash_fatores_risco(historico_familiar, alcoolismo, tabagismo):
+    """HASH PARA dim_fatores_risco"""
+    return _hash_valores(historico_familiar, alcoolismo, tabagismo)
+
+
+def hash_ocupacao(ocupacao):
+    """HASH PARA dim_ocupacao"""
+    return _hash_valores(ocupacao)
+
+
+def hash_tempo(data_completa, ano, mes):
+    """HASH PARA dim_tempo"""
+    return _hash_valores(data_completa, ano, mes)
+
+
+def hash_tratamento(data_primeiro_contato, data_inicio_tratamento, tipo_tratamento,
+                   estado_final_tratamento, razao_termino, antecedente_tratamento):
+    """HASH PARA dim_tratamento"""
+    return _hash_valores(data_primeiro_contato, data_inicio_tratamento, tipo_tratamento,
+                         estado_final_tratamento, razao_termino, antecedente_tratamento)
+
+
+# ==============================================================================
+# HASH VETORIZADO (TUPLAS DISTINTAS)
+# ==============================================================================
+#
+# O hash é calculado apenas uma vez por combinação DISTINTA de valores
+# normalizados. Cada linha recebe um código inteiro (índice fatorado) que
+# aponta para a sua combinação, e as hash_keys voltam para as linhas com
+# um simples take(). O custo do MD5 cresce com a cardinalidade da
+# dimensão, não com o número de linhas da fato.
+#
+# ==============================================================================
+
+def normalize_series(serie: pd.Series) -> pd.Series:
+    """
+    Versão vetorizada de _normalize_for_hash para uma coluna inteira.
+
+    Equivale a aplicar _normalize_for_hash em cada célula: nulos e os
+    TOKENS_NULOS viram "NULL", os demais valores viram str(valor).strip().
+    """
+    nulos = serie.isna().to_numpy()
+    if serie.dtype != object:
+        # str() do valor Python (ex.: Timestamp completo, não só a data)
+        serie = serie.astype(object)
+    texto = serie.astype(str).str.strip()
+    nulos = nulos | texto.isin(TOKENS_NULOS).to_numpy()
+    return texto.where(~nulos, VALOR_NULO)
+
+
+def _factorize_normalized(serie: pd.Series) -> tuple:
+    """
+    Fatora uma coluna pelo valor NORMALIZADO para hash.
+
+    Só os valores distintos passam por normalize_series; valores que
+    normalizam igual (ex.: None, NaN e "nan" → "NULL") recebem o mesmo
+    código.
+
+    Returns:
+        tuple: (codigos por linha, array com os valores normalizados distintos)
+    """
+    codigos, unicos = pd.factorize(serie)
+
+    if serie.dtype == object and not all(isinstance(u, str) for u in unicos):
+        # Tipos misturados (ex.: 45 e 45.0) são iguais para o factorize,
+        # mas geram str() diferentes. Fatorar pelo texto mantém a regra exata.
+        codigos, unicos = pd.factorize(serie.astype(str))
+
+    # O código -1 (nulo) vira a última posição, normalizada como "NULL"
+    normalizados = normalize_series(pd.Series(unicos, dtype=object)).tolist()
+    normalizados.append(VALOR_NULO)
+    codigos = np.where(codigos < 0, len(unicos), codigos)
+
+    codigos_norm, unicos_norm = pd.factorize(np.array(normalizados, dtype=object))
+    return codigos_norm[codigos], np.asarray(unicos_norm, dtype=object)
+
+
+def factorize_tuples(df: pd.DataFrame, columns: list) -> tuple:
+    """
+    Encontra as combinações distintas (normalizadas) das colunas informadas.
+
+    Returns:
+        tuple: (codigos, primeiras, chaves)
+            codigos:   código da combinação de cada linha de df (0..k-1, na
+                       ordem da primeira ocorrência)
+            primeiras: posição da primeira linha de cada combinação
+            chaves:    string "a|b|c" normalizada de cada combinação
+    """
+    codigos = np.zeros(len(df), dtype=np.int64)
+    colunas_norm = []
+
+    for col in columns:
+        codigos_col, unicos_col = _factorize_normalized(df[col])
+        colunas_norm.append((codigos_col, unicos_col))
+
+        # Combina com as colunas anteriores e densifica novamente, mantendo
+        # os códigos na ordem da primeira ocorrência (sem risco de overflow)
+        codigos, _ = pd.factorize(codigos * len(unicos_col) + codigos_col)
+
+    primeiras = pd.Series(codigos).drop_duplicates().index.to_numpy()
+
+    partes = [unicos[cods[primeiras]] for cods, unicos in colunas_norm]
+    chaves = [SEPARADOR.join(valores) for valores in zip(*partes)]
+    return codigos, primeiras, chaves
+
+
+def hash_tuples(df: pd.DataFrame, columns: list) -> tuple:
+    """
+    Gera uma hash_key por combinação distinta das colunas informadas.
+
+    As colunas devem estar na MESMA ordem dos parâmetros da função escalar
+    correspondente (ex.: hash_paciente).
+
+    Returns:
+        tuple: (codigos, primeiras, hashes) - ver factorize_tuples; hashes[i]
+            é a hash_key da combinação i.
+    """
+    codigos, primeiras, chaves = factorize_tuples(df, columns)
+    md5 = hashlib.md5
+    hashes = np.array([md5(c.encode('utf-8')).hexdigest() for c in chaves], dtype=object)
+    return codigos, primeiras, hashes
+
+
+def hash_columns(df: pd.DataFrame, columns: list) -> pd.Series:
+    """
+    Gera a hash_key de cada linha de df a partir das colunas informadas.
+
+    O resultado é idêntico a chamar a função escalar linha a linha, mas o
+    MD5 é calculado uma única vez por combinação distinta de valores.
+
+    A série é categórica (ver hash_categorical): cada linha guarda só o
+    código da sua combinação, e não uma string de 32 caracteres.
+    """
+    if len(df) == 0:
+        return pd.Series([], index=df.index, dtype=object)
+
+    codigos, _, hashes = hash_tuples(df, columns)
+    return hash_categorical(codigos, hashes, df.index)
+
+
+def hash_categorical(codigos: np.ndarray, hashes: np.ndarray, index) -> pd.Series:
+    """hash_key de cada linha (hashes[codigos]) como série categórica."""
+    valores = pd.Categorical.from_codes(codigos, categories=pd.Index(hashes, dtype=object))
+    return pd.Series(valores, index=index)
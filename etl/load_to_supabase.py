@@ -5,11 +5,20 @@ Carrega dimensões primeiro, depois a tabela fato com mapeamento de IDs.
 """
 
 import os
+import argparse
 import psycopg2
 from pathlib import Path
 from dotenv import load_dotenv
 import json
 from datetime import datetime
+import time
+import functools
+
+from storage import (
+    FORMATOS, table_file, table_columns, read_table, iter_table_chunks, parquet_row_groups
+)
+from create_hash_mapping import copy_mapping
+from hash_keys import DIMENSION_KEYS
 
 
 def load_checkpoint(checkpoint_file: Path) -> dict:
@@ -35,6 +44,42 @@ def truncate_table(conn, table_name: str):
     print(f"   Tabela {table_name} truncada")
 
 
+def prepare_dimension(df, table_name: str):
+    """Limpeza específica de cada dimensão antes do COPY."""
+    import pandas as pd
+    
+    if table_name == 'dim_paciente':
+        # Limpar campo idade: "0-1" -> 0, valores inválidos -> NULL
+        if 'idade' in df.columns:
+            # Converter "0-1" para 0
+            df['idade'] = df['idade'].astype(str).str.replace('0-1', '0')
+            # Converter para numérico, inválidos viram NaN
+            df['idade'] = pd.to_numeric(df['idade'], errors='coerce')
+            # Converter NaN para None (NULL no Postgres)
+            df['idade'] = df['idade'].where(pd.notna(df['idade']), None)
+            
+            invalidos = df['idade'].isna().sum()
+            if invalidos > 0:
+                print(f"      AVISO: {invalidos} registros com idade invalida convertidos para NULL")
+        
+        # Limpar campo estado_civil: "0" -> NULL (sem informação)
+        if 'estado_civil' in df.columns:
+            df.loc[df['estado_civil'] == '0', 'estado_civil'] = None
+            nulos = df['estado_civil'].isna().sum()
+            if nulos > 0:
+                print(f"      INFO: {nulos} registros com estado_civil desconhecido (NULL)")
+    
+    return df
+
+
+def sync_id_sequence(cur, table_name: str):
+    """Avança a sequência do id até o maior id gravado (ids vindos do arquivo)."""
+    cur.execute(f"""
+        SELECT setval(pg_get_serial_sequence('{table_name}', 'id'),
+                      GREATEST((SELECT MAX(id) FROM {table_name}), 1));
+    """)
+
+
 def load_dimension(conn, table_name: str, csv_file: Path, checkpoint_file: Path, checkpoint: dict):
     """
     Carrega uma dimensão para o Supabase.
@@ -43,7 +88,7 @@ def load_dimension(conn, table_name: str, csv_file: Path, checkpoint_file: Path,
     Args:
         conn: Conexão ativa do psycopg2
         table_name: Nome da tabela destino
-        csv_file: Caminho do arquivo CSV local
+        csv_file: Caminho do arquivo local (CSV ou Parquet)
         checkpoint_file: Arquivo de checkpoint
         checkpoint: Dados do checkpoint
     """
@@ -57,11 +102,10 @@ def load_dimension(conn, table_name: str, csv_file: Path, checkpoint_file: Path,
         print(f"      ERRO: Arquivo {csv_file} nao encontrado!")
         return
 
-    import pandas as pd
     from io import StringIO
     
-    # Carregar CSV com pandas
-    df = pd.read_csv(csv_file)
+    # Carregar dimensão com pandas
+    df = read_table(csv_file)
     print(f"      Registros no CSV: {len(df):,}")
     
     # Remover coluna hash_key (não existe na tabela Supabase)
@@ -69,26 +113,7 @@ def load_dimension(conn, table_name: str, csv_file: Path, checkpoint_file: Path,
         df = df.drop(columns=['hash_key'])
     
     # Limpeza de dados específica para cada tabela
-    if table_name == 'dim_paciente':
-        # Limpar campo idade: "0-1" -> 0, valores inválidos -> NULL
-        if 'idade' in df.columns:
-            # Converter "0-1" para 0
-            df['idade'] = df['idade'].astype(str).str.replace('0-1', '0')
-            # Converter para numérico, inválidos viram NaN
-            df['idade'] = pd.to_numeric(df['idade'], errors='coerce')
-            # Converter NaN para None (NULL no Postgres)
-            df['idade'] = df['idade'].where(pd.notna(df['idade']), None)
-            
-            invalidos = df['idade'].isna().sum()
-            if invalidos > 0:
-                print(f"      AVISO: {invalidos} registros com idade invalida convertidos para NULL")
-        
-        # Limpar campo estado_civil: "0" -> NULL (sem informação)
-        if 'estado_civil' in df.columns:
-            df.loc[df['estado_civil'] == '0', 'estado_civil'] = None
-            nulos = df['estado_civil'].isna().sum()
-            if nulos > 0:
-                print(f"      INFO: {nulos} registros com estado_civil desconhecido (NULL)")
+    df = prepare_dimension(df, table_name)
     
     # Colunas restantes
     columns = df.columns.tolist()
@@ -102,7 +127,8 @@ def load_dimension(conn, table_name: str, csv_file: Path, checkpoint_file: Path,
     
     with conn.cursor() as cur:
         # Fazer COPY direto para a tabela
-        # O Postgres vai gerar o ID (SERIAL) automaticamente
+        # O Postgres vai gerar o ID (SERIAL) automaticamente, exceto se o
+        # arquivo trouxer a coluna id (etl_dimensions.py --ids-inteiros)
         cur.copy_expert(
             sql=f"""
                 COPY {table_name}({','.join(columns)})
@@ -111,6 +137,8 @@ def load_dimension(conn, table_name: str, csv_file: Path, checkpoint_file: Path,
             """,
             file=csv_buffer
         )
+        if 'id' in columns:
+            sync_id_sequence(cur, table_name)
         
         # Verificar quantidade de registros inseridos
         cur.execute(f"SELECT COUNT(*) FROM {table_name};")
@@ -126,6 +154,180 @@ def load_dimension(conn, table_name: str, csv_file: Path, checkpoint_file: Path,
     print(f"      Checkpoint atualizado")
 
 
+def check_mapping(cur, table_name: str, mapping_table: str):
+    """
+    Confere se map_<dim> tem exatamente um par para cada linha da dimensão.
+    Levanta RuntimeError (carga desfeita pelo rollback) se não tiver.
+    """
+    cur.execute(f"""
+        SELECT (SELECT COUNT(*) FROM {table_name}),
+               (SELECT COUNT(DISTINCT original_id) FROM {mapping_table}),
+               (SELECT COUNT(*) FROM {mapping_table});
+    """)
+    linhas, ids_mapeados, pares = cur.fetchone()
+    if not linhas == ids_mapeados == pares:
+        raise RuntimeError(
+            f"{table_name} tem {linhas:,} registros e {mapping_table} mapeia {ids_mapeados:,} "
+            f"ids em {pares:,} hash_keys (dimensao carregada sem --staging ou alterada "
+            f"fora da carga). Trunque {table_name} e {mapping_table} e carregue de novo"
+        )
+
+
+def sync_mapping(cur, table_name: str, mapping_table: str, staging_ids: str = None):
+    """
+    Alinha map_<dim> com a dimensão antes de uma carga via staging.
+    
+    1. Remove os pares cujo id não existe mais na dimensão (o TRUNCATE ...
+       RESTART IDENTITY CASCADE da dimensão não limpa o map)
+    2. Com ids vindos do arquivo (staging_ids = tabela de staging com as
+       colunas hash_key e id), refaz os pares das linhas que já estão na
+       dimensão: os ids do etl são estáveis, então o arquivo diz de qual
+       hash_key é cada id
+    3. Confere o resultado (check_mapping)
+    """
+    cur.execute(f"""
+        DELETE FROM {mapping_table} m
+        WHERE NOT EXISTS (SELECT 1 FROM {table_name} d WHERE d.id = m.original_id);
+    """)
+    if cur.rowcount:
+        print(f"      INFO: {cur.rowcount:,} hash_keys de {mapping_table} sem registro "
+              f"na dimensao removidas")
+    
+    if staging_ids:
+        cur.execute(f"""
+            INSERT INTO {mapping_table} (hash_key, original_id)
+            SELECT s.hash_key, s.id
+            FROM {staging_ids} s
+            JOIN {table_name} d ON d.id = s.id
+            ON CONFLICT (hash_key) DO UPDATE SET original_id = EXCLUDED.original_id;
+        """)
+    
+    check_mapping(cur, table_name, mapping_table)
+
+
+def load_dimension_staging(conn, table_name: str, csv_file: Path, checkpoint_file: Path, checkpoint: dict):
+    """
+    Carrega uma dimensão via tabela de staging, gerando no próprio banco o
+    mapeamento hash_key -> id (map_{table_name}).
+    
+    1. COPY das linhas (com hash_key e a ordem do arquivo) para uma tabela
+       temporária com os mesmos tipos da dimensão
+    2. Um único comando: reserva os ids (nextval, na ordem do arquivo),
+       insere na dimensão (OVERRIDING SYSTEM VALUE ... RETURNING id) e grava
+       o par (hash_key, id) de cada linha inserida em map_{table_name}
+    
+    Não depende de SELECT id ORDER BY id alinhado com a ordem do arquivo, e
+    as hash_keys já presentes na dimensão (via map_{table_name}) são
+    ignoradas: uma nova carga (ex.: após o etl_star.py --incremental) insere
+    só as linhas novas.
+    
+    O map_{table_name} é conferido com a própria dimensão antes (ver
+    sync_mapping): pares cujo id não está mais na dimensão (TRUNCATE) são
+    removidos, e uma dimensão com linhas que o map não conhece (carregada
+    sem --staging) interrompe a carga em vez de duplicar as linhas.
+    
+    Se o arquivo tiver a coluna id (etl_dimensions.py --ids-inteiros), esse
+    id é gravado no lugar do nextval.
+    """
+    if table_name in checkpoint["loaded_tables"]:
+        print(f"   [SKIP] {table_name} - ja carregado")
+        return
+    
+    print(f"\n   Carregando (staging): {table_name}")
+
+    if not csv_file.exists():
+        print(f"      ERRO: Arquivo {csv_file} nao encontrado!")
+        return
+
+    from io import StringIO
+    
+    df = read_table(csv_file, dtype={'hash_key': str})
+    print(f"      Registros no arquivo: {len(df):,}")
+    
+    df = prepare_dimension(df, table_name)
+    df.insert(0, 'ordem', range(len(df)))
+    
+    columns = [col for col in df.columns if col not in ('ordem', 'hash_key')]
+    staging_table = f"stg_{table_name}"
+    mapping_table = f"map_{table_name}"
+    lista = ', '.join(columns)
+    
+    ids_do_arquivo = 'id' in columns
+    lista_insert = ', '.join(col for col in columns if col != 'id')
+    gerar_id = "" if ids_do_arquivo else (
+        f"nextval(pg_get_serial_sequence('{table_name}', 'id')) AS id, "
+    )
+    
+    csv_buffer = StringIO()
+    df[['ordem', 'hash_key'] + columns].to_csv(csv_buffer, index=False, header=False, na_rep='')
+    csv_buffer.seek(0)
+    
+    with conn.cursor() as cur:
+        # Staging com os tipos da dimensão + hash_key e ordem do arquivo
+        cur.execute(f"DROP TABLE IF EXISTS {staging_table};")
+        cur.execute(f"""
+            CREATE TEMP TABLE {staging_table} AS
+            SELECT 0::BIGINT AS ordem, ''::TEXT AS hash_key, {lista}
+            FROM {table_name} WITH NO DATA;
+        """)
+        cur.copy_expert(
+            sql=f"""
+                COPY {staging_table}(ordem, hash_key, {lista})
+                FROM STDIN
+                WITH (FORMAT CSV, DELIMITER ',', NULL '', ENCODING 'UTF8');
+            """,
+            file=csv_buffer
+        )
+        
+        cur.execute(f"""
+            CREATE TABLE IF NOT EXISTS {mapping_table} (
+                hash_key VARCHAR(32) PRIMARY KEY,
+                original_id INTEGER
+            );
+        """)
+        
+        sync_mapping(cur, table_name, mapping_table, staging_table if ids_do_arquivo else None)
+        
+        # ids + dimensão + mapeamento em uma única passada no servidor
+        cur.execute(f"""
+            WITH novos AS (
+                SELECT {gerar_id}s.*
+                FROM (
+                    SELECT * FROM {staging_table} s
+                    WHERE NOT EXISTS (
+                        SELECT 1 FROM {mapping_table} m WHERE m.hash_key = s.hash_key
+                    )
+                    ORDER BY s.ordem
+                ) s
+            ),
+            inseridos AS (
+                INSERT INTO {table_name} (id, {lista_insert}) OVERRIDING SYSTEM VALUE
+                SELECT id, {lista_insert} FROM novos
+                RETURNING id
+            )
+            INSERT INTO {mapping_table} (hash_key, original_id)
+            SELECT n.hash_key, i.id
+            FROM inseridos i
+            JOIN novos n ON n.id = i.id;
+        """)
+        inseridos = cur.rowcount
+        check_mapping(cur, table_name, mapping_table)
+        
+        cur.execute(f"DROP TABLE {staging_table};")
+        if ids_do_arquivo:
+            sync_id_sequence(cur, table_name)
+        
+        print(f"      [OK] {inseridos:,} registros inseridos "
+              f"({len(df) - inseridos:,} ja existentes na dimensao)")
+
+    conn.commit()
+    
+    # Atualizar checkpoint
+    checkpoint["loaded_tables"].append(table_name)
+    save_checkpoint(checkpoint_file, checkpoint)
+    print(f"      Checkpoint atualizado")
+
+
 def create_hash_mapping_table(conn, dim_table: str, csv_file: Path):
     """
     Cria uma tabela temporária que mapeia hash_key -> id gerado pelo Supabase.
@@ -144,9 +346,8 @@ def create_hash_mapping_table(conn, dim_table: str, csv_file: Path):
             );
         """)
         
-        # Carregar CSV com hash_key
-        import pandas as pd
-        df = pd.read_csv(csv_file)
+        # Carregar hash_key da dimensão (como texto)
+        df = read_table(csv_file, ['hash_key'], {'hash_key': "str"})
         
         if 'hash_key' not in df.columns:
             print(f"      AVISO: hash_key nao encontrada em {csv_file.name}")
@@ -161,12 +362,9 @@ def create_hash_mapping_table(conn, dim_table: str, csv_file: Path):
             print(f"      ERRO: Quantidade de IDs ({len(ids)}) != registros no CSV ({len(df)})")
             return
         
-        # Inserir mapeamento
-        for hash_key, gen_id in zip(df['hash_key'], ids):
-            cur.execute(f"""
-                INSERT INTO {mapping_table} (hash_key, generated_id)
-                VALUES (%s, %s);
-            """, (hash_key, gen_id))
+        # Inserir mapeamento (COPY único) e indexar depois da carga
+        copy_mapping(cur, mapping_table, "generated_id", df['hash_key'].to_numpy(), ids)
+        cur.execute(f"CREATE INDEX ON {mapping_table}(hash_key);")
         
         conn.commit()
         print(f"      [OK] {len(ids):,} mapeamentos criados")
@@ -187,19 +385,18 @@ def load_fact_table(conn, csv_file: Path):
     from io import StringIO
     
     # Ler apenas o cabeçalho para identificar as colunas
-    print(f"      Lendo estrutura do CSV...")
-    df_sample = pd.read_csv(csv_file, nrows=1)
+    print(f"      Lendo estrutura do arquivo...")
+    file_columns = table_columns(csv_file)
     
     # Remover colunas geradas (GENERATED COLUMNS) - não podem ser inseridas
     generated_columns = ['sobreviveu']  # Coluna calculada: (data_obito IS NULL)
     
-    columns_to_drop = [col for col in generated_columns if col in df_sample.columns]
+    columns_to_drop = [col for col in generated_columns if col in file_columns]
     if columns_to_drop:
-        df_sample = df_sample.drop(columns=columns_to_drop)
         print(f"      Removendo colunas geradas: {', '.join(columns_to_drop)}")
     
-    # Colunas que serão inseridas
-    columns = df_sample.columns.tolist()
+    # Colunas que serão inseridas (as geradas nem são lidas do arquivo)
+    columns = [col for col in file_columns if col not in columns_to_drop]
     print(f"      Colunas para COPY: {len(columns)}")
     
     # Processar CSV em chunks diretamente (sem carregar tudo na memória)
@@ -209,23 +406,19 @@ def load_fact_table(conn, csv_file: Path):
     chunk_num = 0
     total_rows = 0
     
-    # Ler CSV em chunks usando chunksize
+    # Ler arquivo em chunks usando chunksize
     try:
-        chunk_iterator = pd.read_csv(
+        chunk_iterator = iter_table_chunks(
             csv_file,
-            chunksize=chunk_size,
+            chunk_size,
+            columns,
             low_memory=False,
-            dtype=str  # Ler tudo como string primeiro para evitar problemas de tipo
+            dtype=str  # CSV: ler tudo como string para evitar problemas de tipo
         )
         
         for chunk in chunk_iterator:
             chunk_num += 1
             
-            # Remover colunas geradas do chunk
-            for col in columns_to_drop:
-                if col in chunk.columns:
-                    chunk = chunk.drop(columns=[col])
-            
             # Garantir que as colunas estão na mesma ordem
             chunk = chunk[columns]
             
@@ -274,8 +467,350 @@ def load_fact_table(conn, csv_file: Path):
         print(f"\n      [CONCLUIDO] {count:,} registros na tabela fato")
 
 
+def _column_types(cur, table_name: str) -> dict:
+    """Tipo SQL (format_type) de cada coluna de table_name."""
+    cur.execute("""
+        SELECT attname, format_type(atttypid, atttypmod)
+        FROM pg_attribute
+        WHERE attrelid = %s::regclass AND attnum > 0 AND NOT attisdropped;
+    """, (table_name,))
+    return dict(cur.fetchall())
+
+
+class _FaixaArquivo:
+    """Leitura de um arquivo limitada aos bytes [inicio, fim), para o COPY."""
+    
+    def __init__(self, f, inicio: int, fim: int):
+        f.seek(inicio)
+        self._f = f
+        self._restante = fim - inicio
+    
+    def read(self, size: int = -1) -> bytes:
+        if size < 0 or size > self._restante:
+            size = self._restante
+        dados = self._f.read(size)
+        self._restante -= len(dados)
+        return dados
+
+
+def _contar_aspas(f, n: int, bloco: int = 1 << 23) -> int:
+    """Aspas (") nos próximos n bytes de f, lidos em blocos."""
+    aspas = 0
+    while n > 0:
+        dados = f.read(min(n, bloco))
+        if not dados:
+            break
+        aspas += dados.count(b'"')
+        n -= len(dados)
+    return aspas
+
+
+def split_csv_ranges(csv_file: Path, partes: int) -> list:
+    """
+    Divide o CSV (sem o cabeçalho) em até `partes` faixas de bytes de
+    tamanho parecido, cada uma terminando em fim de registro.
+
+    Um campo entre aspas pode ter quebras de linha: um "\\n" só fecha o
+    registro se o número de aspas desde o início dos dados for par (as
+    aspas escapadas, "", contam duas vezes e não mudam a paridade). Para
+    isso o arquivo é lido até o último corte; com uma parte só, nada é lido.
+
+    Returns:
+        list: [(inicio, fim), ...] em bytes
+    """
+    tamanho = csv_file.stat().st_size
+
+    with open(csv_file, 'rb') as f:
+        f.readline()  # cabeçalho
+        cortes = [f.tell()]
+        aspas = 0  # aspas entre cortes[0] e f.tell()
+
+        for i in range(1, partes):
+            alvo = cortes[0] + (tamanho - cortes[0]) * i // partes
+            # A partir do byte anterior: se o alvo já é início de registro,
+            # o readline consome só o "\n" e o corte fica no alvo
+            inicio = max(alvo - 1, f.tell())
+            aspas += _contar_aspas(f, inicio - f.tell())
+            while True:
+                linha = f.readline()
+                aspas += linha.count(b'"')
+                if not linha or aspas % 2 == 0:
+                    break
+            if cortes[-1] < f.tell() < tamanho:
+                cortes.append(f.tell())
+
+        cortes.append(tamanho)
+
+    return [(inicio, fim) for inicio, fim in zip(cortes[:-1], cortes[1:]) if fim > inicio]
+
+
+def _copy_chunks(cur, copy_sql: str, chunks) -> int:
+    """COPY de blocos de DataFrame (convertidos para CSV em memória)."""
+    from io import StringIO
+
+    linhas = 0
+    for chunk in chunks:
+        csv_buffer = StringIO()
+        chunk.to_csv(csv_buffer, index=False, header=False, na_rep='')
+        csv_buffer.seek(0)
+        cur.copy_expert(sql=copy_sql, file=csv_buffer)
+        linhas += len(chunk)
+    return linhas
+
+
+def _load_part(conn, parte, fact_file: Path, columns: list, copy_sql: str,
+               chunk_size: int, staging_sql: str = None, insert_sql: str = None) -> int:
+    """
+    Carga de uma parte da fato (faixa de bytes do CSV ou row groups do
+    Parquet) por uma conexão, sem commit.
+
+    Sem insert_sql, o COPY vai direto para a fato. Com insert_sql, o COPY
+    vai para a staging temporária criada por staging_sql e o INSERT a
+    passa para a fato na mesma transação; se o INSERT gravar menos
+    registros do que o COPY leu (hash_key sem mapeamento), é erro.
+
+    Returns:
+        int: registros gravados
+    """
+    with conn.cursor() as cur:
+        if staging_sql:
+            cur.execute(staging_sql)
+
+        if fact_file.suffix == ".csv":
+            # A faixa de bytes vai do disco direto para o COPY, sem pandas
+            with open(fact_file, 'rb') as f:
+                cur.copy_expert(sql=copy_sql, file=_FaixaArquivo(f, *parte))
+            linhas = cur.rowcount
+        else:
+            chunks = iter_table_chunks(fact_file, chunk_size, columns, row_groups=parte)
+            linhas = _copy_chunks(cur, copy_sql, chunks)
+
+        if insert_sql:
+            cur.execute(insert_sql)
+            if cur.rowcount != linhas:
+                raise RuntimeError(
+                    f"{linhas - cur.rowcount:,} registros da fato com hash_key sem "
+                    f"mapeamento em map_<dim> (carga desfeita)"
+                )
+    return linhas
+
+
+def _run_part(carregar, conn, parte) -> tuple:
+    """carregar(conn, parte) cronometrado: (registros, segundos)."""
+    inicio = time.perf_counter()
+    linhas = carregar(conn, parte)
+    return linhas, time.perf_counter() - inicio
+
+
+def split_fact_file(fact_file: Path, workers: int) -> list:
+    """
+    Partes da fato para a carga paralela, na ordem do arquivo: faixas de
+    bytes no CSV (ver split_csv_ranges), row groups consecutivos no Parquet.
+    """
+    if fact_file.suffix == ".csv":
+        return split_csv_ranges(fact_file, workers)
+
+    grupos = parquet_row_groups(fact_file)
+    limites = [grupos * i // workers for i in range(workers + 1)]
+    return [list(range(inicio, fim)) for inicio, fim in zip(limites[:-1], limites[1:]) if fim > inicio]
+
+
+def copy_parallel(conn_params: dict, partes: list, carregar) -> int:
+    """
+    Carga das partes da fato (ver split_fact_file) em paralelo, uma conexão
+    do pool por parte: carregar(conn, parte) faz o COPY (e o INSERT, com
+    staging) da parte inteira na transação da sua conexão.
+
+    O commit só é feito depois que todas as partes terminam; se alguma
+    falhar, todas são desfeitas. Os commits em si são um por conexão: uma
+    queda no meio deles ainda pode deixar só parte da fato gravada.
+
+    Imprime registros/s de cada worker e do total.
+
+    Returns:
+        int: total de registros gravados
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from psycopg2.pool import ThreadedConnectionPool
+
+    print(f"      COPY paralelo: {len(partes)} partes, {len(partes)} conexoes")
+
+    inicio = time.perf_counter()
+    pool = ThreadedConnectionPool(1, len(partes), **conn_params)
+    conexoes = []
+    try:
+        conexoes.extend(pool.getconn() for _ in partes)
+        # Threads bastam: o trabalho é de rede/servidor, e o psycopg2 libera
+        # o GIL durante o COPY e o INSERT. O with só termina quando todos os
+        # workers terminam, com ou sem erro
+        with ThreadPoolExecutor(max_workers=len(partes)) as executor:
+            futures = [
+                executor.submit(_run_part, carregar, conn, parte)
+                for conn, parte in zip(conexoes, partes)
+            ]
+            total = 0
+            for i, future in enumerate(futures, 1):
+                linhas, segundos = future.result()
+                total += linhas
+                print(f"      [Worker {i}] {linhas:,} registros em {segundos:.1f}s "
+                      f"({linhas / max(segundos, 1e-9):,.0f} registros/s)")
+
+        for conn in conexoes:
+            conn.commit()
+    except Exception:
+        for conn in conexoes:
+            conn.rollback()
+        raise
+    finally:
+        pool.closeall()
+
+    segundos = time.perf_counter() - inicio
+    print(f"      [OK] {total:,} registros em {segundos:.1f}s "
+          f"({total / max(segundos, 1e-9):,.0f} registros/s no total)")
+    return total
+
+
+def load_fact_staging(conn, fact_file: Path, chunk_size: int = 50000,
+                      mapear_fks: bool = True, workers: int = 1,
+                      conn_params: dict = None):
+    """
+    Carga da tabela fato por COPY, com as FKs resolvidas no servidor.
+
+    Com mapear_fks, cada parte do arquivo é copiada (hash_keys como texto)
+    para uma tabela temporária de staging, toda em TEXT, e um INSERT ...
+    SELECT a junta às 8 tabelas map_<dim> (criadas pelo
+    load_dimension_staging ou pelo create_hash_mapping.py), gravando as
+    FKs inteiras, com cada coluna convertida para o tipo da fato. Se alguma
+    hash_key não estiver no mapeamento, nada é gravado na fato.
+
+    Sem mapear_fks (fato gerada com --ids-inteiros, ou carga sem --staging
+    com hash_keys nas FKs) o COPY vai direto para a fato. No CSV com
+    colunas que a fato não aceita (ex.: a gerada sobreviveu), que o COPY
+    não tem como pular, a parte passa pela staging, sem JOIN.
+
+    O CSV vai direto do disco para o COPY, sem pandas; o Parquet é
+    convertido em blocos de chunk_size.
+
+    Com workers > 1, o arquivo é dividido em partes (ver split_fact_file)
+    e cada uma é carregada por uma conexão, aberta com conn_params, do
+    COPY ao INSERT (ver copy_parallel). Cada parte entra na fato na ordem
+    do arquivo, mas as partes entram ao mesmo tempo: a ordem dos ids da
+    fato entre partes não segue a do arquivo.
+    """
+    print(f"\n   Carregando tabela fato (staging)...")
+
+    if not fact_file.exists():
+        print(f"      ERRO: Arquivo {fact_file} nao encontrado!")
+        return
+
+    staging_table = "stg_fato_casos_oncologicos"
+    file_columns = table_columns(fact_file)
+    fk_dims = {fact_col: dim_name for dim_name, (fact_col, _) in DIMENSION_KEYS.items()}
+
+    with conn.cursor() as cur:
+        tipos = _column_types(cur, "fato_casos_oncologicos")
+
+        # Colunas geradas (ex.: sobreviveu) ficam na staging, mas não são inseridas
+        cur.execute("""
+            SELECT column_name FROM information_schema.columns
+            WHERE table_name = 'fato_casos_oncologicos' AND is_generated = 'ALWAYS';
+        """)
+        geradas = {row[0] for row in cur.fetchall()}
+    conn.commit()
+    columns = [col for col in file_columns if col in tipos and col not in geradas]
+
+    copy_sql = """
+        COPY {tabela}({colunas})
+        FROM STDIN
+        WITH (FORMAT CSV, DELIMITER ',', NULL '', ENCODING 'UTF8');
+    """
+    # O Parquet é lido só com as colunas da fato
+    direto = not mapear_fks and (fact_file.suffix != ".csv" or columns == file_columns)
+    if direto:
+        carregar_parte = functools.partial(
+            _load_part, fact_file=fact_file, columns=columns, chunk_size=chunk_size,
+            copy_sql=copy_sql.format(tabela="fato_casos_oncologicos", colunas=','.join(columns))
+        )
+    else:
+        selecao = []
+        juncoes = []
+        for col in columns:
+            if col in fk_dims and mapear_fks:
+                alias = f"m_{col}"
+                selecao.append(f"{alias}.original_id")
+                juncoes.append(
+                    f"JOIN map_{fk_dims[col]} {alias} ON {alias}.hash_key = s.{col}"
+                )
+            else:
+                selecao.append(f"s.{col}::{tipos[col]}")
+
+        # Temporária: uma por conexão, com o mesmo nome, removida no fim da
+        # transação. ordem: preenchida pelo COPY na ordem das linhas (a
+        # ordem física da tabela não é garantida)
+        carregar_parte = functools.partial(
+            _load_part, fact_file=fact_file, columns=file_columns, chunk_size=chunk_size,
+            copy_sql=copy_sql.format(tabela=staging_table, colunas=','.join(file_columns)),
+            staging_sql=f"""
+                CREATE TEMP TABLE {staging_table} (
+                    ordem BIGINT GENERATED ALWAYS AS IDENTITY,
+                    {', '.join(f'{col} TEXT' for col in file_columns)}
+                ) ON COMMIT DROP;
+            """,
+            insert_sql=f"""
+                INSERT INTO fato_casos_oncologicos ({', '.join(columns)})
+                SELECT {', '.join(selecao)}
+                FROM {staging_table} s
+                {' '.join(juncoes)}
+                ORDER BY s.ordem;
+            """
+        )
+
+    if direto:
+        print("      COPY direto para a fato...")
+    else:
+        print(f"      COPY para {staging_table} e " +
+              ("resolvendo hash_keys na fato..." if mapear_fks else "inserindo na fato..."))
+
+    # Arquivo pequeno demais para dividir: carga serial, na conexão principal
+    partes = split_fact_file(fact_file, max(workers, 1))
+    if len(partes) > 1:
+        inseridos = copy_parallel(conn_params, partes, carregar_parte)
+    else:
+        try:
+            inseridos = sum(carregar_parte(conn, parte) for parte in partes)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    print(f"\n      [CONCLUIDO] {inseridos:,} registros inseridos na tabela fato")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Carrega dimensoes e tabela fato no Supabase.")
+    parser.add_argument(
+        "--formato", choices=FORMATOS, default="csv",
+        help="Formato dos arquivos de dimensions/ e facts/ (padrao: csv)"
+    )
+    parser.add_argument(
+        "--staging", action="store_true",
+        help="Carrega via tabelas de staging: as dimensoes geram as tabelas "
+             "map_<dim> (hash_key -> id) no proprio banco (dispensa o "
+             "create_hash_mapping.py) e a fato e gravada com FKs inteiras, "
+             "resolvidas por JOIN com map_<dim>"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=1,
+        help="Conexoes para o COPY da fato em paralelo, cada uma com uma "
+             "parte do arquivo (padrao: 1, serial)"
+    )
+    return parser.parse_args()
+
+
 def main():
     """Carrega dimensões e tabela fato no Supabase."""
+    args = parse_args()
+    
     print("="*60)
     print("CARGA PARA SUPABASE")
     print("="*60)
@@ -296,14 +831,15 @@ def main():
 
     # Conectar ao Supabase
     print("\n1. Conectando ao Supabase...")
+    conn_params = dict(
+        host=os.getenv("SUPABASE_HOST"),
+        database=os.getenv("SUPABASE_DB"),
+        user=os.getenv("SUPABASE_USER"),
+        password=os.getenv("SUPABASE_PASSWORD"),
+        port=os.getenv("SUPABASE_PORT", 5432)
+    )
     try:
-        conn = psycopg2.connect(
-            host=os.getenv("SUPABASE_HOST"),
-            database=os.getenv("SUPABASE_DB"),
-            user=os.getenv("SUPABASE_USER"),
-            password=os.getenv("SUPABASE_PASSWORD"),
-            port=os.getenv("SUPABASE_PORT", 5432)
-        )
+        conn = psycopg2.connect(**conn_params)
         print("   [OK] Conexao estabelecida")
     except Exception as e:
         print(f"\n   ERRO ao conectar: {e}")
@@ -332,18 +868,16 @@ def main():
         
         # Ordem de carga: dimensões não dependentes primeiro
         dimensions = [
-            ("dim_paciente", dimensions_dir / "dim_paciente.csv"),
-            ("dim_localizacao", dimensions_dir / "dim_localizacao.csv"),
-            ("dim_instituicao", dimensions_dir / "dim_instituicao.csv"),
-            ("dim_tumor", dimensions_dir / "dim_tumor.csv"),
-            ("dim_fatores_risco", dimensions_dir / "dim_fatores_risco.csv"),
-            ("dim_ocupacao", dimensions_dir / "dim_ocupacao.csv"),
-            ("dim_tempo", dimensions_dir / "dim_tempo.csv"),
-            ("dim_tratamento", dimensions_dir / "dim_tratamento.csv")
+            (dim_name, table_file(dimensions_dir, dim_name, args.formato))
+            for dim_name in [
+                "dim_paciente", "dim_localizacao", "dim_instituicao", "dim_tumor",
+                "dim_fatores_risco", "dim_ocupacao", "dim_tempo", "dim_tratamento"
+            ]
         ]
         
+        carregar = load_dimension_staging if args.staging else load_dimension
         for table_name, csv_file in dimensions:
-            load_dimension(conn, table_name, csv_file, checkpoint_file, checkpoint)
+            carregar(conn, table_name, csv_file, checkpoint_file, checkpoint)
 
         print("\n" + "="*60)
         print("3. Dimensoes carregadas com sucesso!")
@@ -355,7 +889,8 @@ def main():
         print("="*60)
         print("\nAVISO: A tabela fato possui ~3.7 milhoes de registros")
         print("       Este processo pode demorar 10-30 minutos")
-        print("       Use hash_keys como foreign keys temporariamente")
+        if not args.staging:
+            print("       Use hash_keys como foreign keys temporariamente")
         print("\nDeseja continuar? (s/n): ", end="")
         
         # Para automação, comentar a linha abaixo
@@ -365,7 +900,15 @@ def main():
         #     return
         
         
-        load_fact_table(conn, facts_dir / "fato_casos_oncologicos.csv")
+        fact_file = table_file(facts_dir, "fato_casos_oncologicos", args.formato)
+        if args.staging or args.workers > 1:
+            # Sem --staging, as FKs vão para a fato como estão no arquivo
+            dim_file = table_file(dimensions_dir, "dim_paciente", args.formato)
+            ids_inteiros = dim_file.exists() and 'id' in table_columns(dim_file)
+            load_fact_staging(conn, fact_file, mapear_fks=args.staging and not ids_inteiros,
+                              workers=args.workers, conn_params=conn_params)
+        else:
+            load_fact_table(conn, fact_file)
 
         print("\n" + "="*60)
         print("CARGA CONCLUIDA!")
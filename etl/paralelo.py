@@ -0,0 +1,53 @@
+"""
+ETL - EXECUÇÃO EM PARALELO (UM ARQUIVO POR PROCESSO)
+====================================================
+Partes comuns aos scripts que processam vários arquivos em um
+ProcessPoolExecutor (etl_cleaning.py, etl_fact.py e processar_dbf.py):
+
+- a opção --workers (mesmo texto e mesma regra em todos os scripts)
+- a captura do log de cada arquivo, impresso de uma vez pelo processo
+  principal, para não misturar as mensagens de arquivos diferentes
+
+Autor: Sistema ETL RHC
+Data: Outubro 2025
+"""
+
+from contextlib import redirect_stdout
+from io import StringIO
+import os
+import traceback
+
+
+def add_workers_argument(parser, descricao: str):
+    """Acrescenta --workers ao parser (ex.: descricao="Processos para ...")."""
+    parser.add_argument(
+        "--workers", type=int, default=1,
+        help=f"{descricao} (padrao: 1, serial; 0 = um por CPU)"
+    )
+
+
+def resolve_workers(workers: int, tarefas: int) -> int:
+    """Processos a usar: 0 = um por CPU, nunca mais que o número de tarefas."""
+    return min(workers or os.cpu_count() or 1, tarefas)
+
+
+def executar_com_log(func, *args, **kwargs) -> tuple:
+    """
+    Executa func(*args, **kwargs) em um processo do pool, guardando o log.
+
+    Uma exceção de func não se perde: o traceback entra no fim do log, que
+    volta inteiro para o processo principal.
+
+    Returns:
+        tuple: (sucesso: bool, log: str); sucesso é False se func levantar
+               exceção ou devolver False
+    """
+    log = StringIO()
+    with redirect_stdout(log):
+        try:
+            sucesso = func(*args, **kwargs) is not False
+        except Exception as e:
+            print(f"      ERRO: {e}")
+            print(traceback.format_exc(), end="")
+            sucesso = False
+    return sucesso, log.getvalue()
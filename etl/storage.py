@@ -0,0 +1,468 @@
+"""
+ETL - LEITURA E ESCRITA DOS ARTEFATOS INTERMEDIÁRIOS
+=====================================================
+Todas as etapas (limpeza, dimensões, fato, validação e carga) trocam dados
+por arquivos em data_processed/ e dimensions/. Este módulo centraliza a
+leitura e a escrita desses arquivos em dois formatos:
+
+- csv:     formato original (texto, tipos inferidos a cada leitura)
+- parquet: colunar e tipado (requer pyarrow)
+           * colunas de texto com poucos valores distintos → dicionário
+             (categorical no pandas)
+           * colunas de data → date32 (lidas de volta como datetime.date,
+             cujo str() é o mesmo "YYYY-MM-DD" usado no hash)
+           * compressão zstd
+
+Nos dois formatos cada etapa lê só as colunas que usa. Com um schema
+declarado (ex.: etl_cleaning.CLEANED_SCHEMA), read_table e iter_table_chunks
+não inferem tipos: cada coluna é lida como texto livre ("str", como está
+no arquivo) ou como código categórico ("category"), cujo texto é canonizado
+(35.0 e "35.0" → "35", datetime.date → "YYYY-MM-DD"). Assim o mesmo código
+gera o mesmo hash em qualquer ano e em qualquer formato; sem schema, o CSV
+infere os tipos a cada leitura e 35 pode virar 35.0 conforme o arquivo.
+
+IMPORTANTE: use o MESMO formato em todas as etapas de uma execução.
+
+Autor: Sistema ETL RHC
+Data: Outubro 2025
+"""
+
+from pathlib import Path
+import datetime
+import hashlib
+import re
+import shutil
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from dates import parse_dates
+
+
+FORMATOS = ("csv", "parquet")
+EXTENSOES = {"csv": ".csv", "parquet": ".parquet"}
+
+# Texto vira dicionário quando a razão valores distintos / linhas é no máximo esta
+LIMITE_DICIONARIO = 0.5
+
+COMPRESSAO_PARQUET = "zstd"
+
+
+def _pyarrow():
+    """Importa pyarrow sob demanda (só é necessário no formato parquet)."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError(
+            "O formato parquet requer o pacote pyarrow: pip install pyarrow"
+        ) from e
+    return pa, pq
+
+
+def _is_parquet(path: Path) -> bool:
+    # suffixes, e não suffix: cobre também temporários como x.parquet.tmp
+    return EXTENSOES["parquet"] in Path(path).suffixes
+
+
+# ==============================================================================
+# NOMES DE ARQUIVOS
+# ==============================================================================
+
+def table_file(directory: Path, name: str, formato: str) -> Path:
+    """Caminho do artefato `name` no formato informado (ex.: dim_paciente.parquet)."""
+    return Path(directory) / f"{name}{EXTENSOES[formato]}"
+
+
+def list_table_files(directory: Path, prefix: str, formato: str) -> list:
+    """Lista (ordenado) os artefatos `prefix*` do formato informado."""
+    return sorted(Path(directory).glob(f"{prefix}*{EXTENSOES[formato]}"))
+
+
+# ==============================================================================
+# LEITURA
+# ==============================================================================
+
+def table_columns(path: Path) -> list:
+    """Colunas de um artefato, sem carregar os dados."""
+    if _is_parquet(path):
+        _, pq = _pyarrow()
+        return pq.read_schema(path).names
+    return pd.read_csv(path, nrows=0).columns.tolist()
+
+
+def file_checksum(path: Path) -> list:
+    """
+    [tamanho, sha256] do conteúdo de um artefato, lido em blocos de 1 MB.
+
+    Serve para conferir se um arquivo ainda é o mesmo gravado antes, em
+    qualquer formato e sem depender de como o CSV quebra as linhas (um
+    campo entre aspas pode conter quebras de linha).
+    """
+    sha = hashlib.sha256()
+    tamanho = 0
+    with open(path, 'rb') as f:
+        for bloco in iter(lambda: f.read(1 << 20), b''):
+            sha.update(bloco)
+            tamanho += len(bloco)
+    return [tamanho, sha.hexdigest()]
+
+
+def _select_columns(path: Path, columns) -> list:
+    """Interseção (na ordem do arquivo) entre as colunas do arquivo e `columns`."""
+    if columns is None:
+        return None
+    desejadas = set(columns)
+    return [c for c in table_columns(path) if c in desejadas]
+
+
+# ==============================================================================
+# SCHEMA DECLARADO (TEXTO / CATEGÓRICA)
+# ==============================================================================
+
+# Número inteiro escrito como float (ex.: "35.0", gravado quando a coluna
+# tinha nulos no arquivo bruto)
+_INTEIRO_COMO_FLOAT = re.compile(r'^(-?\d+)\.0+$')
+
+
+def canonical_text(valor, codigo: bool = True) -> str:
+    """
+    Texto canônico de um valor: date → "YYYY-MM-DD" e, se `codigo`,
+    35.0 e "35.0" → "35". Texto livre (codigo=False, ex.: valor_total
+    "150.00") fica como está.
+    """
+    if isinstance(valor, datetime.date):
+        return valor.isoformat()[:10]
+    if not codigo:
+        return str(valor)
+    if isinstance(valor, (float, np.floating)) and float(valor).is_integer():
+        return str(int(valor))
+    texto = str(valor)
+    m = _INTEIRO_COMO_FLOAT.match(texto)
+    return m.group(1) if m else texto
+
+
+def _canonical_column(serie: pd.Series, dtype: str) -> pd.Series:
+    """
+    Converte uma coluna para texto ("str", texto livre) ou categórica de
+    código canônico ("category", ver canonical_text). Só os valores
+    distintos são convertidos; nulos continuam nulos.
+    """
+    codigos, unicos = pd.factorize(serie)
+    codigo = dtype == "category"
+    textos = [canonical_text(u, codigo) for u in unicos]
+
+    # Valores diferentes podem ter o mesmo texto (ex.: "35" e "35.0")
+    codigos_texto, categorias = pd.factorize(np.array(textos, dtype=object))
+    codigos = np.where(codigos < 0, -1, codigos_texto[codigos] if len(textos) else codigos)
+
+    if dtype == "category":
+        valores = pd.Categorical.from_codes(codigos, categories=pd.Index(categorias, dtype=object))
+        return pd.Series(valores, index=serie.index, name=serie.name)
+    valores = np.append(np.asarray(categorias, dtype=object), None)[codigos]
+    return pd.Series(valores, index=serie.index, name=serie.name, dtype=object)
+
+
+def map_distinct(serie: pd.Series, func) -> pd.Series:
+    """
+    Aplica `func` uma vez por valor distinto (nulo incluído, como np.nan) e
+    devolve uma categórica com os resultados; resultados None viram nulo.
+
+    Substitui serie.map/apply em colunas categóricas sem passar por object
+    linha a linha.
+    """
+    codigos, unicos = pd.factorize(serie)
+    resultados = [func(u) for u in unicos] + [func(np.nan)]
+    codigos_res, categorias = pd.factorize(pd.Series(resultados, dtype=object))
+    valores = pd.Categorical.from_codes(codigos_res[codigos], categories=categorias)
+    return pd.Series(valores, index=serie.index, name=serie.name)
+
+
+def concat_tables(dfs: list) -> pd.DataFrame:
+    """
+    pd.concat que mantém as colunas categóricas categóricas.
+
+    O pd.concat converte para object uma coluna categórica cujas categorias
+    diferem entre as partes (o normal entre anos/arquivos); aqui as
+    categorias são unidas (union_categoricals) e cada coluna segue com um
+    código inteiro por linha.
+    """
+    if not dfs:
+        return pd.DataFrame()
+    df = pd.concat(dfs, ignore_index=True)
+    for col in df.columns:
+        partes = [parte[col] for parte in dfs if col in parte.columns]
+        if (len(partes) == len(dfs)
+                and all(isinstance(p.dtype, pd.CategoricalDtype) for p in partes)
+                and not isinstance(df[col].dtype, pd.CategoricalDtype)):
+            df[col] = pd.Series(union_categoricals(partes), index=df.index, name=col)
+    return df
+
+
+def apply_schema(df: pd.DataFrame, schema: dict) -> pd.DataFrame:
+    """
+    Aplica o schema declarado às colunas de df: "str" / "category" (ver
+    _canonical_column) ou um dtype do pandas (ex.: "Int32", ids inteiros).
+    """
+    for col in df.columns:
+        if col not in schema:
+            continue
+        if schema[col] in ("str", "category"):
+            df[col] = _canonical_column(df[col], schema[col])
+        else:
+            df[col] = df[col].astype(schema[col])
+    return df
+
+
+def _csv_schema_kwargs(path: Path, columns, schema: dict, csv_kwargs: dict) -> dict:
+    """dtype do read_csv a partir do schema (texto lido sem inferência)."""
+    colunas = _select_columns(path, columns) or table_columns(path)
+    csv_kwargs['dtype'] = {c: schema.get(c, str) for c in colunas}
+    return csv_kwargs
+
+
+def read_table(path: Path, columns: list = None, schema: dict = None,
+               **csv_kwargs) -> pd.DataFrame:
+    """
+    Lê um artefato CSV ou Parquet (pela extensão).
+
+    Args:
+        path: Arquivo .csv ou .parquet
+        columns: Colunas desejadas (as ausentes no arquivo são ignoradas)
+        schema: coluna -> "str" / "category" / dtype (ver apply_schema); as
+            colunas fora do schema são lidas como texto. Sem schema, os tipos são
+            inferidos.
+        **csv_kwargs: Argumentos extras para pd.read_csv (só no CSV)
+    """
+    if _is_parquet(path):
+        df = pd.read_parquet(path, columns=_select_columns(path, columns))
+        return apply_schema(df, schema) if schema else df
+
+    if columns is not None:
+        desejadas = set(columns)
+        csv_kwargs['usecols'] = lambda c: c in desejadas
+    if schema:
+        _csv_schema_kwargs(path, columns, schema, csv_kwargs)
+        return apply_schema(pd.read_csv(path, **csv_kwargs), schema)
+    return pd.read_csv(path, **csv_kwargs)
+
+
+def infer_csv_dtypes(csv_file: Path, chunksize: int, usecols=None) -> dict:
+    """
+    Descobre, lendo o arquivo em chunks, os dtypes que o pd.read_csv
+    inferiria lendo o arquivo inteiro.
+
+    Necessário porque o read_csv com chunksize infere o tipo de cada chunk
+    separadamente: uma coluna pode vir int em um chunk e float em outro, e
+    o valor 35 viraria "35" ou "35.0" no hash conforme o chunk.
+    """
+    tipos = {}
+    for chunk in pd.read_csv(csv_file, chunksize=chunksize, usecols=usecols):
+        for col, dtype in chunk.dtypes.items():
+            tipos.setdefault(col, set()).add(dtype.kind)
+
+    dtypes = {}
+    for col, kinds in tipos.items():
+        if kinds == {'i'}:
+            dtypes[col] = 'int64'
+        elif kinds <= {'i', 'f'}:
+            dtypes[col] = 'float64'
+        elif kinds == {'b'}:
+            dtypes[col] = 'bool'
+        else:
+            dtypes[col] = object
+    return dtypes
+
+
+def parquet_row_groups(path: Path) -> int:
+    """Número de row groups de um artefato Parquet (sem ler os dados)."""
+    _, pq = _pyarrow()
+    return pq.ParquetFile(path).num_row_groups
+
+
+def iter_table_chunks(path: Path, chunksize: int, columns: list = None,
+                      schema: dict = None, row_groups: list = None, **csv_kwargs):
+    """
+    Lê um artefato em blocos de até `chunksize` linhas.
+
+    Com `schema`, cada bloco sai com os tipos declarados (ver read_table).
+    No CSV sem schema nem dtype explícito, os dtypes de todos os chunks são
+    os mesmos da leitura do arquivo inteiro (ver infer_csv_dtypes).
+    No Parquet, `row_groups` limita a leitura a esses row groups.
+    """
+    if _is_parquet(path):
+        _, pq = _pyarrow()
+        arquivo = pq.ParquetFile(path)
+        for batch in arquivo.iter_batches(batch_size=chunksize, row_groups=row_groups,
+                                          columns=_select_columns(path, columns)):
+            df = batch.to_pandas()
+            yield apply_schema(df, schema) if schema else df
+        return
+
+    if columns is not None:
+        desejadas = set(columns)
+        csv_kwargs['usecols'] = lambda c: c in desejadas
+    if schema:
+        _csv_schema_kwargs(path, columns, schema, csv_kwargs)
+        for chunk in pd.read_csv(path, chunksize=chunksize, **csv_kwargs):
+            yield apply_schema(chunk, schema)
+        return
+    if 'dtype' not in csv_kwargs:
+        csv_kwargs['dtype'] = infer_csv_dtypes(path, chunksize, csv_kwargs.get('usecols'))
+    yield from pd.read_csv(path, chunksize=chunksize, **csv_kwargs)
+
+
+# ==============================================================================
+# ESCRITA
+# ==============================================================================
+
+# Tipos declarados por coluna (column_types) para a escrita em Parquet:
+#   "date":  texto "YYYY-MM-DD" (ou datetime.date) → date32
+#   "text":  sempre texto, mesmo que o pandas tenha inferido número
+#   "float": sempre float64, mesmo que o lote só tenha inteiros
+# Colunas sem tipo declarado seguem o dtype do pandas. Declarar o tipo é
+# necessário quando o arquivo é escrito em partes (todas com o mesmo schema).
+
+def _text_array(serie: pd.Series):
+    """Texto (str(valor)) preservando nulos; dicionário se tiver poucos distintos."""
+    pa, _ = _pyarrow()
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        # Só as categorias viram texto; as linhas seguem como códigos
+        categorias = [str(c) for c in serie.cat.categories]
+        codigos = serie.cat.codes.to_numpy()
+        array = pa.DictionaryArray.from_arrays(
+            pa.array(codigos, type=pa.int32(), mask=codigos < 0),
+            pa.array(categorias, type=pa.string()))
+        if len(serie) and serie.nunique() > LIMITE_DICIONARIO * len(serie):
+            array = array.dictionary_decode()
+        return array
+    nulos = serie.isna()
+    texto = serie.astype(object).where(nulos, serie.astype(str))
+    array = pa.array(texto, type=pa.string(), from_pandas=True)
+    if len(serie) and serie.nunique() <= LIMITE_DICIONARIO * len(serie):
+        array = array.dictionary_encode()
+    return array
+
+
+def _to_arrow(df: pd.DataFrame, column_types: dict = None, schema=None):
+    """
+    Converte um DataFrame em tabela Arrow tipada.
+
+    Colunas object/category sem tipo declarado viram texto (valores não-texto
+    viram str(valor), como o CSV gravaria). Com `schema`, a tabela é
+    convertida para ele (escrita em partes).
+    """
+    pa, _ = _pyarrow()
+    column_types = column_types or {}
+    arrays = []
+
+    for col in df.columns:
+        serie = df[col]
+        tipo = column_types.get(col)
+
+        if tipo == "date":
+            datas = parse_dates(serie)
+            array = pa.array(datas.to_numpy().astype('datetime64[D]'),
+                             type=pa.date32(), mask=datas.isna().to_numpy())
+        elif tipo == "float":
+            array = pa.array(pd.to_numeric(serie, errors='coerce').astype('float64'),
+                             from_pandas=True)
+        elif (tipo == "text" or serie.dtype == object
+              or isinstance(serie.dtype, pd.CategoricalDtype)):
+            array = _text_array(serie)
+        else:
+            array = pa.array(serie, from_pandas=True)
+
+        arrays.append(array)
+
+    tabela = pa.Table.from_arrays(arrays, names=[str(c) for c in df.columns])
+    if schema is not None:
+        tabela = tabela.cast(schema)
+    return tabela
+
+
+def write_table(df: pd.DataFrame, path: Path, column_types: dict = None):
+    """
+    Grava um artefato CSV ou Parquet (pela extensão).
+
+    Args:
+        df: Dados
+        path: Arquivo .csv ou .parquet
+        column_types: coluna -> "date" / "text" / "float" (só no Parquet)
+    """
+    if _is_parquet(path):
+        _, pq = _pyarrow()
+        pq.write_table(_to_arrow(df, column_types), path, compression=COMPRESSAO_PARQUET)
+    else:
+        df.to_csv(path, index=False, encoding='utf-8')
+
+
+class TableAppender:
+    """
+    Grava um artefato em partes (ex.: a fato, arquivo a arquivo).
+
+    No CSV o cabeçalho vai só na primeira parte; no Parquet as partes viram
+    row groups de um único arquivo, todas com o schema da primeira parte
+    (declare em column_types as colunas cujo tipo pode variar entre partes).
+
+    Com `base` (um artefato já existente, no mesmo formato), o arquivo
+    começa com as linhas de `base` e as partes são acrescentadas depois
+    delas: no CSV os bytes são copiados como estão; no Parquet os row groups
+    são copiados um a um e as partes seguem o schema de `base`. Nada de
+    `base` é reinterpretado pelo pandas.
+
+    Uso:
+        with TableAppender(path, column_types) as saida:
+            saida.append(df_parte)
+    """
+
+    def __init__(self, path: Path, column_types: dict = None, base: Path = None):
+        self.path = Path(path)
+        self.column_types = column_types
+        self.rows = 0
+        self._writer = None
+        self._schema = None
+        self._header = True
+        if base is not None:
+            self._copy_base(Path(base))
+
+    def _copy_base(self, base: Path):
+        if _is_parquet(self.path):
+            _, pq = _pyarrow()
+            arquivo = pq.ParquetFile(base)
+            self._schema = arquivo.schema_arrow
+            self._writer = pq.ParquetWriter(self.path, self._schema,
+                                            compression=COMPRESSAO_PARQUET)
+            for i in range(arquivo.num_row_groups):
+                self._writer.write_table(arquivo.read_row_group(i))
+        else:
+            shutil.copyfile(base, self.path)
+            self._header = False
+
+    def append(self, df: pd.DataFrame):
+        if _is_parquet(self.path):
+            _, pq = _pyarrow()
+            tabela = _to_arrow(df, self.column_types, self._schema)
+            if self._writer is None:
+                self._schema = tabela.schema
+                self._writer = pq.ParquetWriter(self.path, self._schema,
+                                                compression=COMPRESSAO_PARQUET)
+            self._writer.write_table(tabela)
+        else:
+            df.to_csv(self.path, mode='w' if self._header else 'a',
+                      header=self._header, index=False, encoding='utf-8')
+            self._header = False
+        self.rows += len(df)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
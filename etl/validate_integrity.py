@@ -17,15 +17,19 @@ Data: Outubro 2025
 
 import pandas as pd
 from pathlib import Path
+import argparse
 import sys
 
+from storage import FORMATOS, table_file, table_columns, read_table
+
 
 # ==============================================================================
 # FUNÇÕES DE VALIDAÇÃO
 # ==============================================================================
 
 def validate_dimension(df_fact: pd.DataFrame, df_dim: pd.DataFrame, 
-                      fact_col: str, dim_name: str, sample_size: int = 10000) -> tuple:
+                      fact_col: str, dim_name: str, sample_size: int = 10000,
+                      dim_col: str = 'hash_key') -> tuple:
     """
     Valida se os hashes da fato existem na dimensão.
     
@@ -35,13 +39,15 @@ def validate_dimension(df_fact: pd.DataFrame, df_dim: pd.DataFrame,
         fact_col: Nome da coluna na fato (ex: 'paciente_id')
         dim_name: Nome da dimensão (para mensagens)
         sample_size: Quantidade de registros para testar
+        dim_col: Coluna da dimensão referenciada pela fato ('hash_key', ou
+            'id' com etl_dimensions.py --ids-inteiros)
         
     Returns:
         tuple: (sucesso: bool, taxa_match: float, total_fato: int, total_dim: int, mensagem: str)
     """
     # Obter hashes únicos
     hashes_fato = set(df_fact[fact_col].dropna().unique())
-    hashes_dim = set(df_dim['hash_key'].dropna().unique())
+    hashes_dim = set(df_dim[dim_col].dropna().unique())
     
     # Calcular correspondência
     matches = len(hashes_fato & hashes_dim)  # Interseção
@@ -67,10 +73,11 @@ def validate_dimension(df_fact: pd.DataFrame, df_dim: pd.DataFrame,
 
 
 def print_hash_examples(df_fact: pd.DataFrame, df_dim: pd.DataFrame, 
-                       fact_col: str, dim_name: str, num_examples: int = 5):
+                       fact_col: str, dim_name: str, num_examples: int = 5,
+                       dim_col: str = 'hash_key'):
     """Imprime exemplos de hashes que não batem."""
     hashes_fato = set(df_fact[fact_col].dropna().unique())
-    hashes_dim = set(df_dim['hash_key'].dropna().unique())
+    hashes_dim = set(df_dim[dim_col].dropna().unique())
     
     # Hashes que estão na fato mas não na dimensão
     nao_encontrados = hashes_fato - hashes_dim
@@ -93,42 +100,56 @@ def print_hash_examples(df_fact: pd.DataFrame, df_dim: pd.DataFrame,
 # MAIN
 # ==============================================================================
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Valida os hashes entre dimensoes e fato.")
+    parser.add_argument(
+        "--formato", choices=FORMATOS, default="csv",
+        help="Formato dos arquivos de dimensions/ (padrao: csv)"
+    )
+    return parser.parse_args()
+
+
 def main():
     """Valida a integridade dos hashes entre dimensões e fato."""
+    args = parse_args()
+    
     print("=" * 70)
     print("VALIDACAO DE INTEGRIDADE DOS HASHES")
     print("=" * 70)
     
     dimensions_dir = Path("dimensions")
-    fact_file = dimensions_dir / "fato_casos_oncologicos.csv"
+    fact_file = table_file(dimensions_dir, "fato_casos_oncologicos", args.formato)
     
     # Verificar se tabela fato existe
     if not fact_file.exists():
-        print("\nERRO: Arquivo fato_casos_oncologicos.csv nao encontrado!")
+        print(f"\nERRO: Arquivo {fact_file.name} nao encontrado!")
         print("Execute primeiro: python scripts/etl_fact.py")
         sys.exit(1)
     
+    # Configuração das dimensões
+    dims_config = [
+        ("dim_paciente", "paciente_id", "Paciente"),
+        ("dim_localizacao", "localizacao_id", "Localizacao"),
+        ("dim_instituicao", "instituicao_id", "Instituicao"),
+        ("dim_tumor", "tumor_id", "Tumor"),
+        ("dim_fatores_risco", "fatores_id", "Fatores de Risco"),
+        ("dim_ocupacao", "ocupacao_id", "Ocupacao"),
+        ("dim_tempo", "tempo_id", "Tempo"),
+        ("dim_tratamento", "tratamento_id", "Tratamento"),
+    ]
+    
     # Carregar tabela fato
     print("\n1. Carregando tabela fato...")
     try:
-        df_fact = pd.read_csv(fact_file)
+        # Só as colunas de FK são validadas, lidas como categóricas (poucos
+        # hashes distintos repetidos em muitas linhas), sem inferir tipos
+        fk_cols = [fact_col for _, fact_col, _ in dims_config]
+        df_fact = read_table(fact_file, fk_cols, {col: "category" for col in fk_cols})
         print(f"   Registros na fato: {len(df_fact):,}")
     except Exception as e:
         print(f"   ERRO ao carregar fato: {e}")
         sys.exit(1)
     
-    # Configuração das dimensões
-    dims_config = [
-        ("dim_paciente.csv", "paciente_id", "Paciente"),
-        ("dim_localizacao.csv", "localizacao_id", "Localizacao"),
-        ("dim_instituicao.csv", "instituicao_id", "Instituicao"),
-        ("dim_tumor.csv", "tumor_id", "Tumor"),
-        ("dim_fatores_risco.csv", "fatores_id", "Fatores de Risco"),
-        ("dim_ocupacao.csv", "ocupacao_id", "Ocupacao"),
-        ("dim_tempo.csv", "tempo_id", "Tempo"),
-        ("dim_tratamento.csv", "tratamento_id", "Tratamento"),
-    ]
-    
     # Validar cada dimensão
     print("\n2. Validando correspondencia de hashes...")
     print("-" * 70)
@@ -136,8 +157,9 @@ def main():
     resultados = []
     all_ok = True
     
-    for dim_file, fact_col, dim_name in dims_config:
-        dim_path = dimensions_dir / dim_file
+    for dim_table, fact_col, dim_name in dims_config:
+        dim_path = table_file(dimensions_dir, dim_table, args.formato)
+        dim_file = dim_path.name
         
         # Verificar se dimensão existe
         if not dim_path.exists():
@@ -145,9 +167,11 @@ def main():
             all_ok = False
             continue
         
-        # Carregar dimensão
+        # Carregar dimensão (a fato referencia o id se a dimensão tiver
+        # a coluna id, gravada com --ids-inteiros; senão a hash_key)
         try:
-            df_dim = pd.read_csv(dim_path)
+            dim_col = 'id' if 'id' in table_columns(dim_path) else 'hash_key'
+            df_dim = read_table(dim_path, [dim_col], {dim_col: "str"})
         except Exception as e:
             print(f"   [ERRO] {dim_name}: Erro ao carregar {dim_file}: {e}")
             all_ok = False
@@ -155,7 +179,7 @@ def main():
         
         # Validar
         sucesso, taxa, total_fato, total_dim, mensagem = validate_dimension(
-            df_fact, df_dim, fact_col, dim_name
+            df_fact, df_dim, fact_col, dim_name, dim_col=dim_col
         )
         
         # Armazenar resultado
@@ -175,7 +199,7 @@ def main():
         # Se houver erro, mostrar exemplos
         if not sucesso:
             all_ok = False
-            print_hash_examples(df_fact, df_dim, fact_col, dim_name)
+            print_hash_examples(df_fact, df_dim, fact_col, dim_name, dim_col=dim_col)
     
     # Resumo final
     print("\n" + "=" * 70)
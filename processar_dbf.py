@@ -1,8 +1,18 @@
+import numpy as np
 import pandas as pd
-from dbfread import DBF
+from dbfread import DBF, FieldParser
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import argparse
+import hashlib
+import json
 import os
 import re
 import glob
+import itertools
+import time
+
+from etl.paralelo import add_workers_argument, resolve_workers, executar_com_log
+
 
 def ler_arquivo_cnv(caminho_arquivo):
     mapeamento = {}
@@ -77,9 +87,423 @@ def extrair_mapeamentos_def(caminho_def):
     return mapeamentos
 
 
+# ==============================================================================
+# ÍNDICE DE INTERVALOS DOS .cnv (faixas e listas de códigos)
+# ==============================================================================
+
+# Formato TabWin: cabeçalho "quantidade largura [L]" e, em cada linha,
+# sequência + descrição até a coluna 60 e, a partir dela, os códigos:
+#   000-004            faixa (inclusiva, comparação de texto)
+#   C07-C14,C32,       lista de faixas e códigos
+#   1 ,01,02,03,04,    lista (o código ocupa `largura` caracteres)
+# Só os `largura` primeiros caracteres do valor são comparados: com largura
+# 3, "C07.1" cai na faixa C07-C14.
+COLUNA_CODIGOS_CNV = 60
+
+# Os códigos viram inteiros (bytes big-endian), o que limita a largura
+LARGURA_MAXIMA_CNV = 7
+
+
+def _ajustar_codigo(codigo, largura):
+    """Código com exatamente `largura` caracteres (completa com espaços)."""
+    return codigo.ljust(largura)[:largura]
+
+
+def _chaves_cnv(codigos, largura):
+    """
+    Códigos de mesma largura → inteiros com a mesma ordem do texto
+    (cada caractere vira um byte latin1).
+    """
+    brutos = np.array([c.encode('latin1', 'replace') for c in codigos],
+                      dtype=f'S{largura}')
+    matriz = brutos.view(np.uint8).reshape(-1, largura).astype(np.int64)
+    pesos = 256 ** np.arange(largura - 1, -1, -1, dtype=np.int64)
+    return matriz @ pesos
+
+
+def ler_indice_cnv(caminho_arquivo):
+    """
+    Lê um .cnv como índice de intervalos ordenado.
+
+    Cada código ou faixa vira um intervalo [inicio, fim]. Quando intervalos
+    se sobrepõem (ex.: "00-99 SEM INFORMACAO" seguido dos códigos
+    específicos), vale o mais estreito; no empate, a linha mais abaixo.
+    Faixas invertidas ("99-  ") valem só para as duas pontas.
+    Códigos ausentes viram None (ver classificar_cnv).
+
+    Retorna dict com:
+        largura: caracteres comparados
+        limites: inteiros ordenados onde começa cada segmento
+        segmentos: descrição (índice em descricoes) de cada segmento, -1 = nenhuma
+        descricoes: array com as descrições das linhas
+        codigos: {codigo: descricao} só dos códigos avulsos (sem as faixas)
+        numerico: todos os códigos (não em branco) só têm dígitos
+    """
+    with open(caminho_arquivo, 'r', encoding='latin1') as f:
+        linhas = [l.rstrip('\r\n') for l in f
+                  if l.strip() and not l.startswith(';')]
+
+    cabecalho = linhas[0].split()
+    quantidade, largura = int(cabecalho[0]), int(cabecalho[1])
+    if largura > LARGURA_MAXIMA_CNV:
+        raise ValueError(f"{caminho_arquivo}: largura {largura} acima de {LARGURA_MAXIMA_CNV}")
+    if quantidade != len(linhas) - 1:
+        print(f"⚠️  {caminho_arquivo}: cabecalho indica {quantidade} linhas, "
+              f"encontradas {len(linhas) - 1}")
+
+    descricoes = []
+    codigos = {}
+    inicios = []
+    fins = []
+    donos = []
+
+    for linha in linhas[1:]:
+        m = re.match(r'^\s*\d+\s+(.*)$', linha[:COLUNA_CODIGOS_CNV])
+        descricao = (m.group(1) if m else linha[:COLUNA_CODIGOS_CNV]).strip()
+        dono = len(descricoes)
+        descricoes.append(descricao)
+
+        for token in linha[COLUNA_CODIGOS_CNV:].split(','):
+            if not token:
+                continue
+            # Espaços depois da vírgula só separam ("2345, 2354"); um item
+            # todo em branco é o código em branco
+            if token.strip():
+                token = token.lstrip()
+            # Hífen no início é parte do código ("-9"), não faixa
+            if '-' in token[1:]:
+                inicio, _, fim = token[1:].partition('-')
+                inicio = token[0] + inicio
+            else:
+                inicio = fim = token
+            inicio = _ajustar_codigo(inicio, largura)
+            fim = _ajustar_codigo(fim, largura)
+            pontas = [(inicio, fim)] if inicio <= fim else [(inicio, inicio), (fim, fim)]
+            for a, b in pontas:
+                inicios.append(a)
+                fins.append(b)
+                donos.append(dono)
+                if a == b:
+                    codigos[a.rstrip()] = descricao
+
+    numerico = all(c.strip().isdigit() for c in inicios + fins if c.strip())
+    inicios = _chaves_cnv(inicios, largura)
+    fins = _chaves_cnv(fins, largura)
+    donos = np.array(donos, dtype=np.int32)
+
+    # Segmentos elementares entre os limites; cada intervalo "pinta" os seus,
+    # do mais largo para o mais estreito (e de cima para baixo no empate)
+    limites = np.unique(np.concatenate([inicios, fins + 1]))
+    segmentos = np.full(len(limites), -1, dtype=np.int32)
+    primeiro = np.searchsorted(limites, inicios)
+    depois = np.searchsorted(limites, fins + 1)
+
+    for i in np.lexsort((np.arange(len(donos)), -(fins - inicios))):
+        segmentos[primeiro[i]:depois[i]] = donos[i]
+
+    return {
+        'largura': largura,
+        'limites': limites,
+        'segmentos': segmentos,
+        'descricoes': np.array(descricoes, dtype=object),
+        'codigos': codigos,
+        'numerico': numerico,
+    }
+
+
+def _texto_codigo(valor, largura, numerico=False):
+    """
+    Texto do valor como gravado no campo do DBF. Números (ex.: IDADE lida
+    como 35 ou 35.0 em vez de "035") são completados com zeros à esquerda.
+    Se os códigos do .cnv forem numéricos, o mesmo vale para textos só com
+    dígitos (ex.: "35" do data_processed), que senão seriam completados
+    com espaços e comparados como texto ("35 " cairia em "85 ou +").
+    """
+    if isinstance(valor, (bool, np.bool_)):
+        return str(valor)
+    if isinstance(valor, (int, np.integer)):
+        return str(valor).zfill(largura)
+    if isinstance(valor, (float, np.floating)) and float(valor).is_integer():
+        return str(int(valor)).zfill(largura)
+    texto = str(valor)
+    if numerico and texto.strip().isdigit():
+        return texto.strip().zfill(largura)
+    return texto
+
+
+def classificar_cnv(serie, indice):
+    """
+    Classifica uma coluna inteira pelo índice de um .cnv: os valores
+    distintos são convertidos em inteiros e localizados com um único
+    searchsorted. Valores nulos ou sem faixa correspondente viram None.
+    """
+    codigos, unicos = pd.factorize(serie)
+    largura = indice['largura']
+
+    numerico = indice['numerico']
+
+    chaves = _chaves_cnv([_ajustar_codigo(_texto_codigo(u, largura, numerico), largura)
+                          for u in unicos], largura)
+    posicoes = np.searchsorted(indice['limites'], chaves, side='right') - 1
+    donos = np.where(posicoes >= 0, indice['segmentos'][np.maximum(posicoes, 0)], -1)
+
+    descricoes = np.append(indice['descricoes'], None)
+    rotulos_unicos = descricoes[donos]      # -1 → None (último elemento)
+    resultado = np.append(rotulos_unicos, None)[codigos]
+    return pd.Series(resultado, index=serie.index, name=serie.name, dtype=object)
+
+
+def extrair_classificacoes_def(caminho_def):
+    """
+    Todas as classificações do .def (linhas T, S e L), inclusive as várias
+    de uma mesma coluna (ex.: IDADE em faixas de 5 anos e infantis).
+
+    Retorna {rotulo: (coluna, arquivo_cnv)}, ex.:
+        {'Faixa etaria': ('IDADE', 'r_fxeta5.cnv'), ...}
+    """
+    classificacoes = {}
+    with open(caminho_def, 'r', encoding='latin1') as arquivo:
+        for linha in arquivo:
+            linha = linha.strip()
+            if linha.startswith(('T', 'S', 'L')) and '.cnv' in linha:
+                partes = linha.split(',')
+                if len(partes) >= 4:
+                    rotulo = partes[0][1:].strip()
+                    if rotulo not in classificacoes:
+                        classificacoes[rotulo] = (partes[1].strip(),
+                                                  os.path.basename(partes[3].strip()))
+    return classificacoes
+
+
+# ==============================================================================
+# CACHE COMPILADO DOS DICIONÁRIOS (.def + .cnv)
+# ==============================================================================
+
+CAMINHO_DEF = 'raw_data/rhcGeral.def'
+PASTA_CNV = 'raw_data'
+CAMINHO_CACHE_CNV = 'raw_data/.traducoes_cnv.json'
+
+# Mude quando o parser ou o formato do cache mudar: força a reconstrução
+VERSAO_CACHE_CNV = 5
+
+
+def _assinatura_arquivo(caminho):
+    """[tamanho, sha256 do conteúdo] do arquivo, ou None se ele não existir."""
+    try:
+        with open(caminho, 'rb') as f:
+            conteudo = f.read()
+    except FileNotFoundError:
+        return None
+    return [len(conteudo), hashlib.sha256(conteudo).hexdigest()]
+
+
+def _compilar_dicionarios(caminho_def, pasta_cnv):
+    """
+    Lê o .def e todos os .cnv referenciados.
+    Retorna (traducoes, indices, tradutores, assinaturas), onde assinaturas
+    cobre o .def e todos os .cnv referenciados, inclusive os ausentes.
+    """
+    assinaturas = {caminho_def: _assinatura_arquivo(caminho_def)}
+
+    def disponivel(arquivo_cnv):
+        caminho_cnv = os.path.join(pasta_cnv, arquivo_cnv)
+        if caminho_cnv not in assinaturas:
+            assinaturas[caminho_cnv] = _assinatura_arquivo(caminho_cnv)
+            if assinaturas[caminho_cnv] is None:
+                print(f"Aviso: Arquivo {caminho_cnv} nao encontrado")
+        return caminho_cnv if assinaturas[caminho_cnv] is not None else None
+
+    # Como os notebooks fazem: primeiro .cnv de cada coluna, códigos literais
+    traducoes = {}
+    for coluna, arquivo_cnv in extrair_mapeamentos_def(caminho_def).items():
+        caminho_cnv = disponivel(arquivo_cnv)
+        if caminho_cnv:
+            mapeamento = ler_arquivo_cnv(caminho_cnv)
+            if mapeamento:
+                traducoes[coluna] = mapeamento
+
+    # Todas as classificações, como índices de intervalos
+    indices = {}
+    por_arquivo = {}
+    for rotulo, (coluna, arquivo_cnv) in extrair_classificacoes_def(caminho_def).items():
+        caminho_cnv = disponivel(arquivo_cnv)
+        if not caminho_cnv:
+            continue
+        if caminho_cnv not in por_arquivo:
+            try:
+                por_arquivo[caminho_cnv] = ler_indice_cnv(caminho_cnv)
+            except Exception as e:
+                print(f"Erro ao indexar arquivo {caminho_cnv}: {e}")
+                por_arquivo[caminho_cnv] = None
+        if por_arquivo[caminho_cnv] is not None:
+            indices[rotulo] = (coluna, por_arquivo[caminho_cnv])
+
+    # Um tradutor por coluna (primeiro .cnv da coluna no .def), só com os
+    # códigos avulsos: faixas (ex.: IDADE → faixa etária) são classificações,
+    # aplicadas com classificar_cnv, e não traduções do valor
+    tradutores = {}
+    for coluna, arquivo_cnv in extrair_mapeamentos_def(caminho_def).items():
+        indice = por_arquivo.get(os.path.join(pasta_cnv, arquivo_cnv))
+        if indice is not None and indice['codigos']:
+            tradutores[coluna] = criar_tradutor(indice['codigos'])
+
+    return traducoes, indices, tradutores, assinaturas
+
+
+def _indices_para_json(indices):
+    """
+    Índices no formato do cache: cada .cnv uma única vez (vários rótulos
+    usam o mesmo índice) e os arrays numpy como listas.
+    """
+    arquivos = []
+    posicao = {}
+    rotulos = {}
+    for rotulo, (coluna, indice) in indices.items():
+        if id(indice) not in posicao:
+            posicao[id(indice)] = len(arquivos)
+            arquivos.append({
+                **indice,
+                'limites': indice['limites'].tolist(),
+                'segmentos': indice['segmentos'].tolist(),
+                'descricoes': indice['descricoes'].tolist(),
+            })
+        rotulos[rotulo] = [coluna, posicao[id(indice)]]
+    return {'arquivos': arquivos, 'rotulos': rotulos}
+
+
+def _indices_de_json(dados):
+    """Inverso de _indices_para_json: {rotulo: (coluna, indice)}."""
+    arquivos = [
+        {
+            **indice,
+            'limites': np.array(indice['limites'], dtype=np.int64),
+            'segmentos': np.array(indice['segmentos'], dtype=np.int32),
+            'descricoes': np.array(indice['descricoes'], dtype=object),
+        }
+        for indice in dados['arquivos']
+    ]
+    return {rotulo: (coluna, arquivos[i]) for rotulo, (coluna, i) in dados['rotulos'].items()}
+
+
+def _ler_cache_dicionarios(caminho_cache, caminho_def, pasta_cnv):
+    """Conteúdo do cache, ou None se ele não existir ou estiver desatualizado."""
+    try:
+        with open(caminho_cache, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"⚠️  Cache {caminho_cache} invalido ({e}); reconstruindo")
+        return None
+
+    if (not isinstance(cache, dict)
+            or cache.get('versao') != VERSAO_CACHE_CNV
+            or cache.get('def') != caminho_def
+            or cache.get('pasta_cnv') != pasta_cnv):
+        return None
+
+    for caminho, assinatura in cache['assinaturas'].items():
+        if _assinatura_arquivo(caminho) != assinatura:
+            return None
+
+    cache['indices'] = _indices_de_json(cache['indices'])
+    return cache
+
+
+def carregar_dicionarios(caminho_def=CAMINHO_DEF, pasta_cnv=PASTA_CNV,
+                         caminho_cache=CAMINHO_CACHE_CNV, reconstruir=False):
+    """
+    Dicionários compilados a partir do .def e dos .cnv:
+        traducoes: {coluna: {codigo: descricao}} (ver carregar_traducoes)
+        indices:   {rotulo: (coluna, indice)}    (ver carregar_indices_cnv)
+        tradutores: {coluna: tradutor}           (ver carregar_tradutores)
+
+    O resultado é guardado em um cache JSON junto com o tamanho e o sha256
+    do conteúdo do .def e de cada .cnv referenciado. Nas execuções
+    seguintes o cache é carregado direto, sem reprocessar os .cnv com
+    regex; se algum desses arquivos mudar (ou aparecer/sumir), o cache é
+    reconstruído automaticamente. JSON, e não pickle: carregar o cache
+    nunca executa código, mesmo que o arquivo tenha sido trocado.
+
+    Args:
+        caminho_def: Arquivo .def do tabulador
+        pasta_cnv: Pasta onde estão os .cnv
+        caminho_cache: Arquivo do cache
+        reconstruir: Ignora o cache existente e reconstrói
+    """
+    inicio = time.perf_counter()
+
+    cache = None if reconstruir else _ler_cache_dicionarios(caminho_cache, caminho_def, pasta_cnv)
+    if cache is not None:
+        print(f"OK - Dicionarios carregados do cache: {len(cache['tradutores'])} colunas, "
+              f"{len(cache['indices'])} classificacoes "
+              f"({(time.perf_counter() - inicio) * 1000:.0f} ms)")
+        return cache
+
+    traducoes, indices, tradutores, assinaturas = _compilar_dicionarios(caminho_def, pasta_cnv)
+    cache = {
+        'versao': VERSAO_CACHE_CNV,
+        'def': caminho_def,
+        'pasta_cnv': pasta_cnv,
+        'assinaturas': assinaturas,
+        'traducoes': traducoes,
+        'indices': indices,
+        'tradutores': tradutores,
+    }
+
+    # Grava em temporário + rename: nunca deixa um cache pela metade
+    temporario = f"{caminho_cache}.{os.getpid()}.tmp"
+    try:
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump({**cache, 'indices': _indices_para_json(indices)}, f,
+                      ensure_ascii=False)
+        os.replace(temporario, caminho_cache)
+    except OSError as e:
+        print(f"⚠️  Nao foi possivel gravar o cache {caminho_cache}: {e}")
+        if os.path.exists(temporario):
+            os.remove(temporario)
+
+    print(f"OK - Dicionarios compilados a partir do .def/.cnv: {len(tradutores)} colunas, "
+          f"{len(indices)} classificacoes ({(time.perf_counter() - inicio) * 1000:.0f} ms)")
+    return cache
+
+
+def carregar_traducoes(**kwargs):
+    """
+    Dicionários {coluna: {codigo: descricao}} de todas as colunas do .def
+    (o mesmo `traducoes` montado nos notebooks com extrair_mapeamentos_def
+    + ler_arquivo_cnv), lidos do cache (ver carregar_dicionarios).
+    """
+    return carregar_dicionarios(**kwargs)['traducoes']
+
+
+def carregar_indices_cnv(**kwargs):
+    """
+    Índices de intervalos de todas as classificações do .def, lidos do
+    cache (ver carregar_dicionarios). Uso:
+
+        indices = carregar_indices_cnv()
+        coluna, indice = indices['Faixa etaria']
+        df['FAIXA_ETARIA'] = classificar_cnv(df[coluna], indice)
+    """
+    return carregar_dicionarios(**kwargs)['indices']
+
+
+def carregar_tradutores(**kwargs):
+    """
+    Tradutores (ver criar_tradutor) de todas as colunas do .def, lidos do
+    cache (ver carregar_dicionarios). Usado com --dicionario def.
+    """
+    return carregar_dicionarios(**kwargs)['tradutores']
+
+
 def criar_mapeamentos_completos():
     """
     Cria dicionário completo com todos os mapeamentos
+
+    Dicionário fixo (14 colunas), o padrão da conversão. Os tradutores de
+    todas as colunas do rhcGeral.def (carregar_tradutores) são opcionais:
+    --dicionario def.
     """
     return {
         'SEXO': {
@@ -183,25 +607,160 @@ def criar_mapeamentos_completos():
     }
 
 
-def aplicar_mapeamentos(df, mapeamentos):
+# ==============================================================================
+# TRADUTORES (código → descrição)
+# ==============================================================================
+
+def normalizar_codigo(texto):
+    """
+    Forma normalizada de um código: sem pontuação, sem zeros à esquerda e
+    em maiúsculas ("C00.0" → "C000", "0012" → "12", "00" → "0").
     """
-    Aplica os mapeamentos ao DataFrame
+    normalizado = re.sub(r'[^A-Za-z0-9]', '', texto).upper()
+    return normalizado.lstrip('0') or normalizado[:1]
+
+
+def criar_tradutor(mapeamento, literal=False):
+    """
+    Tradutor de uma coluna a partir de {codigo: descricao}.
+
+    As variantes das chaves são calculadas aqui, uma única vez: na tradução
+    cada valor distinto faz no máximo duas consultas a dicionário
+    (texto exato e forma normalizada), em vez de tentar zeros à esquerda e
+    maiúsculas valor a valor como o aplicar_mapa_serie dos notebooks.
+
+    Com `literal`, vale a regra antiga do dicionário fixo: só o valor igual
+    ao código (1, 1.0 ou "1") é traduzido, sem forma normalizada ("01" e
+    " 1" ficam como estão), e o valor sem tradução sai como str(valor)
+    ("5.0", não "5").
+
+    Retorna dict com:
+        exato: texto do código (ou descrição, que fica como está) → descrição
+        normalizado: normalizar_codigo(codigo) → descrição (vazio se literal)
+        literal: regra antiga (ver acima)
+    """
+    if literal:
+        exato = {str(k): v for k, v in mapeamento.items()}
+        normalizado = {}
+    else:
+        exato = {str(k).strip(): v for k, v in mapeamento.items()}
+        normalizado = {}
+        for codigo, descricao in exato.items():
+            normalizado.setdefault(normalizar_codigo(codigo), descricao)
+
+    # Valor que já é uma descrição final não é traduzido de novo
+    exato.update({v: v for v in mapeamento.values()})
+
+    return {'exato': exato, 'normalizado': normalizado, 'literal': literal}
+
+
+def _texto_valor(valor):
+    """Texto de um valor lido do DBF (1.0 → "1"), sem espaços nas pontas."""
+    if isinstance(valor, (float, np.floating)) and float(valor).is_integer():
+        return str(int(valor))
+    return str(valor).strip()
+
+
+def _chave_literal(valor):
+    """
+    Chave de um valor na regra literal: número inteiro (1.0, True) compara
+    como o código inteiro, como no replace do pandas; o resto, str(valor).
+    """
+    if (isinstance(valor, (int, float, np.integer, np.floating, np.bool_))
+            and not pd.isna(valor) and float(valor).is_integer()):
+        return str(int(valor))
+    return str(valor)
+
+
+def _traduzir(texto, exato, normalizado):
+    """Descrição do código, ou None se ele não estiver no dicionário."""
+    rotulo = exato.get(texto)
+    if rotulo is None:
+        rotulo = normalizado.get(normalizar_codigo(texto))
+    return rotulo
+
+
+def mapear_coluna(serie, tradutor, nao_mapeados=None):
+    """
+    Traduz uma coluna em uma única passada.
+
+    Os valores distintos são fatorados (códigos inteiros), cada valor
+    distinto é traduzido uma única vez e o rótulo volta para as linhas
+    pelo código (take). Valores sem tradução ficam como texto; nulos viram
+    str(valor) ('None', 'nan') e também passam pelo tradutor.
+
+    Se `nao_mapeados` (dict) for informado, soma nele {texto: ocorrências}
+    dos valores (não nulos nem em branco) sem tradução. As ocorrências saem de um
+    bincount dos códigos já fatorados, sem nova passada pelas linhas.
+    """
+    exato = tradutor['exato']
+    normalizado = tradutor['normalizado']
+
+    codigos, unicos = pd.factorize(serie)
+    if tradutor.get('literal'):
+        textos = [str(u) for u in unicos]
+        achados = [exato.get(_chave_literal(u)) for u in unicos]
+    else:
+        textos = [_texto_valor(u) for u in unicos]
+        achados = [_traduzir(t, exato, normalizado) for t in textos]
+    rotulos = np.array([t if a is None else a for t, a in zip(textos, achados)] + [None],
+                       dtype=object)
+    resultado = rotulos[codigos]
+
+    nulos = codigos < 0
+    if nulos.any():
+        # pd.NA (campos Int64) como o NaN dos campos float: 'nan'
+        texto = ['nan' if v is pd.NA else str(v) for v in serie[nulos]]
+        resultado[nulos] = [_traduzir(t, exato, normalizado) or t for t in texto]
+
+    if nao_mapeados is not None:
+        faltantes = [i for i, a in enumerate(achados) if a is None and textos[i]]
+        if faltantes:
+            ocorrencias = np.bincount(codigos[~nulos], minlength=len(unicos))
+            for i in faltantes:
+                nao_mapeados[textos[i]] = nao_mapeados.get(textos[i], 0) + int(ocorrencias[i])
+
+    return pd.Series(resultado, index=serie.index, dtype=object)
+
+
+def criar_tradutores_fixos():
+    """
+    Tradutores do dicionário fixo (criar_mapeamentos_completos), com a
+    regra literal do aplicar_mapeamentos original (ver criar_tradutor).
+    """
+    return {coluna: criar_tradutor(mapeamento, literal=True)
+            for coluna, mapeamento in criar_mapeamentos_completos().items()}
+
+
+def criar_tradutores(dicionario='fixo'):
+    """Tradutores do dicionário escolhido: 'fixo' (padrão) ou 'def' (rhcGeral.def)."""
+    if dicionario == 'def':
+        return carregar_tradutores()
+    return criar_tradutores_fixos()
+
+
+def aplicar_mapeamentos(df, mapeamentos, tempos=None, nao_mapeados=None):
+    """
+    Aplica os mapeamentos ({coluna: tradutor}) ao DataFrame
+
+    Se `tempos` (dict) for informado, o tempo de cada coluna é somado nele
+    em vez de impresso (leitura em blocos: um total por arquivo). Se
+    `nao_mapeados` (dict) for informado, acumula nele, por coluna, os
+    valores sem tradução ({coluna: {valor: ocorrências}}).
     """
     colunas_mapeadas = []
     
     for coluna, mapeamento in mapeamentos.items():
         if coluna in df.columns:
             try:
-                # Aplicar mapeamento com múltiplos métodos para garantir funcionamento
-                # Método 1: replace direto
-                df[coluna] = df[coluna].replace(mapeamento)
-                
-                # Método 2: map com fallback
-                df_temp = df[coluna].map(mapeamento)
-                df[coluna] = df_temp.fillna(df[coluna])
-                
-                # Método 3: conversão string + replace
-                df[coluna] = df[coluna].astype(str).replace({str(k): v for k, v in mapeamento.items()})
+                inicio = time.perf_counter()
+                faltantes = None if nao_mapeados is None else nao_mapeados.setdefault(coluna, {})
+                df[coluna] = mapear_coluna(df[coluna], mapeamento, faltantes)
+                duracao = time.perf_counter() - inicio
+                if tempos is None:
+                    print(f"    {coluna}: {duracao:.3f}s")
+                else:
+                    tempos[coluna] = tempos.get(coluna, 0.0) + duracao
                 
                 colunas_mapeadas.append(coluna)
                 
@@ -211,10 +770,261 @@ def aplicar_mapeamentos(df, mapeamentos):
     return df, colunas_mapeadas
 
 
-def processar_dbf(arquivo_dbf, pasta_saida='saida'):
+def salvar_relatorio_nao_mapeados(nao_mapeados, caminho):
+    """
+    Grava o relatório de valores sem tradução (CSV: coluna, valor,
+    ocorrencias; por coluna, do valor mais frequente para o menos).
+    O arquivo é gravado mesmo vazio (só o cabeçalho).
+
+    Returns:
+        DataFrame com o relatório
+    """
+    relatorio = pd.DataFrame(
+        [(coluna, valor, n) for coluna, valores in nao_mapeados.items()
+         for valor, n in valores.items()],
+        columns=['coluna', 'valor', 'ocorrencias']
+    )
+    relatorio = relatorio.sort_values(['coluna', 'ocorrencias', 'valor'],
+                                      ascending=[True, False, True], ignore_index=True)
+    relatorio.to_csv(caminho, index=False, encoding='utf-8')
+    return relatorio
+
+
+# Registros decodificados por bloco na leitura do DBF
+TAMANHO_BLOCO = 100_000
+
+# Campos que o dbfread devolve como número (int, float ou None)
+TIPOS_NUMERICOS_DBF = ('N', 'F', 'I', 'O', '+')
+
+# Marcação do primeiro byte de cada registro
+REGISTRO_VALIDO = b' '
+FIM_DOS_REGISTROS = b'\x1a'
+
+
+def tipo_registro_dbf(tabela):
+    """
+    dtype numpy de um registro do DBF: 1 byte de marcação (' ' = válido,
+    '*' = apagado) + um campo de bytes de tamanho fixo por coluna.
+    """
+    return np.dtype(
+        [('_marcacao', 'S1')] +
+        [(f'c{i}', f'S{campo.length}') for i, campo in enumerate(tabela.fields)]
+    )
+
+
+def iterar_registros_dbf(tabela, tamanho_bloco=TAMANHO_BLOCO):
+    """
+    Lê os registros do DBF em blocos, direto do arquivo mapeado em memória.
+
+    O arquivo é aberto com np.memmap como um array de registros de tamanho
+    fixo (ver tipo_registro_dbf): cada bloco é uma fatia desse array, e o
+    sistema operacional só carrega as páginas do bloco que está sendo lido.
+    Como no dbfread, registros apagados são ignorados e a leitura para no
+    marcador de fim (0x1A); um registro incompleto no fim do arquivo é
+    descartado.
+
+    Gera arrays estruturados só com os registros válidos de cada bloco.
+    """
+    tipo = tipo_registro_dbf(tabela)
+    tamanho_dados = os.path.getsize(tabela.filename) - tabela.header.headerlen
+    total = max(tamanho_dados, 0) // tipo.itemsize
+    if total == 0:
+        return
+
+    registros = np.memmap(tabela.filename, dtype=tipo, mode='r',
+                          offset=tabela.header.headerlen, shape=(total,))
+
+    for inicio in range(0, total, tamanho_bloco):
+        bloco = registros[inicio:inicio + tamanho_bloco]
+        marcacao = bloco['_marcacao']
+
+        fim = np.flatnonzero(marcacao == FIM_DOS_REGISTROS)
+        if len(fim):
+            bloco = bloco[:fim[0]]
+            marcacao = marcacao[:fim[0]]
+
+        validos = bloco[marcacao == REGISTRO_VALIDO]
+        if len(validos):
+            yield validos
+        if len(fim):
+            break
+
+
+def decodificar_campo(bytes_campo, campo, parse, encoding):
+    """
+    Decodifica uma coluna de bytes de tamanho fixo em valores Python.
+
+    Cada valor DISTINTO é decodificado uma única vez (np.unique, em C) e o
+    resultado volta para as linhas pelo índice inverso. Campos texto (C)
+    são decodificados em lote (rstrip de NUL/espaço + latin1); os demais
+    tipos usam o FieldParser do dbfread sobre os valores distintos, então o
+    resultado é sempre o mesmo do dbfread.
+    """
+    unicos, inverso = np.unique(bytes_campo, return_inverse=True)
+
+    if campo.type == 'C':
+        texto = np.char.decode(np.char.rstrip(unicos, b'\0 '), encoding)
+        valores = texto.astype(object)
+    else:
+        valores = np.empty(len(unicos), dtype=object)
+        pendentes = np.ones(len(unicos), dtype=bool)
+        if campo.type in ('N', 'F'):
+            pendentes = _decodificar_numeros(unicos, campo, valores)
+        valores[pendentes] = [
+            parse(campo, bytes(u).ljust(campo.length, b'\0')) for u in unicos[pendentes]
+        ]
+
+    return valores[inverso]
+
+
+def _decodificar_numeros(unicos, campo, valores):
+    """
+    Converte em lote os valores de campos N/F em formato simples.
+
+    Mesmas regras do FieldParser (strip de espaços, depois de '*'):
+    - vazio → None
+    - sinal opcional + dígitos (N) → int
+    - sinal opcional + dígitos com um ponto decimal → float
+    Os caracteres são testados como uma matriz de bytes (sem regex por
+    valor). Preenche `valores` e devolve a máscara dos que ficaram
+    pendentes (ex.: vírgula decimal, notação científica, NUL) para o
+    FieldParser.
+    """
+    texto = np.char.strip(np.char.strip(unicos), b'*')
+    tamanhos = np.char.str_len(texto)
+    matriz = texto.view(np.uint8).reshape(len(texto), texto.dtype.itemsize)
+
+    posicao = np.arange(matriz.shape[1])
+    dentro = posicao < tamanhos[:, None]
+    digito = (matriz >= ord('0')) & (matriz <= ord('9')) & dentro
+    ponto = (matriz == ord('.')) & dentro
+    sinal = ((matriz == ord('+')) | (matriz == ord('-'))) & (posicao == 0)
+
+    simples = (~dentro | digito | ponto | sinal).all(axis=1)
+    # Com NUL no fim do campo o dbfread falha: fica para o FieldParser
+    simples &= np.char.str_len(unicos) == campo.length
+    pontos = ponto.sum(axis=1)
+    digitos = digito.sum(axis=1)
+
+    vazios = simples & (tamanhos == 0)
+    decimais = simples & (digitos >= 1) & (pontos == 1)
+    inteiros = simples & (digitos >= 1) & (digitos <= 18) & (pontos == 0)
+    if campo.type == 'F':
+        # parseF sempre devolve float
+        decimais |= inteiros
+        inteiros = np.zeros(len(unicos), dtype=bool)
+
+    valores[vazios] = None
+    valores[inteiros] = texto[inteiros].astype(np.int64).astype(object)
+    valores[decimais] = texto[decimais].astype(np.float64).astype(object)
+    return ~(vazios | inteiros | decimais)
+
+
+def decodificar_bloco(registros, campos, parse, encoding):
+    """
+    Decodifica um bloco de registros direto em colunas.
+
+    Returns:
+        DataFrame com as colunas na ordem dos campos do DBF (dtypes inferidos
+        como em pd.DataFrame(list(DBF(...))))
+    """
+    colunas = {}
+    for i, campo in enumerate(campos):
+        valores = decodificar_campo(registros[f'c{i}'], campo, parse, encoding)
+        if campo.type in ('C', 'D'):
+            # Texto e datas ficam object de qualquer forma
+            colunas[campo.name] = valores
+        else:
+            # Lista: o pandas infere o dtype (int, float, bool) como antes
+            colunas[campo.name] = valores.tolist()
+    return pd.DataFrame(colunas)
+
+
+def tipos_numericos(campos):
+    """
+    dtype de cada campo numérico, pelos descritores do cabeçalho do DBF.
+
+    Lendo em blocos, um campo inteiro viraria int64 em um bloco e float64
+    (por ter vazios) em outro, e o CSV alternaria entre "1990" e "1990.0".
+    O tipo sai do descritor, sem ler os registros:
+    - N sem casas decimais, I e + → Int64 (inteiro com nulos: "1990" e "")
+    - N com casas decimais, F e O → float64
+    """
+    tipos = {}
+    for campo in campos:
+        if campo.type in ('I', '+') or (campo.type == 'N' and campo.decimal_count == 0):
+            tipos[campo.name] = 'Int64'
+        elif campo.type in TIPOS_NUMERICOS_DBF:
+            tipos[campo.name] = 'float64'
+    return tipos
+
+
+def blocos_dbfread(tabela, tamanho_bloco=TAMANHO_BLOCO):
+    """
+    Lê o DBF pela iteração normal do dbfread, em DataFrames de até
+    `tamanho_bloco` linhas. Usado para arquivos com memo (campos M), que
+    a leitura direta (iterar_registros_dbf) não abre.
+    """
+    registros = iter(tabela)
+    while True:
+        bloco = list(itertools.islice(registros, tamanho_bloco))
+        if not bloco:
+            return
+        yield pd.DataFrame(bloco, columns=tabela.field_names)
+
+
+def ler_dbf_em_blocos(arquivo_dbf, tamanho_bloco=TAMANHO_BLOCO):
+    """
+    Lê um DBF em DataFrames de até `tamanho_bloco` linhas.
+
+    Substitui pd.DataFrame(list(DBF(...))): nunca existe um dict por
+    registro nem o arquivo inteiro em memória, só um bloco por vez. O
+    dbfread é usado só para ler o cabeçalho (descritores dos campos) e
+    como FieldParser dos tipos não-texto; os valores são os mesmos do
+    dbfread, e os dtypes dos campos numéricos vêm do cabeçalho (ver
+    tipos_numericos), então o arquivo é lido uma única vez.
+
+    Arquivos com memo são lidos pela iteração do próprio dbfread (ver
+    blocos_dbfread): só a API pública do dbfread é usada.
+    """
+    tabela = DBF(arquivo_dbf, encoding='latin1', load=False)
+    tipos = tipos_numericos(tabela.fields)
+
+    if tabela.memofilename:
+        blocos = blocos_dbfread(tabela, tamanho_bloco)
+    else:
+        parse = FieldParser(tabela).parse
+        blocos = (decodificar_bloco(registros, tabela.fields, parse, tabela.encoding)
+                  for registros in iterar_registros_dbf(tabela, tamanho_bloco))
+
+    for df in blocos:
+        for coluna, tipo in tipos.items():
+            try:
+                df[coluna] = df[coluna].astype(tipo)
+            except (TypeError, ValueError):
+                # Campo N sem decimais com valores decimais no arquivo:
+                # o bloco fica em float64
+                df[coluna] = df[coluna].astype('float64')
+        yield df
+
+
+def processar_dbf(arquivo_dbf, pasta_saida='saida', tamanho_bloco=TAMANHO_BLOCO,
+                  mapeamentos=None):
     """
     Processa um arquivo DBF e salva como CSV com mapeamentos aplicados
+
+    O DBF é lido, mapeado e gravado bloco a bloco (memória limitada ao
+    tamanho do bloco, não ao tamanho do arquivo). Os mapeamentos podem
+    vir prontos (criados uma vez para todos os arquivos); o padrão é o
+    dicionário fixo (ver criar_tradutores).
+
+    Os valores sem tradução vão para nao_mapeados_<arquivo>.csv, na mesma
+    pasta do CSV (ver salvar_relatorio_nao_mapeados).
+
+    Os blocos são gravados em <arquivo>.csv.tmp, renomeado só depois da
+    leitura completa: um erro no meio não deixa um CSV truncado.
     """
+    caminho_tmp = None
     try:
         # Criar pasta de saída se não existir
         if not os.path.exists(pasta_saida):
@@ -224,42 +1034,137 @@ def processar_dbf(arquivo_dbf, pasta_saida='saida'):
         nome_base = os.path.basename(arquivo_dbf)
         nome_csv = nome_base.replace('.dbf', '.csv')
         caminho_csv = os.path.join(pasta_saida, nome_csv)
+        caminho_tmp = caminho_csv + '.tmp'
+        caminho_relatorio = os.path.join(pasta_saida, f"nao_mapeados_{nome_csv}")
         
         print(f"\n{'='*60}")
         print(f"Processando: {nome_base}")
         print(f"{'='*60}")
         
-        # Ler o arquivo DBF
-        print("  Lendo arquivo DBF...")
-        df = pd.DataFrame(list(DBF(arquivo_dbf, encoding='latin1')))
-        print(f"  OK - Arquivo lido: {len(df)} linhas, {len(df.columns)} colunas")
+        if mapeamentos is None:
+            mapeamentos = criar_tradutores()
+        inicio = time.perf_counter()
+        tempos = {}
+        nao_mapeados = {}
+        colunas_mapeadas = []
+        total_linhas = 0
         
-        # Aplicar mapeamentos
-        print("  Aplicando mapeamentos...")
-        mapeamentos = criar_mapeamentos_completos()
-        df, colunas_mapeadas = aplicar_mapeamentos(df, mapeamentos)
+        # Ler o arquivo DBF em blocos, aplicar mapeamentos e salvar cada bloco
+        print(f"  Lendo arquivo DBF em blocos de {tamanho_bloco:,} registros...")
+        with open(caminho_tmp, 'w', encoding='utf-8-sig', newline='') as saida:
+            for i, df in enumerate(ler_dbf_em_blocos(arquivo_dbf, tamanho_bloco), 1):
+                df, colunas_mapeadas = aplicar_mapeamentos(df, mapeamentos, tempos, nao_mapeados)
+                df.to_csv(saida, index=False, header=(i == 1))
+                total_linhas += len(df)
+                print(f"    Bloco {i}: {len(df):,} linhas (total: {total_linhas:,})")
+        os.replace(caminho_tmp, caminho_csv)
+        
+        print(f"  OK - Arquivo lido: {total_linhas} linhas")
         
         if colunas_mapeadas:
             print(f"  OK - {len(colunas_mapeadas)} colunas mapeadas: {', '.join(colunas_mapeadas)}")
+            for coluna, duracao in tempos.items():
+                print(f"    {coluna}: {duracao:.3f}s")
         else:
             print("  AVISO - Nenhuma coluna foi mapeada")
+
+        relatorio = salvar_relatorio_nao_mapeados(nao_mapeados, caminho_relatorio)
+        if len(relatorio):
+            print(f"  ⚠️  Valores sem traducao: {len(relatorio)} distintos, "
+                  f"{relatorio['ocorrencias'].sum():,} linhas "
+                  f"(relatorio: {os.path.basename(caminho_relatorio)})")
+            resumo = relatorio.groupby('coluna', sort=False).agg(
+                distintos=('valor', 'size'), linhas=('ocorrencias', 'sum'),
+                exemplos=('valor', lambda v: ', '.join(v.head(5))))
+            for coluna, linha in resumo.iterrows():
+                print(f"    {coluna}: {linha['distintos']} distintos, {linha['linhas']:,} linhas "
+                      f"(ex.: {linha['exemplos']})")
+        else:
+            print("  OK - Todos os valores foram traduzidos")
         
-        # Salvar como CSV
-        print(f"  Salvando CSV: {nome_csv}")
-        df.to_csv(caminho_csv, index=False, encoding='utf-8-sig')
-        print(f"  OK - Arquivo salvo com sucesso!")
+        duracao = time.perf_counter() - inicio
+        print(f"  OK - Arquivo salvo com sucesso: {nome_csv}")
+        print(f"  Tempo: {duracao:.1f}s ({total_linhas / max(duracao, 1e-9):,.0f} linhas/s)")
         
         return True
         
     except Exception as e:
         print(f"  ❌ Erro ao processar {arquivo_dbf}: {e}")
+        if caminho_tmp and os.path.exists(caminho_tmp):
+            os.remove(caminho_tmp)
         return False
 
 
+# Mapeamentos de cada processo do pool (criados uma vez, no processo principal)
+_mapeamentos_worker = None
+
+
+def _iniciar_worker(mapeamentos):
+    global _mapeamentos_worker
+    _mapeamentos_worker = mapeamentos
+
+
+def _processar_dbf_worker(arquivo_dbf):
+    """
+    Executa processar_dbf em um processo do pool, guardando o log para ser
+    impresso de uma vez (sem misturar arquivos).
+    """
+    return executar_com_log(processar_dbf, arquivo_dbf, mapeamentos=_mapeamentos_worker)
+
+
+def processar_dbfs_paralelo(arquivos_dbf, mapeamentos, workers):
+    """
+    Converte vários DBFs em paralelo, um arquivo por processo.
+
+    Os mapeamentos são enviados uma única vez para cada processo (no
+    initializer do pool). Os maiores arquivos são enviados primeiro, para
+    um ano grande não ficar sozinho no fim.
+
+    Returns:
+        tuple: (sucessos, falhas)
+    """
+    sucessos = 0
+    falhas = 0
+    ordem = sorted(arquivos_dbf, key=os.path.getsize, reverse=True)
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_iniciar_worker,
+                             initargs=(mapeamentos,)) as executor:
+        futures = {executor.submit(_processar_dbf_worker, arquivo): arquivo for arquivo in ordem}
+
+        for future in as_completed(futures):
+            try:
+                sucesso, log = future.result()
+                print(log, end="")
+            except Exception as e:
+                sucesso = False
+                print(f"  ❌ Erro ao processar {futures[future]}: {e}")
+
+            if sucesso:
+                sucessos += 1
+            else:
+                falhas += 1
+
+    return sucessos, falhas
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Converte os DBFs do RHC em CSV com os rotulos.")
+    parser.add_argument(
+        "--dicionario", choices=("fixo", "def"), default="fixo",
+        help="Rotulos: 'fixo' = dicionario de 14 colunas (padrao); "
+             "'def' = todas as colunas do rhcGeral.def/.cnv (traduz tambem "
+             "CNES, MUUH, PROCEDEN, OCUPACAO...)"
+    )
+    add_workers_argument(parser, "Processos para converter arquivos em paralelo")
+    return parser.parse_args()
+
+
 def main():
     """
     Função principal - processa todos os arquivos .dbf da pasta
     """
+    args = parse_args()
+
     print("PROCESSAMENTO DE ARQUIVOS DBF")
     print("="*60)
     
@@ -275,15 +1180,25 @@ def main():
     if len(arquivos_dbf) > 5:
         print(f"   ... e mais {len(arquivos_dbf) - 5} arquivos")
     
-    # Processar cada arquivo
-    sucessos = 0
-    falhas = 0
+    # Mapeamentos criados uma única vez para todos os arquivos
+    mapeamentos = criar_tradutores(args.dicionario)
+    print(f"   Dicionario: {args.dicionario} ({len(mapeamentos)} colunas)")
+    workers = resolve_workers(args.workers, len(arquivos_dbf))
+    inicio = time.perf_counter()
     
-    for arquivo in arquivos_dbf:
-        if processar_dbf(arquivo):
-            sucessos += 1
-        else:
-            falhas += 1
+    # Processar cada arquivo
+    if workers > 1:
+        print(f"   Processando em paralelo: {workers} processos")
+        sucessos, falhas = processar_dbfs_paralelo(arquivos_dbf, mapeamentos, workers)
+    else:
+        sucessos = 0
+        falhas = 0
+        
+        for arquivo in arquivos_dbf:
+            if processar_dbf(arquivo, mapeamentos=mapeamentos):
+                sucessos += 1
+            else:
+                falhas += 1
     
     # Resumo final
     print(f"\n{'='*60}")
@@ -292,6 +1207,7 @@ def main():
     print(f"  Arquivos processados com sucesso: {sucessos}")
     print(f"  Arquivos com erro: {falhas}")
     print(f"  Taxa de sucesso: {sucessos/len(arquivos_dbf)*100:.1f}%")
+    print(f"  Tempo total: {time.perf_counter() - inicio:.1f}s")
     print(f"\n  Arquivos CSV salvos na pasta: 'saida'")
     print(f"{'='*60}")
 
@@ -0,0 +1,81 @@
+"""
+Configuração dos testes (pytest).
+
+Os scripts do etl/ importam uns aos outros pelo nome (ex.: `from storage
+import ...`), como quando rodam com `python etl/<script>.py`; por isso a
+raiz do repositório e a pasta etl/ entram no sys.path.
+
+Os testes do pipeline rodam os scripts como na linha de comando (a pasta
+de trabalho é a raiz dos dados: data_raw/, data_processed/, dimensions/),
+sobre CSVs brutos sintéticos (gravar_csvs_brutos).
+"""
+
+from pathlib import Path
+import random
+import subprocess
+import sys
+
+import pandas as pd
+
+RAIZ = Path(__file__).resolve().parent.parent
+
+for pasta in (RAIZ, RAIZ / "etl"):
+    if str(pasta) not in sys.path:
+        sys.path.insert(0, str(pasta))
+
+
+def _data(sorteio, ano: int) -> str:
+    """Data DD/MM/YYYY do bruto, com os brancos e nulos do RHC."""
+    r = sorteio.random()
+    if r < 0.05:
+        return " / / "
+    if r < 0.08:
+        return ""
+    return f"{sorteio.randint(1, 28):02d}/{sorteio.randint(1, 12):02d}/{ano}"
+
+
+def gravar_csvs_brutos(pasta: Path, anos, linhas: int = 400, semente: int = 0):
+    """
+    Grava data_raw/rhc<ano>.csv (latin1, colunas do COLUMN_MAP) em `pasta`.
+
+    Os valores se repetem entre os anos (pacientes, instituições...), como
+    nos dados reais, e cada arquivo tem uma linha duplicada.
+    """
+    from etl_cleaning import COLUMN_MAP
+
+    sorteio = random.Random(semente)
+    escolher = sorteio.choice
+    (Path(pasta) / "data_raw").mkdir(parents=True, exist_ok=True)
+
+    for ano in anos:
+        registros = []
+        for _ in range(linhas):
+            r = {col: escolher(["1", "2", "9", "", "Sem informacao", " 3 "]) for col in COLUMN_MAP}
+            r["SEXO"] = escolher(["Masculino", "Feminino", "Não informado", ""])
+            r["IDADE"] = escolher([str(x) for x in range(0, 90, 7)] + ["", "35.0"])
+            r["CNES"] = escolher(["2077485", "0012345", "2269821"])
+            r["LOCTUDET"] = escolher(["C50", "C61", "C18", ""])
+            r["TIPOHIST"] = escolher(["8140/3", "8500/3", "8070/3"])
+            r["UFUH"] = escolher(["SP", "RJ", "MG"])
+            r["OCUPACAO"] = escolher(["999", "6210", "7152", "Sem Informacao"])
+            r["VALOR_TOT"] = escolher(["100.5", "2000", "150.00", ""])
+            for col in ("DTDIAGNO", "DATAOBITO", "DTPRICON", "DTINITRT",
+                        "DATAPRICON", "DATAINITRT", "DTTRIAGE"):
+                r[col] = _data(sorteio, 2000 + int(ano))
+            registros.append(r)
+        registros.append(dict(registros[0]))
+        pd.DataFrame(registros).to_csv(Path(pasta) / "data_raw" / f"rhc{ano}.csv",
+                                       index=False, encoding="latin1")
+
+
+def executar_etapa(pasta: Path, script: str, *args, codigo_saida: int = 0) -> str:
+    """
+    Roda etl/<script>.py com `pasta` como diretório de trabalho e confere o
+    código de saída; devolve o log (stdout).
+    """
+    resultado = subprocess.run(
+        [sys.executable, str(RAIZ / "etl" / f"{script}.py"), *args],
+        cwd=pasta, capture_output=True, text=True
+    )
+    assert resultado.returncode == codigo_saida, resultado.stdout + resultado.stderr
+    return resultado.stdout
@@ -0,0 +1,77 @@
+"""
+Testes do índice de intervalos dos .cnv (ler_indice_cnv / classificar_cnv).
+"""
+
+import pandas as pd
+import pytest
+
+import processar_dbf
+from conftest import RAIZ
+
+
+def _gravar_cnv(caminho, largura, linhas):
+    """Grava um .cnv no formato TabWin: descrição até a coluna 60, códigos depois."""
+    texto = ["; teste", f"{len(linhas)} {largura}  L"]
+    for seq, (descricao, codigos) in enumerate(linhas, 1):
+        texto.append(f"{seq:>7}  {descricao}".ljust(processar_dbf.COLUNA_CODIGOS_CNV) + codigos)
+    caminho.write_text("\n".join(texto) + "\n", encoding="latin1")
+    return processar_dbf.ler_indice_cnv(str(caminho))
+
+
+def _classificar(valores, indice):
+    return processar_dbf.classificar_cnv(pd.Series(valores, dtype=object), indice).tolist()
+
+
+@pytest.fixture(scope="module")
+def faixa_etaria():
+    return processar_dbf.ler_indice_cnv(str(RAIZ / "raw_data" / "r_fxeta5.cnv"))
+
+
+def test_faixas_com_codigos_numericos(faixa_etaria):
+    """IDADE lida como número, texto com ou sem zeros: sempre a mesma faixa."""
+    assert faixa_etaria["numerico"]
+    valores = [35, 35.0, "35", "035", " 35", 4, "4", "004", 85, 998, "999"]
+    assert _classificar(valores, faixa_etaria) == [
+        "35-39", "35-39", "35-39", "35-39", "35-39",
+        "00-04", "00-04", "00-04",
+        "85 ou +", "85 ou +", "Sem informacao",
+    ]
+
+
+def test_faixas_sem_correspondencia_viram_nulo(faixa_etaria):
+    assert _classificar([None, "abc", ""], faixa_etaria) == [None, None, None]
+
+
+def test_lista_de_codigos_com_zeros_a_esquerda():
+    """Lista "1 ,01,02": o código "1" (completado com espaço) e "01" são o mesmo grupo."""
+    indice = processar_dbf.ler_indice_cnv(str(RAIZ / "raw_data" / "r_estadiam.cnv"))
+    assert not indice["numerico"]
+    assert _classificar(["1", "01", 1, "02", "1A", "0", "00", "X"], indice) == [
+        "1", "1", "1", "1", "1A", "0", "0", None,
+    ]
+
+
+def test_faixa_mais_estreita_vence(tmp_path):
+    """Uma faixa geral seguida de códigos específicos: vale o mais estreito."""
+    indice = _gravar_cnv(tmp_path / "teste.cnv", 2, [
+        ("Sem informacao", "00-99"),
+        ("Um ou dois", "01,02,"),
+        ("Dez a vinte", "10-20"),
+    ])
+    assert _classificar(["01", 2, "05", 15, "10", "20", "21", "99"], indice) == [
+        "Um ou dois", "Um ou dois", "Sem informacao", "Dez a vinte",
+        "Dez a vinte", "Dez a vinte", "Sem informacao", "Sem informacao",
+    ]
+
+
+def test_faixas_de_texto_comparam_so_a_largura(tmp_path):
+    """Códigos CID: "C07.1" cai em C07-C14 (largura 3); a faixa é de texto."""
+    indice = _gravar_cnv(tmp_path / "cid.cnv", 3, [
+        ("Glandulas salivares", "C07-C14,C32,"),
+        ("Mama", "C50"),
+    ])
+    assert not indice["numerico"]
+    assert _classificar(["C07.1", "C10", "C14", "C15", "C32", "C50.9", "D05"], indice) == [
+        "Glandulas salivares", "Glandulas salivares", "Glandulas salivares",
+        None, "Glandulas salivares", "Mama", None,
+    ]
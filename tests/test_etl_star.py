@@ -0,0 +1,91 @@
+"""
+Testes do etl_star.py: execução completa x incremental (--incremental).
+"""
+
+import shutil
+
+import pandas as pd
+import pytest
+
+from conftest import executar_etapa, gravar_csvs_brutos
+from storage import read_table
+
+ANOS = ["00", "01", "02"]
+
+
+def _tabelas(pasta, formato):
+    """
+    {nome do arquivo: DataFrame} de todas as tabelas de dimensions/. O CSV
+    é lido como texto: sem inferência, uma hash_key como "6e3713..." não é
+    tomada por número.
+    """
+    return {
+        arquivo.name: read_table(arquivo, dtype=str)
+        for arquivo in sorted((pasta / "dimensions").glob(f"*.{formato}"))
+    }
+
+
+def _execucao_completa(pasta, formato, anos=ANOS):
+    gravar_csvs_brutos(pasta, anos)
+    executar_etapa(pasta, "etl_cleaning", "--formato", formato)
+    executar_etapa(pasta, "etl_star", "--formato", formato)
+
+
+def _acrescentar_anos(pasta, formato, codigo_saida=0):
+    """
+    Grava o bruto de todos os ANOS (os já gravados saem iguais: mesma
+    semente), limpa só os novos e roda o --incremental.
+    """
+    gravar_csvs_brutos(pasta, ANOS)
+    executar_etapa(pasta, "etl_cleaning", "--formato", formato, "--apenas-novos")
+    return executar_etapa(pasta, "etl_star", "--formato", formato, "--incremental",
+                          codigo_saida=codigo_saida)
+
+
+@pytest.mark.parametrize("formato", ["csv", "parquet"])
+def test_incremental_igual_a_execucao_completa(tmp_path, formato):
+    """Dois anos + o terceiro no --incremental = os três anos de uma vez."""
+    completa = tmp_path / "completa"
+    _execucao_completa(completa, formato)
+
+    incremental = tmp_path / "incremental"
+    _execucao_completa(incremental, formato, ANOS[:2])
+    _acrescentar_anos(incremental, formato)
+
+    esperado = _tabelas(completa, formato)
+    obtido = _tabelas(incremental, formato)
+    assert obtido.keys() == esperado.keys()
+    for nome in esperado:
+        pd.testing.assert_frame_equal(obtido[nome], esperado[nome], obj=nome)
+
+    if formato == "csv":
+        for nome in esperado:
+            assert ((incremental / "dimensions" / nome).read_bytes()
+                    == (completa / "dimensions" / nome).read_bytes()), nome
+
+
+def test_incremental_sem_arquivos_novos_nao_altera_nada(tmp_path):
+    """Um --incremental repetido não acrescenta linhas."""
+    _execucao_completa(tmp_path, "csv")
+    antes = _tabelas(tmp_path, "csv")
+
+    executar_etapa(tmp_path, "etl_star", "--incremental")
+
+    depois = _tabelas(tmp_path, "csv")
+    for nome in antes:
+        pd.testing.assert_frame_equal(depois[nome], antes[nome], obj=nome)
+
+
+def test_incremental_recusa_tabelas_fora_do_manifesto(tmp_path):
+    """Tabela alterada depois da última execução: o --incremental para."""
+    _execucao_completa(tmp_path, "csv", ANOS[:2])
+    dim_tempo = tmp_path / "dimensions" / "dim_tempo.csv"
+    copia = tmp_path / "dim_tempo.csv"
+    shutil.copy(dim_tempo, copia)
+    # Mesmo número de linhas, conteúdo diferente
+    dim_tempo.write_bytes(copia.read_bytes().replace(b"2000", b"1999", 1))
+
+    log = _acrescentar_anos(tmp_path, "csv", codigo_saida=1)
+
+    assert "nao batem com o manifesto" in log
+    assert "dim_tempo" in log
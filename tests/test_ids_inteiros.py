@@ -0,0 +1,101 @@
+"""
+Testes dos ids inteiros (--ids-inteiros): o id de cada hash_key não muda
+entre execuções, completas ou incrementais.
+"""
+
+from conftest import executar_etapa, gravar_csvs_brutos
+from etl_dimensions import DIMENSION_KEYS
+from storage import read_table
+
+ANOS = ["00", "01", "02"]
+
+
+def _ids(pasta):
+    """{dimensão: {hash_key: id}} das dimensões de dimensions/ (CSV)."""
+    ids = {}
+    for dim_name in DIMENSION_KEYS:
+        dim = read_table(pasta / "dimensions" / f"{dim_name}.csv", ["hash_key", "id"], dtype=str)
+        assert not dim["id"].duplicated().any(), dim_name
+        ids[dim_name] = dict(zip(dim["hash_key"], dim["id"].astype(int)))
+    return ids
+
+
+def _assert_ids_mantidos(antes, depois):
+    """Todo hash de `antes` continua em `depois` com o mesmo id."""
+    for dim_name, ids in antes.items():
+        mudaram = {h for h, i in ids.items() if depois[dim_name].get(h) != i}
+        assert not mudaram, f"{dim_name}: {len(mudaram)} ids mudaram"
+
+
+def _preparar(pasta, anos):
+    gravar_csvs_brutos(pasta, anos)
+    executar_etapa(pasta, "etl_cleaning", "--apenas-novos")
+
+
+def test_ids_estaveis_ao_reprocessar_tudo(tmp_path):
+    """Execução completa de novo, com um ano a mais: os ids antigos ficam."""
+    _preparar(tmp_path, ANOS[:2])
+    executar_etapa(tmp_path, "etl_star", "--ids-inteiros")
+    antes = _ids(tmp_path)
+
+    executar_etapa(tmp_path, "etl_star", "--ids-inteiros")
+    _assert_ids_mantidos(antes, _ids(tmp_path))
+
+    _preparar(tmp_path, ANOS)
+    executar_etapa(tmp_path, "etl_star", "--ids-inteiros")
+    depois = _ids(tmp_path)
+
+    _assert_ids_mantidos(antes, depois)
+    assert sum(map(len, depois.values())) > sum(map(len, antes.values()))
+    executar_etapa(tmp_path, "validate_integrity")
+
+
+def test_ids_estaveis_quando_um_ano_sai_e_volta(tmp_path):
+    """
+    Três anos, depois só dois, depois os três de novo: os hashes do ano
+    que saiu voltam com os mesmos ids, e nenhum id é reaproveitado.
+    """
+    _preparar(tmp_path, ANOS)
+    executar_etapa(tmp_path, "etl_star", "--ids-inteiros")
+    antes = _ids(tmp_path)
+
+    processado = tmp_path / "data_processed" / f"rhc{ANOS[0]}.csv"
+    guardado = tmp_path / processado.name
+    processado.rename(guardado)
+    executar_etapa(tmp_path, "etl_star", "--ids-inteiros")
+    sem_um_ano = _ids(tmp_path)
+    _assert_ids_mantidos(sem_um_ano, antes)
+
+    guardado.rename(processado)
+    executar_etapa(tmp_path, "etl_star", "--ids-inteiros")
+    _assert_ids_mantidos(antes, _ids(tmp_path))
+
+
+def test_ids_estaveis_no_incremental(tmp_path):
+    """--incremental mantém os ids e dá os mesmos ids de uma execução completa."""
+    _preparar(tmp_path, ANOS[:2])
+    executar_etapa(tmp_path, "etl_star", "--ids-inteiros")
+    antes = _ids(tmp_path)
+
+    _preparar(tmp_path, ANOS)
+    executar_etapa(tmp_path, "etl_star", "--ids-inteiros", "--incremental")
+    incremental = _ids(tmp_path)
+    _assert_ids_mantidos(antes, incremental)
+    executar_etapa(tmp_path, "validate_integrity")
+
+    executar_etapa(tmp_path, "etl_star", "--ids-inteiros")
+    assert _ids(tmp_path) == incremental
+
+
+def test_ids_estaveis_com_etl_dimensions(tmp_path):
+    """etl_dimensions.py + etl_fact.py usam o mesmo registro de ids do etl_star."""
+    _preparar(tmp_path, ANOS[:2])
+    executar_etapa(tmp_path, "etl_star", "--ids-inteiros")
+    antes = _ids(tmp_path)
+
+    _preparar(tmp_path, ANOS)
+    executar_etapa(tmp_path, "etl_dimensions", "--ids-inteiros")
+    executar_etapa(tmp_path, "etl_fact", "--ids-inteiros", "--workers", "2")
+
+    _assert_ids_mantidos(antes, _ids(tmp_path))
+    executar_etapa(tmp_path, "validate_integrity")
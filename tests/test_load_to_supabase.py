@@ -0,0 +1,53 @@
+"""
+Testes da divisão da fato em partes para a carga paralela (split_csv_ranges).
+"""
+
+import csv
+import io
+
+import pytest
+
+from load_to_supabase import split_csv_ranges
+
+
+def _registros(dados: bytes) -> list:
+    return list(csv.reader(io.StringIO(dados.decode("utf-8"), newline="")))
+
+
+@pytest.mark.parametrize("partes", [1, 2, 3, 7, 50])
+def test_partes_terminam_em_fim_de_registro(tmp_path, partes):
+    """Campos entre aspas com quebras de linha e aspas escapadas não são cortados."""
+    linhas = [["case_code", "orientacao"]]
+    for i in range(40):
+        if i % 3 == 0:
+            texto = f'linha 1\nlinha 2 "aspas"\n{i}'
+        elif i % 3 == 1:
+            texto = f"a,b\n\n{i}"
+        else:
+            texto = f"simples {i}"
+        linhas.append([str(i), texto])
+
+    arquivo = tmp_path / "fato.csv"
+    with open(arquivo, "w", encoding="utf-8", newline="") as f:
+        csv.writer(f, lineterminator="\n").writerows(linhas)
+    dados = arquivo.read_bytes()
+
+    faixas = split_csv_ranges(arquivo, partes)
+
+    assert 1 <= len(faixas) <= partes
+    assert faixas[0][0] == dados.index(b"\n") + 1
+    assert faixas[-1][1] == len(dados)
+    assert all(fim == inicio for (_, fim), (inicio, _) in zip(faixas[:-1], faixas[1:]))
+
+    lidos = []
+    for inicio, fim in faixas:
+        registros = _registros(dados[inicio:fim])
+        assert registros and all(len(r) == 2 for r in registros)
+        lidos.extend(registros)
+    assert lidos == linhas[1:]
+
+
+def test_arquivo_so_com_cabecalho(tmp_path):
+    arquivo = tmp_path / "fato.csv"
+    arquivo.write_bytes(b"case_code,orientacao\n")
+    assert split_csv_ranges(arquivo, 4) == []
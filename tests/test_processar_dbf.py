@@ -0,0 +1,125 @@
+"""
+Testes do processar_dbf.py: leitura do DBF em blocos.
+"""
+
+import datetime
+import glob
+import random
+import struct
+
+import pandas as pd
+import pytest
+from dbfread import DBF
+
+import processar_dbf
+from conftest import RAIZ
+
+
+CAMPOS = [
+    ("NOME", "C", 8, 0),
+    ("IDADE", "C", 3, 0),
+    ("ANOPRIDI", "N", 4, 0),
+    ("VALOR", "N", 10, 2),
+    ("TAXA", "F", 6, 2),
+    ("DTDIAGNO", "D", 8, 0),
+    ("FLAG", "L", 1, 0),
+]
+
+
+def _valor_campo(campo, sorteio):
+    """Bytes de um campo, com brancos e os casos que o dbfread trata à parte."""
+    _, tipo, tamanho, decimais = campo
+    if tipo == "C":
+        texto = sorteio.choice(["JOSÉ", "MARIA", "", "  AÇÃO ", "X" * 8, "035", "9"])
+        return texto.encode("latin1")[:tamanho].ljust(tamanho)
+    if sorteio.random() < 0.15:
+        return b" " * tamanho
+    if tipo == "N" and decimais:
+        return f"{sorteio.uniform(0, 99999):{tamanho}.{decimais}f}".encode()
+    if tipo == "N":
+        return f"{sorteio.randint(1990, 2022):>{tamanho}d}".encode()
+    if tipo == "F":
+        return f"{sorteio.uniform(0, 999):{tamanho}.{decimais}f}".encode()
+    if tipo == "D":
+        if sorteio.random() < 0.1:
+            return b"00000000"
+        data = datetime.date(2000, 1, 1) + datetime.timedelta(sorteio.randint(0, 8000))
+        return data.strftime("%Y%m%d").encode()
+    return sorteio.choice([b"T", b"F", b"?", b"Y", b"N"])
+
+
+def gravar_dbf(caminho, registros, semente=0):
+    """Grava um DBF (dBase III, sem memo) com registros apagados no meio."""
+    sorteio = random.Random(semente)
+    tamanho_registro = 1 + sum(c[2] for c in CAMPOS)
+    tamanho_cabecalho = 32 + 32 * len(CAMPOS) + 1
+    with open(caminho, "wb") as saida:
+        saida.write(struct.pack("<BBBBIHH20x", 3, 125, 1, 1, registros,
+                                tamanho_cabecalho, tamanho_registro))
+        for nome, tipo, tamanho, decimais in CAMPOS:
+            saida.write(struct.pack("<11sc4xBB14x", nome.encode(), tipo.encode(),
+                                    tamanho, decimais))
+        saida.write(b"\r")
+        for _ in range(registros):
+            marcacao = b"*" if sorteio.random() < 0.05 else b" "
+            saida.write(marcacao + b"".join(_valor_campo(c, sorteio) for c in CAMPOS))
+        saida.write(b"\x1a")
+
+
+def _linhas(df):
+    """Linhas do DataFrame como tuplas, com todo nulo (NaN, NA) como None."""
+    df = df.astype(object).where(df.notna(), None)
+    return [tuple(linha) for linha in df.itertuples(index=False)]
+
+
+def _arquivos_dbf():
+    """DBF sintético (sempre) + os DBFs de raw_data/dbfs/ presentes na máquina."""
+    return ["sintetico"] + sorted(glob.glob(str(RAIZ / "raw_data" / "dbfs" / "*.dbf")))
+
+
+@pytest.fixture(params=_arquivos_dbf())
+def arquivo_dbf(request, tmp_path):
+    if request.param == "sintetico":
+        caminho = tmp_path / "sintetico.dbf"
+        gravar_dbf(caminho, 250)
+        return str(caminho)
+    return request.param
+
+
+def test_blocos_iguais_a_iteracao_do_dbfread(arquivo_dbf):
+    """A leitura por memmap devolve os mesmos valores de list(DBF(...))."""
+    esperado = pd.DataFrame(list(DBF(arquivo_dbf, encoding="latin1")))
+
+    blocos = list(processar_dbf.ler_dbf_em_blocos(arquivo_dbf, tamanho_bloco=37))
+    lido = pd.concat(blocos, ignore_index=True)
+
+    assert list(lido.columns) == list(esperado.columns)
+    assert _linhas(lido) == _linhas(esperado)
+
+
+def test_dtypes_iguais_em_todos_os_blocos(tmp_path):
+    """O dtype de cada campo numérico vem do cabeçalho, não do bloco."""
+    caminho = tmp_path / "sintetico.dbf"
+    gravar_dbf(caminho, 250)
+
+    blocos = list(processar_dbf.ler_dbf_em_blocos(str(caminho), tamanho_bloco=10))
+
+    assert len(blocos) > 1
+    for df in blocos:
+        assert str(df["ANOPRIDI"].dtype) == "Int64"
+        assert str(df["VALOR"].dtype) == "float64"
+        assert str(df["TAXA"].dtype) == "float64"
+
+
+def test_leitura_pelo_dbfread_igual_a_direta(tmp_path):
+    """blocos_dbfread (arquivos com memo) lê o mesmo que a leitura direta."""
+    caminho = tmp_path / "sintetico.dbf"
+    gravar_dbf(caminho, 250)
+    tabela = DBF(str(caminho), encoding="latin1")
+
+    direto = pd.concat(processar_dbf.ler_dbf_em_blocos(str(caminho), tamanho_bloco=37),
+                       ignore_index=True)
+    pelo_dbfread = pd.concat(processar_dbf.blocos_dbfread(tabela, tamanho_bloco=37),
+                             ignore_index=True)
+
+    assert _linhas(pelo_dbfread) == _linhas(direto)
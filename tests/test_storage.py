@@ -0,0 +1,35 @@
+"""
+Testes do etl/storage.py: leitura com schema declarado.
+"""
+
+import pandas as pd
+
+from storage import read_table
+
+
+def test_schema_canoniza_codigos_e_preserva_texto_livre(tmp_path):
+    """Códigos "35.0" e "35" viram o mesmo texto; valor_total fica como está."""
+    arquivo = tmp_path / "rhc.csv"
+    pd.DataFrame({
+        "idade": ["35.0", "35", "7"],
+        "valor_total": ["150.00", "8000.0", "12.5"],
+    }).to_csv(arquivo, index=False)
+
+    df = read_table(arquivo, schema={"idade": "category", "valor_total": "str"})
+
+    assert df["idade"].astype(str).tolist() == ["35", "35", "7"]
+    assert df["valor_total"].tolist() == ["150.00", "8000.0", "12.5"]
+
+
+def test_schema_igual_em_csv_e_parquet(tmp_path):
+    """O mesmo código lido de CSV (texto) e de Parquet (float) dá o mesmo texto."""
+    csv = tmp_path / "rhc.csv"
+    parquet = tmp_path / "rhc.parquet"
+    pd.DataFrame({"idade": ["35", "40"]}).to_csv(csv, index=False)
+    pd.DataFrame({"idade": [35.0, 40.0]}).to_parquet(parquet)
+
+    schema = {"idade": "category"}
+    lido_csv = read_table(csv, schema=schema)["idade"].astype(str).tolist()
+    lido_parquet = read_table(parquet, schema=schema)["idade"].astype(str).tolist()
+
+    assert lido_csv == lido_parquet == ["35", "40"]